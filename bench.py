@@ -0,0 +1,917 @@
+# coding: utf8
+
+# Mesures de performance du code de commande du robot.
+# Utilisation :
+# $ python3 bench.py pipeline --enregistrer reference.json
+# $ python3 bench.py pipeline --reference reference.json --seuil 0.25
+# $ python3 bench.py discretisation --max-pas 10000000
+# $ python3 bench.py cinematique
+# $ python3 bench.py incrementale --finesse 100
+# $ python3 bench.py parallele --max-processus 8
+# $ python3 bench.py protocole
+# $ python3 bench.py quantification
+# $ python3 bench.py transport
+# $ python3 bench.py validation --nb-pas 1000000
+# $ python3 bench.py tensions --max-processus 4
+# $ python3 bench.py profil --nb-points 1000
+# $ python3 bench.py orientation
+# $ python3 bench.py profilage --nb-pas 2000000
+# $ python3 bench.py texte --nb-lignes 1000000
+# $ python3 bench.py directe --nb-mesures 1000000
+# $ python3 bench.py simulation --duree 3600
+# $ python3 bench.py import
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+import cable_math as cm
+import protocol
+
+
+def trajectoire_synthetique(nb_points, pas_par_intervalle, pas_maximal):
+    """
+    Construit une trajectoire aléatoire (comme gen.py) dont chaque intervalle
+    demande exactement pas_par_intervalle pas.
+
+    :param nb_points: nombre de points de passage
+    :param pas_par_intervalle: nombre de pas de chaque intervalle
+    :param pas_maximal: vecteur de taille 6 des pas maximaux
+
+    :type nb_points: int
+    :type pas_par_intervalle: int
+    :type pas_maximal: np.array de taille 6
+
+    :return: trajectoire de nb_points points
+    :rtype: np.array de dimension (nb_points, 6)
+    """
+    generateur = np.random.default_rng(0)
+    # Chaque intervalle est dicté par la dimension x, les autres bougent moins.
+    amplitude = (pas_par_intervalle - 0.5) * pas_maximal
+    variations = generateur.uniform(-1, 1, (nb_points - 1, 6)) * amplitude / 2
+    variations[:, 0] = amplitude[0] * generateur.choice([-1, 1], nb_points - 1)
+    trajectoire = np.zeros((nb_points, 6))
+    trajectoire[1:] = np.cumsum(variations, axis=0)
+    return trajectoire
+
+
+def bench_discretisation(max_pas, pas_par_intervalle=100):
+    """
+    Mesure le temps de discretisation_trajectoire pour un nombre total de pas
+    allant de 10^3 à max_pas. Le temps par pas doit rester à peu près
+    constant (coût linéaire).
+    """
+    print("### discretisation_trajectoire ###")
+    print("%12s %12s %12s %10s" % ("pas", "points", "temps (s)", "ns/pas"))
+    nb_pas = 1000
+    while nb_pas <= max_pas:
+        nb_points = nb_pas // pas_par_intervalle + 1
+        trajectoire = trajectoire_synthetique(nb_points, pas_par_intervalle,
+                                              cm.pas_maximal)
+        debut = time.perf_counter()
+        traj_disc, _ = cm.discretisation_trajectoire(trajectoire,
+                                                     cm.pas_maximal)
+        duree = time.perf_counter() - debut
+        print("%12d %12d %12.4f %10.1f" % (len(traj_disc), nb_points, duree,
+                                           1e9 * duree / len(traj_disc)))
+        del traj_disc
+        nb_pas *= 10
+
+
+def bench_cinematique(nb_positions=100000, nb_positions_boucle=2000):
+    """
+    Compare le calcul des longueurs des câbles position par position
+    (reconstruction_coins puis calcul_longueurs_cables) au calcul par lots.
+    """
+    print("### cinématique inverse ###")
+    geometrie = cm.GEOMETRIE_MAQUETTE
+    generateur = np.random.default_rng(0)
+    positions = generateur.uniform(0, 1, (nb_positions, 6))
+
+    debut = time.perf_counter()
+    for position in positions[:nb_positions_boucle]:
+        coins = cm.reconstruction_coins(position, geometrie)
+        cm.calcul_longueurs_cables(coins, geometrie)
+    duree_boucle = (time.perf_counter() - debut) / nb_positions_boucle
+
+    debut = time.perf_counter()
+    cm.calcul_longueurs_cables_lot(positions, geometrie)
+    duree_lot = (time.perf_counter() - debut) / nb_positions
+
+    print("boucle : %10.1f ns/position" % (1e9 * duree_boucle))
+    print("lot :    %10.1f ns/position" % (1e9 * duree_lot))
+    print("accélération : x%.0f" % (duree_boucle / duree_lot))
+
+
+def bench_incrementale(finesse, tolerance=cm.TOLERANCE_INCREMENTALE,
+                       nb_pas=500000):
+    """
+    Compare le mode incrémental de commande_longeurs_cables au calcul exact,
+    pour plusieurs périodes de recalcul, sur une trajectoire discrétisée avec
+    des pas finesse fois plus petits que les pas maximaux (fréquence de
+    commande finesse fois plus élevée).
+    """
+    print("### mode incrémental (pas / %d, tolérance %.0e m) ###"
+          % (finesse, tolerance))
+    pas_maximal = cm.pas_maximal / finesse
+    trajectoire = trajectoire_synthetique(nb_pas // 100 + 1, 100, pas_maximal)
+    traj_disc = cm.discretisation_trajectoire(trajectoire, pas_maximal)
+    geometrie = cm.GEOMETRIE_MAQUETTE
+
+    debut = time.perf_counter()
+    cm.commande_longeurs_cables(traj_disc, geometrie)
+    duree_exacte = time.perf_counter() - debut
+    print("%8s %10s %12s %12s %10s" % ("période", "ns/pas", "exacts (%)",
+                                       "erreur max", "accélération"))
+    print("%8s %10.1f %12.1f %12.2e %10.2f" % (
+        "exact", 1e9 * duree_exacte / len(traj_disc[1]), 100, 0, 1))
+    for periode in [4, 8, 16, 32, 64]:
+        debut = time.perf_counter()
+        cm.commande_longeurs_cables(traj_disc, geometrie, periode, tolerance)
+        duree = time.perf_counter() - debut
+        rapport = cm.rapport_erreur_incrementale(traj_disc, geometrie,
+                                                 periode, tolerance)
+        print("%8d %10.1f %12.1f %12.2e %10.2f" % (
+            periode, 1e9 * duree / len(traj_disc[1]),
+            100 * rapport["calculs_exacts"] / rapport["nombre_pas"],
+            rapport["erreur_max"], duree_exacte / duree))
+
+
+def bench_parallele(max_processus, nb_pas=2000000):
+    """
+    Compare le mode parallèle (voir commande_longeurs_cables_paralleles) à
+    la discrétisation suivie de commande_longeurs_cables dans le processus
+    courant, de 1 à max_processus processus. Le temps mesuré comprend la
+    discrétisation et le démarrage des processus.
+    """
+    print("### mode parallèle (%d pas, %d processeurs) ###"
+          % (nb_pas, os.cpu_count()))
+    trajectoire = trajectoire_synthetique(nb_pas // 100 + 1, 100,
+                                          cm.pas_maximal)
+    geometrie = cm.GEOMETRIE_MAQUETTE
+
+    debut = time.perf_counter()
+    traj_disc = cm.discretisation_trajectoire(trajectoire, cm.pas_maximal)
+    reference, _ = cm.commande_longeurs_cables(traj_disc, geometrie)
+    duree_sequentielle = time.perf_counter() - debut
+    del traj_disc
+    print("%10s %10s %10s %12s" % ("processus", "temps (s)", "accélération",
+                                   "écart max"))
+    print("%10s %10.3f %10.2f %12.2e" % ("aucun", duree_sequentielle, 1, 0))
+    nb_processus = 1
+    while nb_processus <= max_processus:
+        debut = time.perf_counter()
+        longueurs, _ = cm.commande_longeurs_cables_paralleles(
+            trajectoire, geometrie, nb_processus)
+        duree = time.perf_counter() - debut
+        print("%10d %10.3f %10.2f %12.2e" % (
+            nb_processus, duree, duree_sequentielle / duree,
+            np.abs(longueurs - reference).max()))
+        nb_processus *= 2
+
+
+def bench_protocole(nb_commandes=10**6):
+    """
+    Débit de l'encodage et du décodage des commandes au format binaire de
+    protocol, et taille d'une commande comparée à une ligne de float64.
+    """
+    print("### format binaire des commandes ###")
+    generateur = np.random.default_rng(0)
+    for largeur, amplitude in [(2, 2**10), (4, 2**20)]:
+        deltas = generateur.integers(-amplitude, amplitude, (nb_commandes, 8))
+        debut = time.perf_counter()
+        trames = list(protocol.encode_frames(deltas, width=largeur))
+        duree_encodage = time.perf_counter() - debut
+        debut = time.perf_counter()
+        for trame in trames:
+            protocol.decode(trame)
+        duree_decodage = time.perf_counter() - debut
+        taille = sum(len(trame) for trame in trames) / nb_commandes
+        print("int%d : %5.1f octets/commande (float64 : %d), encodage %6.1f "
+              "Mcommandes/s, décodage %6.1f Mcommandes/s"
+              % (8 * largeur, taille, 8 * 8,
+                 nb_commandes / duree_encodage / 1e6,
+                 nb_commandes / duree_decodage / 1e6))
+
+
+def bench_quantification(nb_pas=10**6):
+    """
+    Compare la quantification en ticks avec report du reste (voir
+    QuantificateurTicks) à l'arrondi indépendant de chaque variation : débit,
+    et écart final et maximal entre la position commandée et la position
+    exacte des moteurs.
+    """
+    print("### quantification en ticks ###")
+    geometrie = cm.GEOMETRIE_MAQUETTE
+    trajectoire = trajectoire_synthetique(nb_pas // 100 + 1, 100,
+                                          cm.pas_maximal)
+    _, variations = cm.commande_longeurs_cables(
+        cm.discretisation_trajectoire(trajectoire, cm.pas_maximal), geometrie)
+    exactes = np.cumsum(variations, axis=0) / geometrie.longueur_tick
+
+    debut = time.perf_counter()
+    quantificateur = cm.QuantificateurTicks(geometrie)
+    ticks = quantificateur.quantifie(variations)
+    duree = time.perf_counter() - debut
+    arrondis = np.rint(variations / geometrie.longueur_tick)
+
+    print("longueur d'un tick : %.3e m, %d pas" % (geometrie.longueur_tick,
+                                                   len(variations)))
+    print("report du reste :   %6.1f ns/pas, écart final %8.2f ticks, "
+          "écart max %8.2f ticks" % (
+              1e9 * duree / len(variations),
+              np.abs(np.cumsum(ticks, axis=0)[-1] - exactes[-1]).max(),
+              quantificateur.erreur_max.max()))
+    print("arrondi par pas :              écart final %8.2f ticks, "
+          "écart max %8.2f ticks" % (
+              np.abs(np.cumsum(arrondis, axis=0)[-1] - exactes[-1]).max(),
+              np.abs(np.cumsum(arrondis, axis=0) - exactes).max()))
+
+
+def bench_transport(nb_commandes=200000):
+    """
+    Débit de bout en bout de la liaison série (transport.SerialTransport)
+    vers un faux contrôleur sur un pseudo-terminal, qui répond immédiatement
+    ou qui met 20 µs à exécuter chaque commande (contrôleur lent : la
+    contre-pression limite alors le débit à celui du contrôleur).
+    """
+    # transport n'existe que sous Unix, il n'est importé que pour cette mesure.
+    import transport
+
+    print("### liaison série vers un faux contrôleur ###")
+    generateur = np.random.default_rng(0)
+    commandes = generateur.integers(-2**10, 2**10, (nb_commandes, 8))
+    for duree_commande in [0.0, 2e-5]:
+        controleur = transport.FakeController(duree_commande)
+        liaison = transport.SerialTransport(controleur.path)
+        debut = time.perf_counter()
+        liaison.send(commandes)
+        liaison.flush()
+        duree = time.perf_counter() - debut
+        print("contrôleur à %3.0f µs/commande : %9.0f commandes/s, %6.2f Mo/s, "
+              "%d commandes exécutées" % (
+                  1e6 * duree_commande, nb_commandes / duree,
+                  liaison.stats["bytes"] / duree / 1e6, controleur.executed))
+        liaison.close()
+        controleur.close()
+
+
+def bench_validation(nb_pas):
+    """
+    Temps de la validation d'une trajectoire de nb_pas pas avant son
+    exécution (voir validation_trajectoire), comparé à la discrétisation
+    seule. La trajectoire reste dans le hangar et n'échoue à aucun test.
+    """
+    print("### validation avant exécution (%d pas) ###" % nb_pas)
+    # Cercles de 20 cm de rayon au centre du hangar, parcourus avec des pas
+    # 100 fois plus fins que ceux de la maquette : environ 100 pas par
+    # intervalle.
+    geometrie = cm.RobotGeometry(pas_maximal=cm.pas_maximal / 100)
+    angles = 0.05 * np.arange(nb_pas // 100 + 1)
+    trajectoire = np.zeros((len(angles), 6))
+    trajectoire[:, 0] = 0.625 + 0.2 * np.cos(angles)
+    trajectoire[:, 1] = 0.625 + 0.2 * np.sin(angles)
+    trajectoire[:, 2] = 0.5
+    trajectoire[:, 3] = 0.1 * np.sin(angles / 7)
+
+    debut = time.perf_counter()
+    nb_pas_disc = sum(len(var_bloc) for _, var_bloc in
+                      cm.discretisation_trajectoire_flux(
+                          trajectoire, geometrie.pas_maximal))
+    duree_discretisation = time.perf_counter() - debut
+    debut = time.perf_counter()
+    rapport = cm.validation_trajectoire(trajectoire, geometrie, 0.01)
+    duree = time.perf_counter() - debut
+    print("%d pas discrétisés, valide : %s" % (rapport["nombre_pas"],
+                                               rapport["valide"]))
+    print("discrétisation seule : %8.3f s, %6.1f ns/pas"
+          % (duree_discretisation, 1e9 * duree_discretisation / nb_pas_disc))
+    print("validation :           %8.3f s, %6.1f ns/pas"
+          % (duree, 1e9 * duree / rapport["nombre_pas"]))
+
+
+def bench_tensions(max_processus, nb_positions=200000):
+    """
+    Débit de la vérification de faisabilité en tension (voir
+    tensions.faisabilite_tensions), sur des positions proches du centre du
+    hangar, presque toutes résolues en forme close, puis sur des positions
+    tirées dans tout le hangar, dont beaucoup demandent la recherche exacte ;
+    dans le processus courant puis avec 2 à max_processus processus.
+    """
+    import tensions
+
+    print("### faisabilité en tension (%d positions) ###" % nb_positions)
+    geometrie = cm.GEOMETRIE_MAQUETTE
+    generateur = np.random.default_rng(0)
+    centre = np.zeros((nb_positions, 6))
+    centre[:, 0:3] = generateur.uniform(0.5, 0.75, (nb_positions, 3))
+    centre[:, 3:6] = generateur.uniform(-0.1, 0.1, (nb_positions, 3))
+    hangar = np.zeros((nb_positions, 6))
+    hangar[:, 0:2] = generateur.uniform(0.2, 1.05, (nb_positions, 2))
+    hangar[:, 2] = generateur.uniform(0.2, 0.8, nb_positions)
+    hangar[:, 3:6] = generateur.uniform(-0.4, 0.4, (nb_positions, 3))
+
+    print("%10s %10s %12s %12s %12s" % ("positions", "processus",
+                                        "ns/position", "faisables (%)",
+                                        "marge min (N)"))
+    for nom, positions in [("centre", centre), ("hangar", hangar)]:
+        nb_processus = None
+        while nb_processus is None or nb_processus <= max_processus:
+            debut = time.perf_counter()
+            faisables, marges, _ = tensions.faisabilite_tensions(
+                positions, geometrie, nb_processus=nb_processus)
+            duree = time.perf_counter() - debut
+            print("%10s %10s %12.1f %12.1f %12.2f" % (
+                nom, "aucun" if nb_processus is None else nb_processus,
+                1e9 * duree / nb_positions, 100 * faisables.mean(),
+                marges.min()))
+            nb_processus = 2 if nb_processus is None else 2 * nb_processus
+
+
+def _cretes(positions, pas_maximal, pas_temps):
+    # Plus grandes accélération et secousse, en pas maximaux par seconde² et
+    # par seconde³, de positions échantillonnées tous les pas_temps.
+    normalisees = positions / pas_maximal
+    acceleration = np.diff(normalisees, n=2, axis=0) / pas_temps**2
+    secousse = np.diff(acceleration, axis=0) / pas_temps
+    return np.abs(acceleration).max(), np.abs(secousse).max()
+
+
+def bench_profil(nb_points, pas_temps=0.01, acceleration=200,
+                 secousse=2000):
+    """
+    Discrétisation à vitesse constante contre profils de vitesse (voir
+    ProfilVitesse) sur une trajectoire aléatoire comme celles de gen.py :
+    temps de calcul, durée du trajet et crêtes d'accélération et de
+    secousse. La vitesse constante saute à chaque point de passage ; la
+    dernière ligne donne le pas de temps qu'elle demanderait pour respecter
+    la même accélération, et la durée du trajet qui en résulte.
+    """
+    print("### profils de vitesse (%d points, pas de temps %g s) ###"
+          % (nb_points, pas_temps))
+    trajectoire = trajectoire_synthetique(nb_points, 100, cm.pas_maximal)
+    print("%16s %10s %10s %12s %14s %14s" % (
+        "profil", "pas", "calcul (s)", "durée (s)", "acc. max", "secousse max"))
+    profils = [("constant", None),
+               ("trapèze", cm.ProfilVitesse(pas_temps, acceleration)),
+               ("courbe en S", cm.ProfilVitesse(pas_temps, acceleration,
+                                                secousse_max=secousse))]
+    for nom, profil in profils:
+        debut = time.perf_counter()
+        if profil is None:
+            traj_disc, var_disc = cm.discretisation_trajectoire(
+                trajectoire, cm.pas_maximal)
+            positions = np.concatenate([traj_disc, traj_disc[-1:] +
+                                        var_disc[-1:]])
+        else:
+            positions = profil.positions(trajectoire, cm.pas_maximal)
+        duree = time.perf_counter() - debut
+        acc_max, secousse_max = _cretes(positions, cm.pas_maximal, pas_temps)
+        print("%16s %10d %10.3f %12.1f %14.0f %14.0f" % (
+            nom, len(positions) - 1, duree, (len(positions) - 1) * pas_temps,
+            acc_max, secousse_max))
+        if profil is None:
+            # L'accélération varie comme 1 / pas_temps².
+            pas_temps_sur = pas_temps * np.sqrt(acc_max / acceleration)
+            nb_pas_constant = len(positions) - 1
+    print("%16s %10d %10s %12.1f %14d %14s" % (
+        "constant lent", nb_pas_constant, "",
+        nb_pas_constant * pas_temps_sur, acceleration, ""))
+
+
+def _angles_par_pas(traj_disc, var_disc):
+    # Angle (en radian) de la rotation faite par le mobile à chaque pas.
+    avant = cm.rotation_lot(traj_disc[:, 3:6])
+    apres = cm.rotation_lot(traj_disc[:, 3:6] + var_disc[:, 3:6])
+    traces = np.einsum('nij,nij->n', avant, apres)
+    return np.arccos(np.clip((traces - 1) / 2, -1, 1))
+
+
+def bench_orientation(nb_positions=10**6, nb_positions_boucle=10000,
+                      nb_points=2000):
+    """
+    Matrices de rotation : rotation position par position, rotation_lot, et
+    passage par les quaternions (conversion des angles puis matrices, ou
+    matrices seules quand les quaternions sont déjà connus, comme après une
+    SLERP). Puis discrétisation avec orientations interpolées angle par
+    angle contre SLERP : temps par pas, et régularité de la vitesse
+    angulaire (rapport entre le plus grand et le plus petit angle tourné en
+    un pas, au sein d'un même intervalle).
+    """
+    print("### orientation (%d positions) ###" % nb_positions)
+    generateur = np.random.default_rng(0)
+    angles = generateur.uniform(-0.5, 0.5, (nb_positions, 3))
+
+    debut = time.perf_counter()
+    for angle in angles[:nb_positions_boucle]:
+        cm.rotation(angle)
+    duree_boucle = (time.perf_counter() - debut) / nb_positions_boucle
+    debut = time.perf_counter()
+    matrices = cm.rotation_lot(angles)
+    duree_lot = (time.perf_counter() - debut) / nb_positions
+    debut = time.perf_counter()
+    quaternions = cm.quaternions_lot(angles)
+    duree_conversion = (time.perf_counter() - debut) / nb_positions
+    debut = time.perf_counter()
+    matrices_quaternions = cm.rotation_quaternions_lot(quaternions)
+    duree_quaternions = (time.perf_counter() - debut) / nb_positions
+    print("rotation (boucle) :        %8.1f ns/position" % (1e9 * duree_boucle))
+    print("rotation_lot :             %8.1f ns/position" % (1e9 * duree_lot))
+    print("angles -> quaternions :    %8.1f ns/position"
+          % (1e9 * duree_conversion))
+    print("quaternions -> matrices :  %8.1f ns/position, écart max %.1e"
+          % (1e9 * duree_quaternions,
+             np.abs(matrices_quaternions - matrices).max()))
+
+    print("%10s %10s %10s %14s %14s" % ("", "pas", "ns/pas", "angle max (°)",
+                                       "max / min"))
+    trajectoire = trajectoire_synthetique(nb_points, 20, cm.pas_maximal)
+    trajectoire[:, 3:6] = generateur.uniform(-0.8, 0.8, (nb_points, 3))
+    for slerp in [False, True]:
+        debut = time.perf_counter()
+        traj_disc, var_disc = cm.discretisation_trajectoire(
+            trajectoire, cm.pas_maximal, slerp=slerp)
+        duree = time.perf_counter() - debut
+        angles_pas = _angles_par_pas(traj_disc, var_disc)
+        # Le dernier pas d'un intervalle peut être plus court que les autres.
+        quaternions = cm.quaternions_lot(trajectoire[:, 3:6])
+        _, decalages = cm.planification_pas(
+            trajectoire, cm.pas_maximal, quaternions if slerp else None)
+        rapports = [angles_pas[debut_i:fin_i - 1].max() /
+                    angles_pas[debut_i:fin_i - 1].min()
+                    for debut_i, fin_i in zip(decalages[:-1], decalages[1:])
+                    if fin_i - debut_i > 2]
+        print("%10s %10d %10.1f %14.3f %14.3f" % (
+            "SLERP" if slerp else "angles", len(var_disc),
+            1e9 * duree / len(var_disc), np.degrees(angles_pas.max()),
+            max(rapports)))
+
+
+def bench_profilage(nb_pas):
+    """
+    Coût de l'instrumentation des étapes (voir profiling) sur la commande en
+    flux d'une trajectoire de nb_pas pas : désactivée, activée sans et avec
+    le suivi de la mémoire. Désactivée, elle doit être invisible ; le suivi
+    de la mémoire par tracemalloc coûte, lui, sur chaque allocation.
+    """
+    import profiling
+
+    print("### instrumentation des étapes (%d pas) ###" % nb_pas)
+    geometrie = cm.GEOMETRIE_MAQUETTE
+    trajectoire = trajectoire_synthetique(nb_pas // 100 + 1, 100,
+                                          geometrie.pas_maximal)
+    trajectoire[:, 0:3] += 0.5
+    for nom, memoire in [("désactivée", None), ("sans mémoire", False),
+                         ("avec mémoire", True)]:
+        if memoire is None:
+            profiling.profiler.disable()
+        else:
+            profiling.profiler.enable(memory=memoire)
+        # Meilleur de 3 passages : l'écart cherché est plus petit que le bruit
+        # d'une mesure isolée.
+        durees = []
+        for _ in range(3):
+            profiling.profiler.reset()
+            debut = time.perf_counter()
+            for _ in cm.commande_ticks_flux(trajectoire, geometrie, 4096):
+                pass
+            durees.append(time.perf_counter() - debut)
+        duree = min(durees)
+        print("%14s : %8.3f s, %6.1f ns/pas, %d étapes mesurées"
+              % (nom, duree, 1e9 * duree / nb_pas,
+                 len(profiling.profiler.stages)))
+    profiling.profiler.disable()
+
+
+def bench_texte(nb_lignes):
+    """
+    Lecture d'une trajectoire de nb_lignes lignes enregistrée en texte (txt et
+    csv) : np.loadtxt, l'analyse par morceaux de text_trajectory, la première
+    lecture qui écrit le fichier npy annexe, et les lectures suivantes qui ne
+    font que le projeter en mémoire.
+    """
+    import text_trajectory
+    from command_cache import CommandCache
+
+    print("### lecture des trajectoires en texte (%d lignes) ###" % nb_lignes)
+    trajectoire = np.random.default_rng(0).uniform(-1, 1, (nb_lignes, 6))
+    with tempfile.TemporaryDirectory() as dossier:
+        annexes = CommandCache(os.path.join(dossier, "annexes"), 2**40)
+        for format, separateur in [("txt", None), ("csv", ",")]:
+            chemin = os.path.join(dossier, "trajectoire." + format)
+            np.savetxt(chemin, trajectoire,
+                       delimiter=" " if separateur is None else separateur)
+            print("%s (%.1f Mo)" % (format, os.path.getsize(chemin) / 2**20))
+            mesures = [
+                ("np.loadtxt", lambda: np.loadtxt(chemin, delimiter=separateur)),
+                ("par morceaux", lambda: text_trajectory.parse(chemin, separateur)),
+                ("1re lecture", lambda: text_trajectory.load(chemin, separateur, annexes)[0]),
+                ("annexe npy", lambda: text_trajectory.load(chemin, separateur, annexes)[0]),
+            ]
+            for nom, lecture in mesures:
+                debut = time.perf_counter()
+                lu = lecture()
+                duree = time.perf_counter() - debut
+                if not np.array_equal(lu, trajectoire):
+                    print("  !!! %s : trajectoire lue différente" % nom)
+                print("%14s : %8.3f s, %8.1f ns/ligne"
+                      % (nom, duree, 1e9 * duree / nb_lignes))
+
+
+def bench_directe(nb_mesures, frequence=100, nb_appels=1000):
+    """
+    Cinématique directe sur l'enregistrement synthétique d'une séance de
+    nb_mesures longueurs mesurées à frequence Hz : un appel par mesure,
+    repartant de la solution précédente comme le ferait la boucle de
+    commande (temps par appel comparé à la période), puis l'enregistrement
+    entier par blocs. Les longueurs sont aussi arrondies aux ticks des
+    moteurs, comme le seraient des longueurs tirées de la commande.
+    """
+    print("### cinématique directe (%d mesures à %d Hz) ###"
+          % (nb_mesures, frequence))
+    geometrie = cm.GEOMETRIE_MAQUETTE
+    centre = cm.position_centrale(geometrie)
+    temps = np.arange(nb_mesures)[:, np.newaxis] / frequence
+    pulsations = np.array([0.2, 0.13, 0.05, 0.1, 0.07, 0.03])
+    amplitudes = np.array([0.3, 0.3, 0.2, 0.2, 0.15, 0.3])
+    positions = centre + amplitudes * np.sin(pulsations * temps)
+    longueurs = cm.calcul_longueurs_cables_lot(positions, geometrie)
+    ticks = (np.round(longueurs / geometrie.longueur_tick) *
+             geometrie.longueur_tick)
+
+    durees = []
+    position = positions[0]
+    for mesure in ticks[:nb_appels]:
+        debut = time.perf_counter()
+        trouvees, rapport = cm.cinematique_directe_lot(mesure, geometrie,
+                                                       position)
+        durees.append(time.perf_counter() - debut)
+        position = trouvees[0]
+    durees = np.array(durees)
+    print("%14s : %8.1f µs médian, %8.1f µs au pire, %.1f %% de la période"
+          % ("un appel", 1e6 * np.median(durees), 1e6 * durees.max(),
+             100 * durees.max() * frequence))
+
+    for nom, mesures in [("exactes", longueurs), ("en ticks", ticks)]:
+        debut = time.perf_counter()
+        trouvees, rapport = cm.cinematique_directe(mesures, geometrie,
+                                                   positions[0])
+        duree = time.perf_counter() - debut
+        print("%14s : %8.3f s, %8.1f µs/mesure, %d/%d convergées, "
+              "%.1f itérations en moyenne, écart max %.2e m, "
+              "erreur de position max %.2e"
+              % (nom, duree, 1e6 * duree / nb_mesures, rapport["convergees"],
+                 nb_mesures, rapport["iterations_moyenne"],
+                 rapport["residu_max"],
+                 np.abs(trouvees - positions).max()))
+
+
+def bench_simulation(duree, frequence=100):
+    """
+    Rejeu plus rapide que le temps réel (voir simulation) d'une trajectoire
+    de duree secondes commandée à frequence Hz : commandes calculées au fil
+    de l'eau comme dans l'outil, puis déjà calculées, comme lues du cache.
+    Donne le nombre de commandes par seconde, le temps de rejeu et ce que
+    le robot simulé a relevé (échéances manquées, moteurs saturés).
+    """
+    import asyncio
+    import cable_robot as cr
+    import simulation
+
+    nb_pas = int(duree * frequence)
+    print("### robot simulé (%d s à %d Hz, %d commandes) ###"
+          % (duree, frequence, nb_pas))
+    # Pas 10 fois plus petits que ceux de la maquette, pour que les moteurs
+    # suivent à frequence Hz.
+    geometrie = cm.RobotGeometry(pas_maximal=cm.pas_maximal / 10)
+    trajectoire = trajectoire_synthetique(nb_pas // 100 + 1, 100,
+                                          geometrie.pas_maximal)
+    trajectoire[:, 0:3] += 0.5
+    commandes = np.concatenate(list(cm.commande_ticks_flux(
+        trajectoire, geometrie, 4096)))
+    horloge = simulation.VirtualClock()
+    robot = simulation.SimulatedRobot(
+        geometrie.vitesse_cable_max / geometrie.longueur_tick,
+        2.0 / geometrie.longueur_tick, clock=horloge.time)
+    cr.use_backend(robot)
+    for nom, source in [
+            ("au fil de l'eau", lambda: cm.commande_ticks_flux(
+                trajectoire, geometrie, 4096)),
+            ("précalculées", lambda: commandes)]:
+        robot.start(1 / frequence)
+        ordonnanceur = cr.StepScheduler(1 / frequence, clock=horloge.time,
+                                        sleep=horloge.sleep,
+                                        sleep_async=horloge.sleep_async)
+        debut = time.perf_counter()
+        asyncio.run(cr.auto_async(source(), ordonnanceur))
+        duree_rejeu = time.perf_counter() - debut
+        rapport = robot.report()
+        print("%16s : %8.3f s (%.0f fois le temps réel), %8.0f commandes/s, "
+              "%d échéances manquées, %d pas de moteur saturés"
+              % (nom, duree_rejeu, rapport["simulated_time"] / duree_rejeu,
+                 rapport["commands"] / duree_rejeu,
+                 rapport["missed_deadlines"], sum(rapport["saturated_steps"])))
+
+
+# Étapes de la commande mesurées par bench_pipeline. Chaque étape est une
+# fonction de la trajectoire qui renvoie le nombre de pas traités.
+def _etape_calcul_pas_adapte(trajectoire, geometrie):
+    return int(np.sum(cm.calcul_pas_adapte(trajectoire, geometrie.pas_maximal)))
+
+
+def _etape_discretisation(trajectoire, geometrie):
+    traj_disc, _ = cm.discretisation_trajectoire(trajectoire,
+                                                 geometrie.pas_maximal)
+    return len(traj_disc)
+
+
+def _etape_commande_longeurs_cables(trajectoire, geometrie):
+    # La discrétisation est faite avant la mesure (voir mesure_etape).
+    longueurs, _ = cm.commande_longeurs_cables(trajectoire, geometrie)
+    return len(longueurs)
+
+
+def _etape_commande(trajectoire, geometrie):
+    return len(cm.commande(trajectoire, geometrie))
+
+
+def _etape_commande_flux(trajectoire, geometrie):
+    return sum(len(bloc) for bloc in cm.commande_flux(trajectoire, geometrie))
+
+
+ETAPES = [
+    ("calcul_pas_adapte", _etape_calcul_pas_adapte),
+    ("discretisation_trajectoire", _etape_discretisation),
+    ("commande_longeurs_cables", _etape_commande_longeurs_cables),
+    ("commande", _etape_commande),
+    ("commande_flux", _etape_commande_flux),
+]
+
+
+def mesure_etape(nom, etape, trajectoire, geometrie, duree_min=1.0):
+    """
+    Mesure une étape de la commande sur une trajectoire : débit (en pas par
+    seconde, meilleur temps sur plusieurs répétitions) et mémoire maximale
+    allouée pendant l'étape (mesurée à part avec tracemalloc, qui ralentit
+    l'exécution).
+
+    :param nom: nom de l'étape
+    :param etape: fonction (trajectoire, geometrie) -> nombre de pas traités
+    :param trajectoire: trajectoire à commander
+    :param geometrie: géométrie du robot
+    :param duree_min: on répète la mesure jusqu'à y avoir passé ce temps (en
+    secondes), au plus 5 fois
+
+    :type nom: str
+    :type etape: function
+    :type trajectoire: np.array de dimension (n, 6)
+    :type geometrie: cm.RobotGeometry
+    :type duree_min: float
+
+    :return: dictionnaire des mesures
+    :rtype: dict
+    """
+    if nom == "commande_longeurs_cables":
+        trajectoire = cm.discretisation_trajectoire(trajectoire,
+                                                    geometrie.pas_maximal)
+
+    meilleur_temps = float("inf")
+    duree_totale = 0
+    repetitions = 0
+    while repetitions < 5 and (repetitions == 0 or duree_totale < duree_min):
+        debut = time.perf_counter()
+        nb_pas = etape(trajectoire, geometrie)
+        duree = time.perf_counter() - debut
+        meilleur_temps = min(meilleur_temps, duree)
+        duree_totale += duree
+        repetitions += 1
+
+    tracemalloc.start()
+    etape(trajectoire, geometrie)
+    _, memoire_max = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"pas": nb_pas,
+            "temps": meilleur_temps,
+            "pas_par_seconde": nb_pas / meilleur_temps,
+            "memoire_max": memoire_max}
+
+
+def bench_pipeline(max_points):
+    """
+    Mesure chacune des étapes de ETAPES sur des trajectoires aléatoires de
+    10^2 à max_points points (construites comme dans gen.py).
+
+    :param max_points: nombre de points de la plus grande trajectoire
+
+    :type max_points: int
+
+    :return: mesures par étape puis par nombre de points
+    :rtype: dict
+    """
+    print("### pipeline de commande ###")
+    print("%28s %10s %12s %12s %14s" % ("étape", "points", "pas",
+                                          "pas/s", "mémoire (Mo)"))
+    geometrie = cm.GEOMETRIE_MAQUETTE
+    resultats = {nom: {} for nom, _ in ETAPES}
+    nb_points = 100
+    while nb_points <= max_points:
+        trajectoire = np.random.default_rng(nb_points).random((nb_points, 6))
+        for nom, etape in ETAPES:
+            mesure = mesure_etape(nom, etape, trajectoire, geometrie)
+            resultats[nom][str(nb_points)] = mesure
+            print("%28s %10d %12d %12.4g %14.1f" % (
+                nom, nb_points, mesure["pas"], mesure["pas_par_seconde"],
+                mesure["memoire_max"] / 2**20))
+        nb_points *= 10
+    return resultats
+
+
+def comparaison(resultats, reference, seuil):
+    """
+    Compare des mesures de bench_pipeline à des mesures de référence. Une
+    étape régresse si son débit baisse, ou si sa mémoire maximale augmente,
+    de plus de la fraction seuil.
+
+    :param resultats: mesures actuelles
+    :param reference: mesures de référence
+    :param seuil: fraction de dégradation tolérée
+
+    :type resultats: dict
+    :type reference: dict
+    :type seuil: float
+
+    :return: liste des messages décrivant les régressions
+    :rtype: list
+    """
+    regressions = []
+    for nom, mesures in resultats.items():
+        for nb_points, mesure in mesures.items():
+            if nb_points not in reference.get(nom, {}):
+                continue
+            ancienne = reference[nom][nb_points]
+            rapport = mesure["pas_par_seconde"] / ancienne["pas_par_seconde"]
+            if rapport < 1 - seuil:
+                regressions.append(
+                    "%s (%s points) : %.4g pas/s au lieu de %.4g (x%.2f)" % (
+                        nom, nb_points, mesure["pas_par_seconde"],
+                        ancienne["pas_par_seconde"], rapport))
+            # Les petites allocations varient d'une exécution à l'autre, on ne
+            # compte pas le premier Mo.
+            if mesure["memoire_max"] > (1 + seuil) * ancienne["memoire_max"] + 2**20:
+                regressions.append(
+                    "%s (%s points) : %.1f Mo au lieu de %.1f Mo" % (
+                        nom, nb_points, mesure["memoire_max"] / 2**20,
+                        ancienne["memoire_max"] / 2**20))
+    return regressions
+
+
+def temps_import(module, repetitions=10):
+    """
+    Mesure le temps d'import à froid d'un module (en ms), chaque mesure étant
+    faite dans un nouvel interpréteur. Renvoie la médiane des mesures.
+
+    :param module: nom du module à importer
+    :param repetitions: nombre d'interpréteurs lancés
+
+    :type module: str
+    :type repetitions: int
+
+    :return: temps médian d'import en millisecondes
+    :rtype: float
+    """
+    code = ("import time\n"
+            "debut = time.perf_counter()\n"
+            "import %s\n"
+            "print(1000 * (time.perf_counter() - debut))" % module)
+    mesures = []
+    for _ in range(repetitions):
+        sortie = subprocess.run([sys.executable, "-c", code],
+                                capture_output=True, text=True, check=True)
+        mesures.append(float(sortie.stdout.split()[-1]))
+    return float(np.median(mesures))
+
+
+def bench_import():
+    """
+    Compare le temps d'import à froid de cable_math à celui de numpy seul :
+    l'import de la bibliothèque ne doit coûter que celui de numpy.
+    """
+    print("### import à froid ###")
+    for module in ["numpy", "cable_math", "mathPartieI"]:
+        print("%12s : %8.1f ms" % (module, temps_import(module)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mesures de performance du code de commande du robot.")
+    sous_commandes = parser.add_subparsers(dest="mesure", required=True)
+
+    parser_pipeline = sous_commandes.add_parser("pipeline", help="Débit et mémoire de chaque étape de la commande, avec comparaison à une référence.")
+    parser_pipeline.add_argument("--max-points", type=int, default=10**6, help="Nombre de points de la plus grande trajectoire mesurée.")
+    parser_pipeline.add_argument("--enregistrer", default=None, help="Fichier JSON dans lequel enregistrer les mesures comme nouvelle référence.")
+    parser_pipeline.add_argument("--reference", default=None, help="Fichier JSON de mesures de référence. Le programme échoue si une étape a régressé.")
+    parser_pipeline.add_argument("--seuil", type=float, default=0.25, help="Fraction de dégradation tolérée par rapport à la référence.")
+
+    parser_discretisation = sous_commandes.add_parser("discretisation", help="Passage à l'échelle de discretisation_trajectoire.")
+    parser_discretisation.add_argument("--max-pas", type=int, default=10**7, help="Nombre total de pas de la plus grande trajectoire mesurée.")
+
+    sous_commandes.add_parser("cinematique", help="Cinématique inverse par lots contre position par position.")
+
+    parser_incrementale = sous_commandes.add_parser("incrementale", help="Mode incrémental de commande_longeurs_cables contre le calcul exact.")
+    parser_incrementale.add_argument("--finesse", type=int, default=100, help="Facteur de réduction des pas maximaux (fréquence de commande).")
+    parser_incrementale.add_argument("--tolerance", type=float, default=cm.TOLERANCE_INCREMENTALE, help="Erreur estimée (m) au-delà de laquelle une longueur est recalculée exactement.")
+
+    parser_parallele = sous_commandes.add_parser("parallele", help="Mode parallèle de la discrétisation et du calcul des longueurs contre le calcul séquentiel.")
+    parser_parallele.add_argument("--max-processus", type=int, default=os.cpu_count(), help="Nombre maximal de processus mesuré.")
+
+    sous_commandes.add_parser("protocole", help="Débit du format binaire des commandes.")
+
+    sous_commandes.add_parser("quantification", help="Quantification des commandes en ticks des moteurs pas à pas.")
+
+    sous_commandes.add_parser("transport", help="Débit de la liaison série vers un faux contrôleur.")
+
+    parser_validation = sous_commandes.add_parser("validation", help="Temps de la validation d'une trajectoire avant son exécution.")
+    parser_validation.add_argument("--nb-pas", type=int, default=10**6, help="Nombre de pas de la trajectoire validée.")
+
+    parser_tensions = sous_commandes.add_parser("tensions", help="Débit de la vérification de faisabilité en tension.")
+    parser_tensions.add_argument("--max-processus", type=int, default=os.cpu_count(), help="Nombre maximal de processus mesuré.")
+
+    parser_profil = sous_commandes.add_parser("profil", help="Discrétisation à vitesse constante contre profils de vitesse.")
+    parser_profil.add_argument("--nb-points", type=int, default=1000, help="Nombre de points de passage de la trajectoire.")
+
+    sous_commandes.add_parser("orientation", help="Matrices de rotation par les quaternions et discrétisation par SLERP.")
+
+    parser_profilage = sous_commandes.add_parser("profilage", help="Coût de l'instrumentation des étapes de la commande.")
+    parser_profilage.add_argument("--nb-pas", type=int, default=2 * 10**6, help="Nombre de pas de la trajectoire commandée.")
+
+    parser_texte = sous_commandes.add_parser("texte", help="Lecture des trajectoires en texte et de leur fichier npy annexe.")
+    parser_texte.add_argument("--nb-lignes", type=int, default=10**6, help="Nombre de lignes de la trajectoire lue.")
+
+    parser_directe = sous_commandes.add_parser("directe", help="Cinématique directe à la fréquence de commande et sur un enregistrement entier.")
+    parser_directe.add_argument("--nb-mesures", type=int, default=10**6, help="Nombre de mesures de l'enregistrement.")
+
+    parser_simulation = sous_commandes.add_parser("simulation", help="Rejeu d'une longue trajectoire sur le robot simulé, plus vite que le temps réel.")
+    parser_simulation.add_argument("--duree", type=float, default=3600, help="Durée de la trajectoire rejouée, en secondes.")
+
+    sous_commandes.add_parser("import", help="Temps d'import à froid de la bibliothèque.")
+
+    args = parser.parse_args()
+
+    if args.mesure == "discretisation":
+        bench_discretisation(args.max_pas)
+    elif args.mesure == "cinematique":
+        bench_cinematique()
+    elif args.mesure == "incrementale":
+        bench_incrementale(args.finesse, args.tolerance)
+    elif args.mesure == "parallele":
+        bench_parallele(args.max_processus)
+    elif args.mesure == "protocole":
+        bench_protocole()
+    elif args.mesure == "quantification":
+        bench_quantification()
+    elif args.mesure == "transport":
+        bench_transport()
+    elif args.mesure == "validation":
+        bench_validation(args.nb_pas)
+    elif args.mesure == "tensions":
+        bench_tensions(args.max_processus)
+    elif args.mesure == "profil":
+        bench_profil(args.nb_points)
+    elif args.mesure == "orientation":
+        bench_orientation()
+    elif args.mesure == "profilage":
+        bench_profilage(args.nb_pas)
+    elif args.mesure == "texte":
+        bench_texte(args.nb_lignes)
+    elif args.mesure == "directe":
+        bench_directe(args.nb_mesures)
+    elif args.mesure == "simulation":
+        bench_simulation(args.duree)
+    elif args.mesure == "import":
+        bench_import()
+    else:
+        resultats = bench_pipeline(args.max_points)
+        if args.enregistrer is not None:
+            with open(args.enregistrer, "w") as fichier:
+                json.dump({"machine": platform.platform(),
+                           "numpy": np.__version__,
+                           "resultats": resultats}, fichier, indent=2)
+            print("Mesures enregistrées dans %s" % args.enregistrer)
+        if args.reference is not None:
+            with open(args.reference) as fichier:
+                reference = json.load(fichier)["resultats"]
+            regressions = comparaison(resultats, reference, args.seuil)
+            if regressions:
+                print("\nRégressions par rapport à %s :" % args.reference)
+                for regression in regressions:
+                    print(" - " + regression)
+                sys.exit(1)
+            print("\nAucune régression par rapport à %s" % args.reference)
@@ -0,0 +1,2365 @@
+# coding: utf8
+
+# Bibliothèque de calcul de la commande du robot à câbles : discrétisation de
+# la trajectoire, longueurs des câbles et commande des moteurs.
+# L'import de ce module ne fait aucun calcul ni affichage, et n'a besoin que
+# de numpy ; la démonstration avec tracé des courbes est dans mathPartieI.py.
+
+# On suppose que l'on a une série de points en entrée, on s'occupera
+# de ce détail plus tard.
+# On considère le pas de temps comme imposé dans la cadre arduino
+
+import json
+import inspect
+import itertools
+import numpy as np
+
+import profiling
+
+############### Première partie : Discrétisation de la trajectoire ############
+
+# 3 longeurs en m
+pas_translation_x = 0.01
+pas_translation_y = 0.01
+pas_translation_z = 0.01
+# 3 angles en radian
+pas_rotation_alpha = 3.14/180
+pas_rotation_beta = 3.14/180
+pas_rotation_gamma = 3.14/180
+# vecteur des pas maximaux que l'on s'autorise
+pas_maximal = np.array([pas_translation_x, pas_translation_y,
+                        pas_translation_z, pas_rotation_alpha,
+                        pas_rotation_beta, pas_rotation_gamma])
+
+# Nombre de pas traités à la fois par les calculs par lots et par les
+# générateurs de la commande en flux, pour borner la mémoire utilisée.
+TAILLE_LOT = 65536
+
+def calcul_pas_adapte(trajectoire, pas_maximal):
+    """
+    Donne le nombre de pas à effectuer pour chaque dimension pour une étape
+    dans la trajectoire.
+
+    Pour calculer le pas adapté, on calcule le nombre de pas minimal que l'on
+    devra faire pour aller de la source à la destination (la dimension dont le
+    pas est le plus petit dicte le nombre de pas). Le calcul est fait pour
+    tous les intervalles à la fois. Un intervalle de longueur nulle (point de
+    passage répété) demande 0 pas.
+
+    :param trajectoire: Trajectoire souhaitée
+    :param pas_maximal: vecteur de taille 6 des pas maximaux
+
+    :type trajectoire: np.array
+    :type pas_maximal: np.array de taille 6
+
+    :return: Vecteur de taille 9 des pas pour chaque intervalle
+    :rtype: np.array
+    """
+
+    trajectoire = np.asarray(trajectoire, dtype=float)
+    nombre_pas_detail = np.abs(np.diff(trajectoire, axis=0))
+    nombre_pas_detail /= pas_maximal
+    return np.ceil(np.amax(nombre_pas_detail, axis=1,
+                           initial=0)).astype(int)
+
+
+def planification_pas(trajectoire, pas_maximal, quaternions=None):
+    """
+    Donne le nombre de pas de chaque intervalle (voir calcul_pas_adapte) et
+    l'indice du premier pas de chaque intervalle dans la trajectoire
+    discrétisée. Le dernier décalage est le nombre total de pas, si bien que
+    les pas de l'intervalle i sont ceux d'indices decalages[i] à
+    decalages[i + 1] (exclu) ; voir intervalle_du_pas pour le sens inverse.
+
+    Si les orientations sont interpolées par SLERP (quaternions des points
+    de passage donnés), le pas angulaire est l'angle de la rotation faite à
+    chaque pas, borné par le plus petit des trois pas maximaux angulaires, à
+    la place des écarts entre les angles.
+
+    :param trajectoire: Trajectoire souhaitée
+    :param pas_maximal: vecteur de taille 6 des pas maximaux
+    :param quaternions: quaternions des points de passage
+
+    :type trajectoire: np.array de dimension (n, 6)
+    :type pas_maximal: np.array de taille 6
+    :type quaternions: np.array de dimension (n, 4)
+
+    :return: nombres de pas et décalages
+    :rtype: (np.array de taille n - 1, np.array de taille n)
+    """
+
+    with profiling.stage("planning", len(trajectoire)):
+        if quaternions is None:
+            nombre_pas = calcul_pas_adapte(trajectoire, pas_maximal)
+        else:
+            trajectoire = np.asarray(trajectoire, dtype=float)
+            nombre_pas = calcul_pas_adapte(trajectoire[:, 0:3],
+                                           pas_maximal[0:3])
+            cosinus = np.abs(np.einsum('ni,ni->n', quaternions[:-1],
+                                       quaternions[1:]))
+            angles = 2 * np.arccos(np.minimum(cosinus, 1))
+            np.maximum(nombre_pas,
+                       np.ceil(angles / np.min(pas_maximal[3:6])).astype(int),
+                       out=nombre_pas)
+    decalages = np.zeros(len(nombre_pas) + 1, dtype=int)
+    np.cumsum(nombre_pas, out=decalages[1:])
+    return nombre_pas, decalages
+
+
+def intervalle_du_pas(decalages, indices_pas):
+    """
+    Retrouve par dichotomie (en O(log n)) l'intervalle de la trajectoire
+    auquel appartiennent des pas de la trajectoire discrétisée, ainsi que le
+    rang de chaque pas dans son intervalle. Les intervalles sans pas ne sont
+    jamais renvoyés. Permet de reprendre une trajectoire à n'importe quel pas.
+
+    :param decalages: décalages renvoyés par planification_pas
+    :param indices_pas: indices de pas, entre 0 et decalages[-1] (exclu)
+
+    :type decalages: np.array de taille n
+    :type indices_pas: int ou np.array d'entiers
+
+    :return: indices des intervalles et rangs des pas dans leurs intervalles
+    :rtype: (np.array d'entiers, np.array d'entiers)
+    """
+
+    intervalles = np.searchsorted(decalages, indices_pas, side='right') - 1
+    return intervalles, indices_pas - decalages[intervalles]
+
+
+def discretisation_trajectoire(trajectoire, pas_maximal, slerp=False):
+    """
+    Discrétise la trajectoire souhaitée en divisant les parties trop grandes en
+    pas de longueurs constantes par morceaux plus petits que pas_maximal.
+    Renvoie 2 listes :
+    1. la liste des points par lesquels il faut passer, inutile pour les
+    moteurs mais utile pour tracer les courbes de trajectoire ;
+    2. la liste des déplacements infinitésimaux qu'il faut pour passer d'un
+    point à un autre. Chacun de ces déplacements infintésimaux est un np.arra
+    de 6 dimensions, 3 en position et 3 angulaires.
+
+    Le ième déplacement fait passer du ième point au suivant, les deux arrays
+    ont donc autant de lignes que de pas au total. Ils sont alloués une seule
+    fois et remplis intervalle par intervalle, le coût est linéaire en le
+    nombre de pas.
+
+    Par défaut les trois angles sont interpolés linéairement, comme les
+    positions : le mobile ne tourne alors ni autour d'un axe fixe ni à
+    vitesse angulaire constante. Avec slerp, les orientations des points de
+    passage sont converties une fois en quaternions (voir quaternions_lot)
+    et interpolées par slerp_lot : chaque intervalle est la plus courte
+    rotation uniforme autour d'un axe fixe, dont les angles sont redonnés à
+    chaque pas, et c'est l'angle de la rotation de chaque pas qui est borné
+    (voir planification_pas). Les déplacements angulaires sont ramenés dans
+    [-pi, pi] ; ils ne sont petits que si theta reste loin de pi / 2, où
+    les angles sont singuliers.
+
+    :param trajectoire: Trajectoire souhaitée
+    :param pas_maximal: vecteur de taille 6 des pas maximaux
+    :param slerp: interpolation sphérique des orientations
+
+    :type trajectoire: np.array
+    :type pas_maximal: np.array de taille 6
+    :type slerp: bool
+
+    :return: Couple d'arrays de dimension (nombre total de pas, 6)
+    :rtype: (np.array, np.array)
+    """
+
+    trajectoire = np.asarray(trajectoire, dtype=float)
+    quaternions = quaternions_lot(trajectoire[:, 3:6]) if slerp else None
+    nombre_pas, decalages = planification_pas(trajectoire, pas_maximal,
+                                              quaternions)
+    nb_pas_total = int(decalages[-1])
+
+    # Les deux tableaux sont alloués une seule fois : remplir ligne par ligne
+    # avec np.append recopiait tout le tableau à chaque pas (coût quadratique).
+    traj_disc = np.empty((nb_pas_total, 6))
+    var_disc = np.empty((nb_pas_total, 6))
+    _remplissage_discretisation(trajectoire, nombre_pas, decalages,
+                                0, nb_pas_total, traj_disc, var_disc,
+                                quaternions)
+
+    return traj_disc, var_disc
+
+
+def discretisation_trajectoire_flux(trajectoire, pas_maximal,
+                                    taille_bloc=TAILLE_LOT, slerp=False):
+    """
+    Version en flux de discretisation_trajectoire : renvoie un générateur des
+    mêmes points et déplacements infinitésimaux, par blocs de taille_bloc pas
+    (le dernier bloc pouvant être plus petit). Les blocs mis bout à bout sont
+    identiques au résultat de discretisation_trajectoire.
+
+    La trajectoire elle-même est parcourue par fenêtres de TAILLE_LOT points :
+    seuls la fenêtre et le bloc courants sont en mémoire, ce qui permet de
+    donner une trajectoire projetée en mémoire (np.load(..., mmap_mode='r')
+    ou np.memmap) sans jamais la charger entièrement.
+
+    :param trajectoire: Trajectoire souhaitée
+    :param pas_maximal: vecteur de taille 6 des pas maximaux
+    :param taille_bloc: nombre de pas de chaque bloc
+    :param slerp: interpolation sphérique des orientations
+
+    :type trajectoire: np.array de dimension (n, 6)
+    :type pas_maximal: np.array de taille 6
+    :type taille_bloc: int
+    :type slerp: bool
+
+    :return: générateur de couples d'arrays de dimension (taille_bloc, 6)
+    :rtype: generator
+    """
+
+    traj_bloc = np.empty((taille_bloc, 6))
+    var_bloc = np.empty((taille_bloc, 6))
+    rempli = 0
+
+    for debut_fenetre in range(0, len(trajectoire) - 1, TAILLE_LOT):
+        # Les fenêtres se recouvrent d'un point : le dernier point d'une
+        # fenêtre est le premier de la suivante.
+        fenetre = np.array(
+            trajectoire[debut_fenetre:debut_fenetre + TAILLE_LOT + 1],
+            dtype=float)
+        quaternions = quaternions_lot(fenetre[:, 3:6]) if slerp else None
+        nombre_pas, decalages = planification_pas(fenetre, pas_maximal,
+                                                  quaternions)
+        nb_pas_fenetre = int(decalages[-1])
+
+        debut = 0
+        while debut < nb_pas_fenetre:
+            fin = min(debut + taille_bloc - rempli, nb_pas_fenetre)
+            _remplissage_discretisation(fenetre, nombre_pas, decalages,
+                                        debut, fin,
+                                        traj_bloc[rempli:rempli + fin - debut],
+                                        var_bloc[rempli:rempli + fin - debut],
+                                        quaternions)
+            rempli += fin - debut
+            debut = fin
+            if rempli == taille_bloc:
+                yield traj_bloc, var_bloc
+                traj_bloc = np.empty((taille_bloc, 6))
+                var_bloc = np.empty((taille_bloc, 6))
+                rempli = 0
+
+    if rempli > 0:
+        yield traj_bloc[:rempli], var_bloc[:rempli]
+
+
+def _remplissage_discretisation(trajectoire, nombre_pas, decalages,
+                                debut, fin, traj_disc, var_disc,
+                                quaternions=None):
+    # Remplit traj_disc et var_disc avec les pas d'indices debut à fin (exclu)
+    # de la trajectoire discrétisée, sans boucle sur les pas. nombre_pas et
+    # decalages sont ceux de planification_pas. Si les quaternions des points
+    # de passage sont donnés, les orientations sont interpolées par SLERP.
+    if fin <= debut:
+        return
+    debut_intervalle = decalages[:-1]
+    fin_intervalle = decalages[1:]
+
+    # Intervalles contenant le premier et le dernier pas demandés.
+    (premier, dernier), _ = intervalle_du_pas(decalages, [debut, fin - 1])
+    intervalles = np.arange(premier, dernier + 1)
+
+    # Déplacement infinitésimal (constant) de chacun de ces intervalles. Les
+    # intervalles sans pas n'ont pas de déplacement, ils ne sont jamais
+    # recopiés ci-dessous.
+    variations = ((trajectoire[intervalles + 1] - trajectoire[intervalles]) /
+                  np.maximum(nombre_pas[intervalles, np.newaxis], 1))
+
+    # Pour chaque pas : numéro de l'intervalle auquel il appartient et rang du
+    # pas à l'intérieur de cet intervalle.
+    nb_pas_tronque = (np.minimum(fin_intervalle[intervalles], fin) -
+                      np.maximum(debut_intervalle[intervalles], debut))
+    intervalle = np.repeat(np.arange(len(intervalles)), nb_pas_tronque)
+    rang = np.arange(debut, fin, dtype=float)
+    rang -= debut_intervalle[intervalles][intervalle]
+
+    np.take(variations, intervalle, axis=0, out=var_disc)
+    np.take(trajectoire[intervalles], intervalle, axis=0, out=traj_disc)
+    for dimension in range(6):
+        traj_disc[:, dimension] += rang * var_disc[:, dimension]
+
+    if quaternions is not None:
+        _remplissage_slerp(quaternions, nombre_pas, intervalles, intervalle,
+                           rang, traj_disc, var_disc)
+
+
+def _remplissage_slerp(quaternions, nombre_pas, intervalles, intervalle,
+                       rang, traj_disc, var_disc):
+    # Remplace les angles interpolés linéairement par ceux de l'interpolation
+    # sphérique entre les quaternions des points de passage, au début de
+    # chaque pas et à la fin du dernier : les déplacements angulaires sont
+    # les différences de ces angles.
+    pas_intervalle = np.append(intervalle, intervalle[-1])
+    fractions = np.append(rang, rang[-1] + 1)
+    fractions /= np.maximum(nombre_pas[intervalles], 1)[pas_intervalle]
+    lineaires = np.concatenate([traj_disc[:, 3:6],
+                                traj_disc[-1:, 3:6] + var_disc[-1:, 3:6]])
+    angles = _angles_slerp(quaternions[intervalles],
+                           quaternions[intervalles + 1], pas_intervalle,
+                           fractions, lineaires)
+    traj_disc[:, 3:6] = angles[:-1]
+    var_disc[:, 3:6] = _difference_angles(angles)
+
+
+def _angles_slerp(departs, arrivees, intervalle, fractions, lineaires):
+    # Angles de l'interpolation sphérique de departs[k] à arrivees[k] (une
+    # ligne par intervalle) pour chaque échantillon, k étant donné par
+    # intervalle. Ce qui ne dépend que de l'intervalle est calculé une fois
+    # par intervalle. Les angles convertis sont ramenés à moins d'un
+    # demi-tour des angles interpolés linéairement (lineaires), pour suivre
+    # les angles de la trajectoire même au-delà de [-pi, pi], et les points
+    # de passage sont repris tels quels.
+    arrivees, angles_slerp, inverses = _preparation_slerp(departs, arrivees)
+    angles = angles_quaternions_lot(_interpolation_slerp(
+        np.take(departs, intervalle, axis=0),
+        np.take(arrivees, intervalle, axis=0),
+        angles_slerp[intervalle], inverses[intervalle], fractions))
+    angles += 2 * np.pi * np.round((lineaires - angles) / (2 * np.pi))
+    extremites = (fractions == 0) | (fractions == 1)
+    angles[extremites] = lineaires[extremites]
+    return angles
+
+
+def _difference_angles(angles):
+    # Déplacements angulaires entre angles successifs : la différence de
+    # deux angles n'est définie qu'à un nombre de tours près, elle est
+    # ramenée dans [-pi, pi].
+    variations = np.diff(angles, axis=0)
+    variations -= 2 * np.pi * np.round(variations / (2 * np.pi))
+    return variations
+
+
+class ProfilVitesse(object):
+    """
+    Paramétrage temporel de la trajectoire, à la place de la discrétisation
+    à vitesse constante par intervalle de discretisation_trajectoire, dont
+    la vitesse saute à chaque point de passage.
+
+    La trajectoire est parcourue le long des mêmes segments, mais avec un
+    profil de vitesse trapézoïdal : le mobile accélère et décélère à
+    acceleration_max, roule à vitesse_max sur les parties droites, et ne
+    ralentit qu'à l'approche des points de passage où la direction change,
+    d'autant plus que le changement est grand. La position est ensuite
+    échantillonnée à chaque pas de temps (la fréquence de commande), si
+    bien que chaque pas de la trajectoire discrétisée dure pas_temps.
+
+    Sur un segment, l'accélération ne dépasse pas acceleration_max ; aux
+    points de passage, le changement de direction s'y ajoute, si bien que
+    l'accélération de chaque coordonnée reste sous 2 acceleration_max.
+
+    Si secousse_max est donné, le mouvement est lissé en courbe en S : les
+    positions sont moyennées sur une fenêtre glissante de durée
+    4 acceleration_max / secousse_max, ce qui borne la secousse (dérivée de
+    l'accélération) sans augmenter la vitesse ni l'accélération. Le mobile
+    coupe alors légèrement les virages aux points de passage, mais reste sur
+    les segments partout ailleurs, et part et arrive toujours exactement aux
+    extrémités de la trajectoire.
+
+    Les distances sont mesurées en pas maximaux (voir calcul_pas_adapte) :
+    la longueur d'un segment est son plus grand déplacement divisé par le
+    pas maximal de la dimension. Les vitesses sont donc en pas maximaux par
+    seconde, les accélérations en pas maximaux par seconde² et la secousse
+    en pas maximaux par seconde³. La vitesse est limitée à 1 / pas_temps,
+    qui est aussi sa valeur par défaut : un pas ne dépasse jamais le pas
+    maximal, comme dans discretisation_trajectoire.
+
+    Avec slerp, les orientations sont interpolées par SLERP le long de
+    chaque segment, comme dans discretisation_trajectoire.
+
+    Tout est calculé par lots : les vitesses aux points de passage par deux
+    minima cumulés (un dans chaque sens), une fois pour toute la
+    trajectoire, puis la position à chaque pas de temps par dichotomie dans
+    les horaires des segments, comme dans intervalle_du_pas, bloc par bloc
+    avec discretisation_flux.
+    """
+
+    def __init__(self, pas_temps, acceleration_max, vitesse_max=None,
+                 secousse_max=None, slerp=False):
+        self.pas_temps = float(pas_temps)
+        self.slerp = bool(slerp)
+        self.vitesse_max = (1 / self.pas_temps if vitesse_max is None
+                            else min(float(vitesse_max), 1 / self.pas_temps))
+        self.acceleration_max = float(acceleration_max)
+        self.secousse_max = (None if secousse_max is None
+                             else float(secousse_max))
+        if self.pas_temps <= 0 or self.vitesse_max <= 0:
+            raise ValueError("Le pas de temps et la vitesse maximale doivent "
+                             "être positifs")
+        if self.acceleration_max <= 0:
+            raise ValueError("L'accélération maximale doit être positive")
+        if self.secousse_max is not None and self.secousse_max <= 0:
+            raise ValueError("La secousse maximale doit être positive")
+
+    def parametres(self):
+        # Tout ce dont dépend la trajectoire discrétisée, pour le cache des
+        # commandes.
+        return np.array([self.pas_temps, self.vitesse_max,
+                         self.acceleration_max,
+                         self.secousse_max or 0.0, float(self.slerp)])
+
+    def discretisation(self, trajectoire, pas_maximal):
+        """
+        Équivalent de discretisation_trajectoire avec ce profil de vitesse.
+
+        :param trajectoire: Trajectoire souhaitée
+        :param pas_maximal: vecteur de taille 6 des pas maximaux
+
+        :type trajectoire: np.array de dimension (n, 6)
+        :type pas_maximal: np.array de taille 6
+
+        :return: points et déplacements infinitésimaux, un par pas de temps
+        :rtype: (np.array de dimension (N, 6), np.array de dimension (N, 6))
+        """
+        return self._pas(self.positions(trajectoire, pas_maximal))
+
+    def discretisation_flux(self, trajectoire, pas_maximal,
+                            taille_bloc=TAILLE_LOT):
+        # Générateur de blocs de taille_bloc pas, comme
+        # discretisation_trajectoire_flux. Seul le profil (vitesses et
+        # horaires aux points de passage) dépend de toute la trajectoire : il
+        # est planifié une fois, en O(n), puis les positions sont calculées
+        # bloc par bloc, si bien que le premier bloc arrive sans attendre la
+        # discrétisation de toute la trajectoire.
+        horaire = self._horaire(trajectoire, pas_maximal)
+        nb_pas = horaire.nb_positions - 1
+        for debut in range(0, nb_pas, taille_bloc):
+            fin = min(debut + taille_bloc, nb_pas)
+            yield self._pas(self._positions_horaire(horaire, debut, fin + 1))
+
+    def _pas(self, positions):
+        # Points et déplacements infinitésimaux des pas entre positions
+        # successives.
+        variations = np.diff(positions, axis=0)
+        if self.slerp:
+            variations[:, 3:6] = _difference_angles(positions[:, 3:6])
+        return positions[:-1], variations
+
+    def positions(self, trajectoire, pas_maximal):
+        """
+        Positions du mobile à chaque pas de temps, du premier au dernier
+        point de passage inclus.
+
+        :param trajectoire: Trajectoire souhaitée
+        :param pas_maximal: vecteur de taille 6 des pas maximaux
+
+        :type trajectoire: np.array de dimension (n, 6)
+        :type pas_maximal: np.array de taille 6
+
+        :return: positions aux instants 0, pas_temps, 2 pas_temps, ...
+        :rtype: np.array de dimension (N + 1, 6)
+        """
+        horaire = self._horaire(trajectoire, pas_maximal)
+        return self._positions_horaire(horaire, 0, horaire.nb_positions)
+
+    def _horaire(self, trajectoire, pas_maximal):
+        # Planification du profil, une fois par point de passage : segments,
+        # vitesses de passage et horaire de chaque phase de chaque segment.
+        trajectoire = np.asarray(trajectoire, dtype=float)
+        horaire = _HoraireProfil()
+        horaire.nb_segments = 0
+        if len(trajectoire) == 0:
+            horaire.nb_positions = 0
+            return horaire
+        # Longueur de chaque segment en pas maximaux, comme dans
+        # calcul_pas_adapte (ou planification_pas pour les orientations
+        # interpolées par SLERP) mais sans arrondi.
+        if self.slerp:
+            quaternions = quaternions_lot(trajectoire[:, 3:6])
+            longueurs = np.amax(np.abs(np.diff(trajectoire[:, 0:3], axis=0)) /
+                                pas_maximal[0:3], axis=1, initial=0)
+            _, angles, _ = _preparation_slerp(quaternions[:-1],
+                                              quaternions[1:])
+            # Angle des quaternions, moitié de celui de la rotation ; un angle
+            # nul a été remplacé par un angle infime.
+            angles[angles < 1e-200] = 0
+            np.maximum(longueurs, 2 * angles / np.min(pas_maximal[3:6]),
+                       out=longueurs)
+        else:
+            longueurs = np.amax(np.abs(np.diff(trajectoire, axis=0)) /
+                                pas_maximal, axis=1, initial=0)
+        # Les points de passage répétés ne forment pas de segment.
+        gardes = np.concatenate([[True], longueurs > 0])
+        horaire.points = points = trajectoire[gardes]
+        longueurs = longueurs[longueurs > 0]
+        if len(longueurs) == 0:
+            horaire.nb_positions = 1
+            return horaire
+        horaire.nb_segments = len(longueurs)
+        horaire.longueurs = longueurs
+        horaire.directions = np.diff(points, axis=0) / longueurs[:, np.newaxis]
+        horaire.quaternions = quaternions[gardes] if self.slerp else None
+
+        vitesses = self._vitesses_passage(horaire.directions / pas_maximal,
+                                          longueurs)
+        self._phases(horaire, vitesses)
+        # Avec la courbe en S, chaque position lissée est la moyenne des
+        # fenetre positions qui la précèdent (voir _lissage).
+        horaire.fenetre = 1
+        if self.secousse_max is not None:
+            horaire.fenetre = max(int(np.ceil(4 * self.acceleration_max /
+                                              self.secousse_max /
+                                              self.pas_temps)), 1)
+        horaire.nb_positions = horaire.nb_pas + horaire.fenetre
+        return horaire
+
+    def _positions_horaire(self, horaire, debut, fin):
+        # Positions d'indices debut à fin (exclu) parmi les
+        # horaire.nb_positions positions du mobile.
+        if horaire.nb_segments == 0:
+            return np.repeat(horaire.points[:1], fin - debut, axis=0)
+        if horaire.fenetre == 1:
+            return self._positions_instants(horaire, np.arange(debut, fin))
+        return self._lissage(horaire, debut, fin)
+
+    def _vitesses_passage(self, directions, longueurs):
+        # Vitesse (en pas maximaux par seconde) à chaque point de passage.
+        # Le changement de direction à un point de passage fait varier la
+        # vitesse, en un pas de temps, de v |d_k - d_k-1| (en norme
+        # infinie) : la vitesse de passage est bornée pour que cette
+        # variation ne dépasse pas acceleration_max * pas_temps. Le mobile
+        # part et arrive à l'arrêt.
+        acceleration = self.acceleration_max
+        changements = np.abs(np.diff(directions, axis=0)).max(axis=1,
+                                                               initial=0)
+        limites = np.zeros(len(longueurs) + 1)
+        limites[1:-1] = np.minimum(
+            self.vitesse_max,
+            acceleration * self.pas_temps / np.maximum(changements, 1e-300))
+
+        # Il faut aussi pouvoir atteindre chaque vitesse depuis les points
+        # précédents, et s'arrêter à temps aux suivants : en carrés de
+        # vitesses, w_k <= w_k-1 + 2 a L_k, dont la solution est un minimum
+        # cumulé de w - S, S étant la somme cumulée des 2 a L.
+        carres = limites ** 2
+        cumul = np.zeros(len(longueurs) + 1)
+        np.cumsum(2 * acceleration * longueurs, out=cumul[1:])
+        avant = cumul + np.minimum.accumulate(carres - cumul)
+        cumul_inverse = cumul[-1] - cumul
+        apres = cumul_inverse + np.minimum.accumulate(
+            (carres - cumul_inverse)[::-1])[::-1]
+        return np.sqrt(np.maximum(np.minimum(avant, apres), 0))
+
+    def _phases(self, horaire, vitesses):
+        # Profil trapézoïdal de chaque segment : vitesse de départ et de
+        # pointe, durées d'accélération et de croisière, et horaire et
+        # abscisse (en pas maximaux) du début de chaque segment.
+        acceleration = self.acceleration_max
+        longueurs = horaire.longueurs
+        depart = vitesses[:-1]
+        arrivee = vitesses[1:]
+        pointe = np.minimum(self.vitesse_max, np.sqrt(
+            acceleration * longueurs + (depart ** 2 + arrivee ** 2) / 2))
+        pointe = np.maximum(pointe, np.maximum(depart, arrivee))
+        distance_acceleration = (pointe ** 2 - depart ** 2) / (2 * acceleration)
+        distance_croisiere = np.maximum(
+            longueurs - distance_acceleration -
+            (pointe ** 2 - arrivee ** 2) / (2 * acceleration), 0)
+        duree_acceleration = (pointe - depart) / acceleration
+        duree_croisiere = distance_croisiere / pointe
+        durees = (duree_acceleration + duree_croisiere +
+                  (pointe - arrivee) / acceleration)
+
+        horaire.horaires = np.zeros(len(longueurs) + 1)
+        np.cumsum(durees, out=horaire.horaires[1:])
+        horaire.debuts = np.zeros(len(longueurs) + 1)
+        np.cumsum(longueurs, out=horaire.debuts[1:])
+        horaire.depart = depart
+        horaire.pointe = pointe
+        horaire.duree_acceleration = duree_acceleration
+        horaire.duree_croisiere = duree_croisiere
+        horaire.nb_pas = int(np.ceil(horaire.horaires[-1] / self.pas_temps))
+
+    def _positions_instants(self, horaire, indices):
+        # Positions du mobile aux pas de temps d'indices donnés, ramenés
+        # entre 0 et nb_pas : avant le départ et après l'arrivée, le mobile
+        # est immobile. Chaque pas de temps est placé par dichotomie dans
+        # l'horaire des segments, comme dans intervalle_du_pas.
+        acceleration = self.acceleration_max
+        indices = np.clip(indices, 0, horaire.nb_pas)
+        derniers = indices == horaire.nb_pas
+        horaires = horaire.horaires
+        debuts = horaire.debuts
+        dernier_segment = horaire.nb_segments - 1
+
+        # Distance parcourue le long de la trajectoire (en pas maximaux) à
+        # chaque pas de temps.
+        instants = np.minimum(indices * self.pas_temps, horaires[-1])
+        segments = np.searchsorted(horaires, instants, side='right') - 1
+        np.clip(segments, 0, dernier_segment, out=segments)
+        # Temps écoulé depuis le début de chaque phase du segment.
+        t = instants - horaires[segments]
+        v0 = horaire.depart[segments]
+        vp = horaire.pointe[segments]
+        ta = horaire.duree_acceleration[segments]
+        tc = horaire.duree_croisiere[segments]
+        t_acceleration = np.minimum(t, ta)
+        t_croisiere = np.clip(t - ta, 0, tc)
+        t_deceleration = np.maximum(t - ta - tc, 0)
+        abscisses = debuts[segments]
+        abscisses += (v0 * t_acceleration +
+                      acceleration * t_acceleration ** 2 / 2)
+        abscisses += vp * t_croisiere
+        abscisses += (vp * t_deceleration -
+                      acceleration * t_deceleration ** 2 / 2)
+        abscisses[derniers] = debuts[-1]
+
+        # Position de chaque échantillon sur son segment.
+        segments = np.searchsorted(debuts, abscisses, side='right') - 1
+        np.clip(segments, 0, dernier_segment, out=segments)
+        positions = np.take(horaire.points, segments, axis=0)
+        avancements = abscisses - debuts[segments]
+        positions += (avancements[:, np.newaxis] *
+                      np.take(horaire.directions, segments, axis=0))
+        positions[derniers] = horaire.points[-1]
+        if self.slerp:
+            quaternions = horaire.quaternions
+            fractions = np.minimum(avancements / horaire.longueurs[segments],
+                                   1)
+            fractions[derniers] = 1
+            positions[:, 3:6] = _angles_slerp(quaternions[:-1],
+                                              quaternions[1:], segments,
+                                              fractions, positions[:, 3:6])
+        return positions
+
+    def _lissage(self, horaire, debut, fin):
+        # Positions lissées d'indices debut à fin (exclu) : moyenne glissante
+        # des positions sur fenetre pas de temps, le mobile restant immobile
+        # avant le départ et après l'arrivée. Chaque accélération (en norme
+        # infinie, au plus 2 acceleration_max) est moyennée sur la fenêtre,
+        # la secousse est donc au plus 4 acceleration_max / (fenetre
+        # pas_temps).
+        fenetre = horaire.fenetre
+        positions = self._positions_instants(
+            horaire, np.arange(debut - fenetre + 1, fin))
+        sommes = np.zeros((len(positions) + 1, 6))
+        np.cumsum(positions, axis=0, out=sommes[1:])
+        lissees = (sommes[fenetre:] - sommes[:-fenetre]) / fenetre
+        if debut == 0:
+            lissees[0] = horaire.points[0]
+        if fin == horaire.nb_positions:
+            lissees[-1] = horaire.points[-1]
+        return lissees
+
+
+class _HoraireProfil(object):
+    # Profil planifié par ProfilVitesse._horaire, d'où sont tirées les
+    # positions à n'importe quel pas de temps.
+    pass
+
+
+##################### Deuxième partie : Longueur des câbles ###################
+
+# Convertit les déplacements infintésimaux du mobile en variations de longueurs
+# des câbles en utilisant des matrices de rotation.
+
+# Dimensions physiques (en m) du mobile et du hangar de la maquette.
+DIMENSIONS_MOBILE = np.array([0.25, 0.25, 0.3])
+DIMENSIONS_HANGAR = np.array([1.25, 1.25, 1])
+# Diamètre (en m) des tambours sur lesquels s'enroulent les câbles.
+DIAMETRE_TAMBOUR = 0.009
+# Moteurs pas à pas : nombre de tours du moteur par tour de tambour, nombre de
+# pas par tour du moteur et nombre de micropas par pas du driver.
+RAPPORT_REDUCTION = 1
+PAS_PAR_TOUR = 200
+MICROPAS = 16
+# Numéro du coin du mobile auquel est attaché chaque câble (les câbles sont
+# croisés dans le hangar).
+CHGT_NUM = np.array([6, 7, 4, 5, 2, 3, 0, 1])
+# Mode incrémental : les longueurs ne sont calculées exactement que tous les
+# PERIODE_RESYNC pas et extrapolées entre deux avec la jacobienne des
+# longueurs par rapport à la position du mobile ; un pas dont l'erreur estimée
+# dépasse TOLERANCE_INCREMENTALE (en m) est recalculé exactement. Ce n'est
+# pas une accélération : aux pas par défaut de l'outil en ligne de commande
+# (pas_maximal), l'extrapolation dépasse la tolérance dès quelques pas et
+# tout est recalculé exactement, et même avec des pas cent fois plus fins le
+# gain ne dépasse pas 1,5 (avec des groupes de 64 pas), l'extrapolation par
+# lot coûtant presque autant que le calcul exact. C'est un outil de mesure
+# de l'erreur d'un calcul incrémental pour des pas fins (commande à haute
+# fréquence), voir rapport_erreur_incrementale.
+PERIODE_RESYNC = 16
+TOLERANCE_INCREMENTALE = 1e-5
+# Limites physiques vérifiées avant d'exécuter une trajectoire (voir
+# validation_trajectoire) : longueur minimale d'un câble (en m) et vitesse
+# maximale à laquelle un moteur enroule ou déroule son câble (en m/s). La
+# longueur maximale par défaut est la plus grande distance entre deux coins
+# du hangar.
+LONGUEUR_CABLE_MIN = 0.01
+VITESSE_CABLE_MAX = 0.15
+# La validation parcourt la trajectoire par blocs plus petits que TAILLE_LOT,
+# dont les tableaux intermédiaires restent dans le cache du processeur.
+TAILLE_BLOC_VALIDATION = 8192
+# Cinématique directe (voir cinematique_directe_lot) : nombre maximal
+# d'itérations de Levenberg-Marquardt, pas (en m et en radians) en dessous
+# duquel une position est considérée comme trouvée, amortissement de départ
+# et amortissement au-delà duquel on abandonne, et taille des blocs de
+# mesures successives résolus ensemble par cinematique_directe.
+ITERATIONS_DIRECTE = 50
+TOLERANCE_DIRECTE = 1e-9
+AMORTISSEMENT_INITIAL = 1e-4
+AMORTISSEMENT_MAX = 1e10
+TAILLE_BLOC_DIRECTE = 256
+
+
+def construction_mobile(dimensions):
+    """
+    Renvoie la liste de taille 8 des coordonnées des points du mobile ; chaque
+    coordonnée de coin du rectangle sera un array de taille 3 (x, y et z).
+    Attention, les croisements ne sont pas pris en compte.
+
+    :param dimensions: dimensions physiques du mobile que l'on souhaite
+    construire, array de dimension 3 (x, y et z)
+
+    :type dimensions: np.array
+
+    :return: liste de taille 8 des coordonnées des points du mobile
+    :rtype: np.array
+    """
+    lx = dimensions[0]
+    ly = dimensions[1]
+    lz = dimensions[2]
+
+    A6 = np.array([-lx/2, -ly/2, -lz/2])
+    A7 = np.array([-lx/2, -ly/2, lz/2])
+    A5 = np.array([-lx/2, ly/2, lz/2])
+    A4 = np.array([-lx/2, ly/2, -lz/2])
+    A0 = np.array([lx/2, -ly/2, -lz/2])
+    A1 = np.array([lx/2, -ly/2, lz/2])
+    A3 = np.array([lx/2, ly/2, lz/2])
+    A2 = np.array([lx/2, ly/2, -lz/2])
+
+    mobile = [A0, A1, A2, A3, A4, A5, A6, A7]
+    return mobile
+
+
+def construction_hangar(dimensions):
+    """
+    Renvoie la liste de taille 8 des coordonnées des points du hangar ; chaque
+    coordonnée de coin du rectangle est un array de taille 3 (x, y et z).
+    Le coin A6 doit être placé à l'origine.
+
+    :param dimensions: dimensions physiques du hangar que l'on souhaite
+    construire, array de dimension 3 (x, y et z)
+
+    :type trajectoire: np.array
+
+    :return: liste de taille 8 des coordonnées des points du hangar
+    :rtype: np.array
+    """
+    lx = dimensions[0]
+    ly = dimensions[1]
+    lz = dimensions[2]
+
+    A6 = np.array([0, 0, 0])
+    A7 = np.array([0, 0, lz])
+    A5 = np.array([0, ly, lz])
+    A4 = np.array([0, ly, 0])
+    A0 = np.array([lx, 0, 0])
+    A1 = np.array([lx, 0, lz])
+    A3 = np.array([lx, ly, lz])
+    A2 = np.array([lx, ly, 0])
+
+    hangar = [A0, A1, A2, A3, A4, A5, A6, A7]
+    return hangar
+
+
+class RobotGeometry(object):
+    """
+    Géométrie d'un robot à câbles : positions des points d'accroche des câbles
+    sur le hangar et sur le mobile, numérotation des câbles, diamètre des
+    tambours et pas maximaux. Tout est calculé une seule fois à la création,
+    les fonctions de cinématique n'ont plus qu'à lire ces tableaux.
+
+    Attributs (tous des np.array de flottants, contigus) :
+    - coins_mobile : coins du mobile centré à l'origine, dimension (8, 3) ;
+    - coins_hangar : coins du hangar, dimension (8, 3) ;
+    - chgt_num : numéro du coin du mobile auquel est attaché chaque câble ;
+    - coins_attache_transposes : coins du mobile permutés selon chgt_num et
+    rangés par coordonnée, dimension (3, 8) ;
+    - coins_hangar_transposes : coins du hangar rangés par coordonnée,
+    dimension (3, 8) ;
+    - diametre_tambour : diamètre (en m) des tambours des moteurs ;
+    - pas_maximal : vecteur de taille 6 des pas maximaux ;
+    - rapport_reduction, pas_par_tour, micropas : réduction entre moteur et
+    tambour, pas par tour du moteur et micropas par pas du driver ;
+    - longueur_tick : longueur de câble (en m) enroulée par un micropas ;
+    - longueur_cable_min, longueur_cable_max : longueurs extrêmes (en m) que
+    peut prendre un câble ;
+    - vitesse_cable_max : vitesse maximale (en m/s) d'enroulement d'un câble.
+
+    Un fichier de profil est un fichier JSON dont les clés sont les paramètres
+    du constructeur, par exemple :
+    {"dimensions_mobile": [0.25, 0.25, 0.3],
+     "dimensions_hangar": [1.25, 1.25, 1],
+     "diametre_tambour": 0.009}
+    Les clés absentes prennent la valeur de la maquette. coins_mobile et
+    coins_hangar permettent de donner directement les 8 points d'accroche
+    quand le robot n'est pas un pavé dans un pavé.
+    """
+
+    def __init__(self, dimensions_mobile=DIMENSIONS_MOBILE,
+                 dimensions_hangar=DIMENSIONS_HANGAR,
+                 diametre_tambour=DIAMETRE_TAMBOUR, pas_maximal=pas_maximal,
+                 chgt_num=CHGT_NUM, coins_mobile=None, coins_hangar=None,
+                 rapport_reduction=RAPPORT_REDUCTION,
+                 pas_par_tour=PAS_PAR_TOUR, micropas=MICROPAS,
+                 longueur_cable_min=LONGUEUR_CABLE_MIN,
+                 longueur_cable_max=None,
+                 vitesse_cable_max=VITESSE_CABLE_MAX):
+        if coins_mobile is None:
+            coins_mobile = construction_mobile(dimensions_mobile)
+        if coins_hangar is None:
+            coins_hangar = construction_hangar(dimensions_hangar)
+
+        self.coins_mobile = np.array(coins_mobile, dtype=float)
+        self.coins_hangar = np.array(coins_hangar, dtype=float)
+        self.chgt_num = np.array(chgt_num, dtype=int)
+        self.diametre_tambour = float(diametre_tambour)
+        self.pas_maximal = np.array(pas_maximal, dtype=float)
+        self.rapport_reduction = float(rapport_reduction)
+        self.pas_par_tour = int(pas_par_tour)
+        self.micropas = int(micropas)
+        self.longueur_cable_min = float(longueur_cable_min)
+        self.vitesse_cable_max = float(vitesse_cable_max)
+
+        if self.coins_mobile.shape != (8, 3):
+            raise ValueError("Le mobile doit avoir 8 coins de 3 coordonnées, "
+                             "pas %s" % (self.coins_mobile.shape,))
+        if self.coins_hangar.shape != (8, 3):
+            raise ValueError("Le hangar doit avoir 8 coins de 3 coordonnées, "
+                             "pas %s" % (self.coins_hangar.shape,))
+        if longueur_cable_max is None:
+            ecarts = self.coins_hangar[:, np.newaxis] - self.coins_hangar
+            longueur_cable_max = np.sqrt(np.sum(ecarts ** 2, axis=2)).max()
+        self.longueur_cable_max = float(longueur_cable_max)
+        if sorted(self.chgt_num) != list(range(8)):
+            raise ValueError("chgt_num doit être une permutation de 0 à 7, "
+                             "pas %s" % (self.chgt_num,))
+        if self.diametre_tambour <= 0:
+            raise ValueError("Le diamètre des tambours doit être positif")
+        if self.pas_maximal.shape != (6,) or np.any(self.pas_maximal <= 0):
+            raise ValueError("pas_maximal doit être un vecteur de 6 pas "
+                             "positifs, pas %s" % (self.pas_maximal,))
+        if (self.rapport_reduction <= 0 or self.pas_par_tour <= 0 or
+                self.micropas <= 0):
+            raise ValueError("Le rapport de réduction, le nombre de pas par "
+                             "tour et le nombre de micropas doivent être "
+                             "positifs")
+        if not 0 <= self.longueur_cable_min < self.longueur_cable_max:
+            raise ValueError("Les longueurs extrêmes des câbles doivent "
+                             "vérifier 0 <= longueur_cable_min < "
+                             "longueur_cable_max")
+        if self.vitesse_cable_max <= 0:
+            raise ValueError("La vitesse maximale des câbles doit être "
+                             "positive")
+
+        self.longueur_tick = (np.pi * self.diametre_tambour /
+                              (self.rapport_reduction * self.pas_par_tour *
+                               self.micropas))
+
+        self.coins_attache_transposes = np.ascontiguousarray(
+            self.coins_mobile[self.chgt_num].T)
+        self.coins_hangar_transposes = np.ascontiguousarray(
+            self.coins_hangar.T)
+
+    @classmethod
+    def depuis_profil(cls, chemin):
+        """
+        Lit la géométrie du robot dans un fichier de profil (voir la
+        documentation de la classe).
+
+        :param chemin: chemin du fichier de profil
+
+        :type chemin: str
+
+        :return: géométrie décrite par le profil
+        :rtype: RobotGeometry
+        """
+        with open(chemin) as fichier:
+            profil = json.load(fichier)
+        if not isinstance(profil, dict):
+            raise ValueError("Un profil doit être un objet JSON")
+        parametres = inspect.signature(cls).parameters
+        inconnus = [cle for cle in profil if cle not in parametres]
+        if inconnus:
+            raise ValueError("Clés inconnues dans le profil : %s"
+                             % ", ".join(inconnus))
+        return cls(**profil)
+
+
+# Géométrie de la maquette, utilisée quand aucun profil n'est donné.
+GEOMETRIE_MAQUETTE = RobotGeometry()
+
+
+def rotation(vecteur_rotation):
+    """
+    Renvoie la matrice de rotation associée aux angles de rotation.
+    Multiplier un vecteur par la matrice de rotation permettra de lui faire
+    subir les trois rotations.
+
+    :param vecteur_rotation: vecteur des 3 angles de rotation.
+    rho, theta et phi sont des déplacements angulaires du mobile autour des
+    trois vecteurs de la base du hangar.
+
+    :type vecteur_rotation: np.array de taille 3
+
+    :return: produit des trois matrices de rotations données respectivement
+    par les angles rho, theta, et phi
+    :rtype: np.array de dimension 3x3
+    """
+    rho = vecteur_rotation[0]
+    theta = vecteur_rotation[1]
+    phi = vecteur_rotation[2]
+
+    Rx = np.array([[1, 0, 0],
+                   [0, np.cos(rho), np.sin(rho)],
+                   [0, -np.sin(rho), np.cos(rho)]])
+
+    Ry = np.array([[np.cos(theta), 0, -np.sin(theta)],
+                   [0, 1, 0],
+                   [np.sin(theta), 0, np.cos(theta)]])
+
+    Rz = np.array([[np.cos(phi), np.sin(phi), 0],
+                   [-np.sin(phi), np.cos(phi), 0],
+                   [0, 0, 1]])
+
+    return np.dot(np.dot(Rx, Ry), Rz)
+
+
+def reconstruction_coins(position_mobile, geometrie):
+    """
+    Calcule la liste des positions des 8 coins du mobile à partir des
+    dimensions et des coordonnées du centre du mobile.
+    Renvoie la liste des positions des 8 coins. Chaque position est un
+    np.array de taille 3 (x, y, z).
+    On appelle cette fonction à chaque fois que l'on change les
+    coordonnées du mobile.
+    Méthode :
+    1. Création du mobile de bonnes dimensions mais en faisant coincider le
+    centre du mobile avec le centre du repère du hangar (les coins sont
+    construits une seule fois, dans geometrie) ;
+    2. Orientation du mobile pour qu'il soit aligné avec l'orientation donnée
+    par position_mobile[3:6] (en utilisant des matrices de rotation pour
+    arriver à l'orientation souhaitée depuis l'orientation d'origine du
+    hangar) ;
+    3. Déplacement du mobile pour que son centre se retrouve à la position
+    donnée par position_mobile.
+
+    :param position_mobile: np.array de taille 6 (3 positions, 3 angles)
+    représentant la position actuelle du centre du mobile et son orientation.
+    :param geometrie: géométrie du robot
+
+    :type position_mobile: np.array de taille 6
+    :type geometrie: RobotGeometry
+
+    :return: positions des huits coins
+    :rtype: np.array de dimension (8, 3)
+    """
+
+    # 1.
+    mobile = geometrie.coins_mobile
+
+    # 2
+    orientation = position_mobile[3:6]
+    rotation_mobile = rotation(orientation)
+
+    # 3
+    translationCentre = position_mobile[0:3]
+
+    return np.dot(mobile, rotation_mobile.T) + translationCentre
+
+
+def calcul_longueurs_cables(pos_coins_mobile, geometrie):
+    """
+    Renvoie les longueurs des 8 câbles correspondant à la position du mobile
+    dans le hangar.
+    Les câbles étant croisés dans le hangar, le ième câble relie le ième coin
+    du hangar au coin geometrie.chgt_num[i] du mobile.
+
+    :param pos_coins_mobile: positions des 8 coins du mobile, dans l'ordre de
+    la numérotation donnée sur le schéma.
+    :param geometrie: géométrie du robot, qui contient les positions des 8
+    coins du hangar.
+
+    #########################
+    ##### Quel schéma ? #####
+    #########################
+
+    :type pos_coins_mobile: np.array de dimension (8, 3)
+    :type geometrie: RobotGeometry
+
+    :return: vecteur des longueurs des 8 câbles
+    :rtype: np.array de taille 8
+    """
+
+    vecteursCables = (np.asarray(pos_coins_mobile)[geometrie.chgt_num] -
+                      geometrie.coins_hangar)
+    return np.linalg.norm(vecteursCables, axis=1)
+
+
+def rotation_lot(angles):
+    """
+    Version par lots de rotation : renvoie les matrices de rotation associées
+    à N triplets d'angles, sans boucle Python. Le produit des trois matrices
+    est développé une fois pour toutes.
+
+    :param angles: N vecteurs de 3 angles de rotation (rho, theta, phi)
+
+    :type angles: np.array de dimension (N, 3)
+
+    :return: N matrices de rotation, la ième étant rotation(angles[i])
+    :rtype: np.array de dimension (N, 3, 3)
+    """
+    cos_rho, cos_theta, cos_phi = np.cos(angles).T
+    sin_rho, sin_theta, sin_phi = np.sin(angles).T
+    sin_rho_sin_theta = sin_rho * sin_theta
+    cos_rho_sin_theta = cos_rho * sin_theta
+
+    matrices = np.empty((len(angles), 3, 3))
+    matrices[:, 0, 0] = cos_theta * cos_phi
+    matrices[:, 0, 1] = cos_theta * sin_phi
+    matrices[:, 0, 2] = -sin_theta
+    matrices[:, 1, 0] = sin_rho_sin_theta * cos_phi - cos_rho * sin_phi
+    matrices[:, 1, 1] = sin_rho_sin_theta * sin_phi + cos_rho * cos_phi
+    matrices[:, 1, 2] = sin_rho * cos_theta
+    matrices[:, 2, 0] = cos_rho_sin_theta * cos_phi + sin_rho * sin_phi
+    matrices[:, 2, 1] = cos_rho_sin_theta * sin_phi - sin_rho * cos_phi
+    matrices[:, 2, 2] = cos_rho * cos_theta
+    return matrices
+
+
+def quaternions_lot(angles):
+    """
+    Convertit N triplets d'angles (rho, theta, phi) en quaternions unitaires
+    (w, x, y, z) décrivant la même rotation : rotation_quaternions_lot du
+    résultat redonne rotation_lot(angles). Les matrices de rotation sont
+    des rotations « passives » d'angles rho, theta et phi, soit les
+    rotations actives d'angles opposés autour de x, y puis z : le quaternion
+    est le produit des trois quaternions des demi-angles, développé une fois
+    pour toutes.
+
+    :param angles: N vecteurs de 3 angles de rotation (rho, theta, phi)
+
+    :type angles: np.array de dimension (N, 3)
+
+    :return: N quaternions unitaires, partie réelle en premier
+    :rtype: np.array de dimension (N, 4)
+    """
+    demi_angles = -0.5 * np.asarray(angles, dtype=float)
+    cos_x, cos_y, cos_z = np.cos(demi_angles).T
+    sin_x, sin_y, sin_z = np.sin(demi_angles).T
+    cos_x_cos_y = cos_x * cos_y
+    sin_x_sin_y = sin_x * sin_y
+    sin_x_cos_y = sin_x * cos_y
+    cos_x_sin_y = cos_x * sin_y
+
+    quaternions = np.empty((len(demi_angles), 4))
+    quaternions[:, 0] = cos_x_cos_y * cos_z - sin_x_sin_y * sin_z
+    quaternions[:, 1] = sin_x_cos_y * cos_z + cos_x_sin_y * sin_z
+    quaternions[:, 2] = cos_x_sin_y * cos_z - sin_x_cos_y * sin_z
+    quaternions[:, 3] = cos_x_cos_y * sin_z + sin_x_sin_y * cos_z
+    return quaternions
+
+
+def angles_quaternions_lot(quaternions):
+    """
+    Inverse de quaternions_lot : angles (rho, theta, phi) de N quaternions
+    unitaires, avec rho et phi dans [-pi, pi] et theta dans
+    [-pi / 2, pi / 2]. Seuls les trois coefficients de la matrice de
+    rotation dont dépendent les angles sont calculés.
+
+    :param quaternions: N quaternions unitaires (w, x, y, z)
+
+    :type quaternions: np.array de dimension (N, 4)
+
+    :return: N vecteurs de 3 angles de rotation
+    :rtype: np.array de dimension (N, 3)
+    """
+    w, x, y, z = np.asarray(quaternions, dtype=float).T
+    angles = np.empty((len(w), 3))
+    # Coefficients (1, 2), (2, 2), (0, 2), (0, 1) et (0, 0) de la matrice de
+    # rotation_lot, voir rotation_quaternions_lot.
+    angles[:, 0] = np.arctan2(2 * (y * z - w * x), 1 - 2 * (x * x + y * y))
+    angles[:, 1] = np.arcsin(np.clip(-2 * (x * z + w * y), -1, 1))
+    angles[:, 2] = np.arctan2(2 * (x * y - w * z), 1 - 2 * (y * y + z * z))
+    return angles
+
+
+def rotation_quaternions_lot(quaternions):
+    """
+    Matrices de rotation de N quaternions unitaires, sans aucune fonction
+    trigonométrique : rotation_quaternions_lot(quaternions_lot(angles)) est
+    égal à rotation_lot(angles) aux erreurs d'arrondi près.
+
+    :param quaternions: N quaternions unitaires (w, x, y, z)
+
+    :type quaternions: np.array de dimension (N, 4)
+
+    :return: N matrices de rotation
+    :rtype: np.array de dimension (N, 3, 3)
+    """
+    w, x, y, z = np.asarray(quaternions, dtype=float).T
+    xx, yy, zz = x * x, y * y, z * z
+    wx, wy, wz = w * x, w * y, w * z
+    xy, xz, yz = x * y, x * z, y * z
+
+    matrices = np.empty((len(w), 3, 3))
+    matrices[:, 0, 0] = 1 - 2 * (yy + zz)
+    matrices[:, 0, 1] = 2 * (xy - wz)
+    matrices[:, 0, 2] = 2 * (xz + wy)
+    matrices[:, 1, 0] = 2 * (xy + wz)
+    matrices[:, 1, 1] = 1 - 2 * (xx + zz)
+    matrices[:, 1, 2] = 2 * (yz - wx)
+    matrices[:, 2, 0] = 2 * (xz - wy)
+    matrices[:, 2, 1] = 2 * (yz + wx)
+    matrices[:, 2, 2] = 1 - 2 * (xx + yy)
+    return matrices
+
+
+def slerp_lot(quaternions_depart, quaternions_arrivee, fractions):
+    """
+    Interpolation sphérique (SLERP) de N couples de quaternions unitaires :
+    la rotation tourne à vitesse angulaire constante, autour d'un axe fixe,
+    de la rotation de départ (fraction 0) à la rotation d'arrivée
+    (fraction 1), par le plus court chemin.
+
+    :param quaternions_depart: N quaternions de départ
+    :param quaternions_arrivee: N quaternions d'arrivée
+    :param fractions: avancement de chaque interpolation, entre 0 et 1
+
+    :type quaternions_depart: np.array de dimension (N, 4)
+    :type quaternions_arrivee: np.array de dimension (N, 4)
+    :type fractions: np.array de taille N
+
+    :return: N quaternions unitaires interpolés
+    :rtype: np.array de dimension (N, 4)
+    """
+    arrivees, angles, inverses = _preparation_slerp(quaternions_depart,
+                                                    quaternions_arrivee)
+    return _interpolation_slerp(quaternions_depart, arrivees, angles,
+                                inverses, fractions)
+
+
+def _preparation_slerp(quaternions_depart, quaternions_arrivee):
+    # Ce qui ne dépend que des deux extrémités de chaque interpolation :
+    # quaternion d'arrivée du plus court chemin (q et -q sont la même
+    # rotation), angle entre les deux quaternions et inverse de son sinus.
+    # L'angle est calculé par arctan2, précis même pour deux rotations
+    # presque égales ; un angle nul est remplacé par un angle infime, pour
+    # lequel les poids de la SLERP sont ceux de l'interpolation linéaire.
+    quaternions_depart = np.asarray(quaternions_depart, dtype=float)
+    quaternions_arrivee = np.asarray(quaternions_arrivee, dtype=float)
+    cosinus = np.einsum('ni,ni->n', quaternions_depart, quaternions_arrivee)
+    arrivees = np.where(cosinus[:, np.newaxis] < 0, -quaternions_arrivee,
+                        quaternions_arrivee)
+    angles = 2 * np.arctan2(
+        np.linalg.norm(quaternions_depart - arrivees, axis=1),
+        np.linalg.norm(quaternions_depart + arrivees, axis=1))
+    np.maximum(angles, 1e-300, out=angles)
+    return arrivees, angles, 1 / np.sin(angles)
+
+
+def _interpolation_slerp(departs, arrivees, angles, inverses, fractions):
+    # Quaternions interpolés, une ligne par fraction, à partir des grandeurs
+    # de _preparation_slerp (déjà répétées pour chaque fraction).
+    poids_depart = np.sin((1 - fractions) * angles)
+    poids_depart *= inverses
+    poids_arrivee = np.sin(fractions * angles)
+    poids_arrivee *= inverses
+    return (poids_depart[:, np.newaxis] * departs +
+            poids_arrivee[:, np.newaxis] * arrivees)
+
+
+def _coins_tournes_lot(positions_mobile, coins_transposes, rotations=None):
+    # Applique la rotation puis la translation de chaque position aux coins
+    # donnés (rangés par coordonnée, dimension (3, 8)). Le produit est fait en
+    # une seule multiplication (3N, 3) x (3, 8) et le résultat est lui aussi
+    # rangé par coordonnée : dimension (N, 3, 8). Les matrices de rotation
+    # sont calculées à partir des angles des positions si elles ne sont pas
+    # données.
+    nb_positions = len(positions_mobile)
+    if rotations is None:
+        rotations = rotation_lot(positions_mobile[:, 3:6])
+    coins_tournes = np.matmul(rotations.reshape(3 * nb_positions, 3),
+                              coins_transposes).reshape(nb_positions, 3, 8)
+    coins_tournes += positions_mobile[:, 0:3, np.newaxis]
+    return coins_tournes
+
+
+def reconstruction_coins_lot(positions_mobile, geometrie, quaternions=None):
+    """
+    Version par lots de reconstruction_coins : calcule les positions des 8
+    coins du mobile pour N positions à la fois.
+
+    Si les orientations sont déjà connues sous forme de quaternions (voir
+    quaternions_lot et slerp_lot), les matrices de rotation en sont tirées
+    directement, sans fonction trigonométrique, et les angles des positions
+    sont ignorés.
+
+    :param positions_mobile: N positions du mobile (3 positions, 3 angles)
+    :param geometrie: géométrie du robot
+    :param quaternions: orientations du mobile, None pour utiliser les
+    angles des positions
+
+    :type positions_mobile: np.array de dimension (N, 6)
+    :type geometrie: RobotGeometry
+    :type quaternions: np.array de dimension (N, 4)
+
+    :return: positions des 8 coins pour chacune des N positions
+    :rtype: np.array de dimension (N, 8, 3)
+    """
+    positions_mobile = np.asarray(positions_mobile, dtype=float)
+    rotations = (None if quaternions is None
+                 else rotation_quaternions_lot(quaternions))
+    return _coins_tournes_lot(positions_mobile, geometrie.coins_mobile.T,
+                              rotations).transpose(0, 2, 1)
+
+
+def calcul_longueurs_cables_lot(positions_mobile, geometrie, longueurs=None):
+    """
+    Version par lots de calcul_longueurs_cables : calcule les longueurs des 8
+    câbles pour N positions du mobile. Les coins du mobile déjà permutés et
+    les coins du hangar sont pris dans geometrie, les positions sont traitées
+    par tranches de TAILLE_LOT pour borner la mémoire utilisée.
+
+    :param positions_mobile: N positions du mobile (3 positions, 3 angles)
+    :param geometrie: géométrie du robot
+    :param longueurs: tableau dans lequel écrire le résultat, alloué s'il
+    n'est pas donné
+
+    :type positions_mobile: np.array de dimension (N, 6)
+    :type geometrie: RobotGeometry
+    :type longueurs: np.array de dimension (N, 8)
+
+    :return: longueurs des 8 câbles pour chacune des N positions
+    :rtype: np.array de dimension (N, 8)
+    """
+    positions_mobile = np.asarray(positions_mobile, dtype=float)
+    if longueurs is None:
+        longueurs = np.empty((len(positions_mobile), 8))
+
+    for debut in range(0, len(positions_mobile), TAILLE_LOT):
+        fin = debut + TAILLE_LOT
+        vecteurs = _coins_tournes_lot(positions_mobile[debut:fin],
+                                      geometrie.coins_attache_transposes)
+        vecteurs -= geometrie.coins_hangar_transposes
+        np.sqrt(np.einsum('nik,nik->nk', vecteurs, vecteurs),
+                out=longueurs[debut:fin])
+    return longueurs
+
+
+def commande_longeurs_cables(traj_disc, geometrie, periode_resync=None,
+                             tolerance=TOLERANCE_INCREMENTALE):
+    """
+    Convertit la trajectoire discrétisée (liste des déplacements infinitésimaux
+    qu'il faut réaliser pour parcourir la trajectoire souhaitée) en la liste
+    des modifications infinitésimales des longueurs des câbles.
+
+    #################################
+    ##### Plutôt var_disc non ? #####
+    #################################
+
+    Pour cela, on doit garder en mémoire (dans des variables locales) la
+    position actuelle du module (6 valeurs), ainsi que les longueurs actuelles
+    des cordes.
+
+    Pour chaque déplacement infinitésimal dans cette boucle on devra :
+    1. Mettre à jour la position mémorisée du mobile (selon les 6 dimensions) ;
+    2. Reconstruire les coins du mobile (en prenant en compte l'orientation
+    avec reconstruction_coins) ;
+    3. Calculer les nouvelles longueurs des cordes ;
+    4. En déduire les variations des longueurs des cordes par rapport à celles
+    de l'état précédent ;
+    5. Mettre à jour les longueurs des cordes.
+
+    Ces étapes sont faites par lots (voir calcul_longueurs_cables_lot) plutôt
+    que pas par pas, les résultats sont des arrays contigus.
+
+    Si periode_resync est donné, l'étape 3. est faite en mode incrémental :
+    les longueurs ne sont calculées exactement que tous les periode_resync
+    pas, et extrapolées entre deux avec la jacobienne des longueurs (voir
+    jacobienne_longueurs_lot) ; les pas dont l'erreur estimée dépasse
+    tolerance sont recalculés exactement. rapport_erreur_incrementale mesure
+    l'erreur commise. Ce mode ne rend pas le calcul plus rapide (voir
+    PERIODE_RESYNC) : aux pas par défaut, il revient au calcul exact.
+
+    Pour répartir le calcul entre plusieurs processus, voir
+    commande_longeurs_cables_paralleles.
+
+    :param traj_disc: trajectoire discrétisée dans la première partie du code,
+    chaque point de la trajectoire est un np.array de taille 6.
+    :param geometrie: géométrie du robot
+    :param periode_resync: nombre de pas entre deux calculs exacts en mode
+    incrémental, None pour calculer toutes les longueurs exactement
+    :param tolerance: borne d'erreur estimée déclenchant un recalcul exact en
+    mode incrémental (m)
+
+    :type traj_disc: couple d'np.array de dimension (N, 6)
+    :type geometrie: RobotGeometry
+    :type periode_resync: int
+    :type tolerance: float
+
+    :return: longueurs des cordes après chacun des N déplacements ;
+    variations des longueurs des cordes, la ième ligne étant la variation de
+    longueur des 8 cordes lors du ième déplacement.
+    :rtype: (np.array de dimension (N, 8), np.array de dimension (N, 8))
+    """
+
+    nombreIteration = len(traj_disc[1])
+    if nombreIteration == 0:
+        # Trajectoire immobile (tous les points de passage confondus).
+        return np.empty((0, 8)), np.empty((0, 8))
+    # Le premier point de la trajectoire discrétisée est le point de départ,
+    # le ième déplacement mène du ième point au suivant.
+    positionInitiale = np.asarray(traj_disc[0][0], dtype=float)
+    longueursCableInit = calcul_longueurs_cables_lot(
+        positionInitiale[np.newaxis], geometrie)[0]
+
+    tableauLongueur = np.empty((nombreIteration, 8))
+    for debut in range(0, nombreIteration, TAILLE_LOT):
+        fin = min(debut + TAILLE_LOT, nombreIteration)
+        positionInitiale = _longueurs_tranche(positionInitiale,
+                                              traj_disc[1][debut:fin],
+                                              geometrie,
+                                              tableauLongueur[debut:fin],
+                                              periode_resync, tolerance)
+
+    # 4.
+    tableauVarLongueur = np.diff(tableauLongueur, axis=0,
+                                 prepend=longueursCableInit[np.newaxis])
+
+    return tableauLongueur, tableauVarLongueur
+
+
+def commande_longeurs_cables_flux(blocs_disc, geometrie, periode_resync=None,
+                                  tolerance=TOLERANCE_INCREMENTALE):
+    """
+    Version en flux de commande_longeurs_cables : consomme les blocs de la
+    trajectoire discrétisée (par exemple ceux de
+    discretisation_trajectoire_flux) et renvoie un générateur des longueurs et
+    des variations de longueurs des câbles, bloc par bloc.
+
+    La position du mobile et les longueurs des câbles à la fin d'un bloc sont
+    reportées sur le bloc suivant, de sorte que les blocs mis bout à bout sont
+    identiques au résultat de commande_longeurs_cables (en mode incrémental,
+    pour des blocs de TAILLE_LOT déplacements).
+
+    :param blocs_disc: itérable de couples (points, déplacements) de la
+    trajectoire discrétisée, chacun de dimension (n, 6)
+    :param geometrie: géométrie du robot
+    :param periode_resync: voir commande_longeurs_cables
+    :param tolerance: voir commande_longeurs_cables
+
+    :type blocs_disc: iterable
+    :type geometrie: RobotGeometry
+
+    :return: générateur de couples (longueurs, variations de longueurs) de
+    dimension (n, 8)
+    :rtype: generator
+    """
+
+    position = None
+    longueurs_precedentes = None
+    for traj_bloc, var_bloc in blocs_disc:
+        if len(var_bloc) == 0:
+            continue
+        if position is None:
+            position = np.asarray(traj_bloc[0], dtype=float)
+            longueurs_precedentes = calcul_longueurs_cables_lot(
+                position[np.newaxis], geometrie)
+
+        longueurs = np.empty((len(var_bloc), 8))
+        for debut in range(0, len(var_bloc), TAILLE_LOT):
+            fin = min(debut + TAILLE_LOT, len(var_bloc))
+            position = _longueurs_tranche(position, var_bloc[debut:fin],
+                                          geometrie, longueurs[debut:fin],
+                                          periode_resync, tolerance)
+        variations = np.diff(longueurs, axis=0, prepend=longueurs_precedentes)
+        longueurs_precedentes = longueurs[-1:]
+        yield longueurs, variations
+
+
+def commande_longeurs_cables_paralleles(trajectoire, geometrie, nb_processus,
+                                        periode_resync=None,
+                                        tolerance=TOLERANCE_INCREMENTALE,
+                                        slerp=False):
+    """
+    Mode parallèle de la discrétisation et de commande_longeurs_cables : les
+    longueurs et variations de longueurs des câbles le long de la
+    trajectoire discrétisée de trajectoire (voir discretisation_trajectoire),
+    calculées par nb_processus processus.
+
+    Seule la planification des pas (voir planification_pas), linéaire en le
+    nombre de points de passage, est faite dans le processus courant : la
+    trajectoire discrétisée n'y est jamais construite. Les pas sont découpés
+    en morceaux contigus ; chaque processus reçoit les points de passage des
+    intervalles de son morceau et leurs décalages, discrétise lui-même ses
+    pas et écrit ses longueurs directement dans un tableau (N, 8) en mémoire
+    partagée, si bien que rien n'est sérialisé en retour. Les variations
+    sont calculées ensuite sur le tableau complet, ce qui recoud les
+    morceaux entre eux. Chaque morceau part de son point de la trajectoire
+    discrétisée plutôt que de la somme des déplacements précédents : les
+    résultats ne diffèrent du calcul séquentiel que par les arrondis.
+
+    :param trajectoire: Trajectoire souhaitée
+    :param geometrie: géométrie du robot, dont les pas maximaux
+    :param nb_processus: nombre de processus
+    :param periode_resync: voir commande_longeurs_cables
+    :param tolerance: voir commande_longeurs_cables
+    :param slerp: voir discretisation_trajectoire
+
+    :type trajectoire: np.array de dimension (n, 6)
+    :type geometrie: RobotGeometry
+    :type nb_processus: int
+    :type periode_resync: int
+    :type tolerance: float
+    :type slerp: bool
+
+    :return: longueurs des câbles après chacun des N pas et leurs variations
+    :rtype: (np.array de dimension (N, 8), np.array de dimension (N, 8))
+    """
+    trajectoire = np.asarray(trajectoire, dtype=float)
+    quaternions = quaternions_lot(trajectoire[:, 3:6]) if slerp else None
+    nombre_pas, decalages = planification_pas(trajectoire,
+                                              geometrie.pas_maximal,
+                                              quaternions)
+    nb_pas_total = int(decalages[-1])
+    if nb_pas_total == 0:
+        return np.empty((0, 8)), np.empty((0, 8))
+    longueurs_initiales = calcul_longueurs_cables_lot(trajectoire[:1],
+                                                      geometrie)
+    with _executeur(nb_processus) as executeur:
+        longueurs = _longueurs_paralleles(
+            executeur, 4 * nb_processus, trajectoire, nombre_pas, decalages,
+            quaternions, 0, nb_pas_total, geometrie, periode_resync,
+            tolerance)
+    return longueurs, np.diff(longueurs, axis=0, prepend=longueurs_initiales)
+
+
+def commande_longeurs_cables_paralleles_flux(trajectoire, geometrie,
+                                             nb_processus,
+                                             taille_bloc=TAILLE_LOT,
+                                             periode_resync=None,
+                                             tolerance=TOLERANCE_INCREMENTALE,
+                                             slerp=False):
+    """
+    Version en flux de commande_longeurs_cables_paralleles : générateur des
+    longueurs et variations de longueurs des câbles par blocs d'au plus
+    taille_bloc pas, comme commande_longeurs_cables_flux appliqué à
+    discretisation_trajectoire_flux.
+
+    La trajectoire est parcourue par fenêtres de TAILLE_LOT points de
+    passage, comme dans discretisation_trajectoire_flux, et les pas de
+    chaque fenêtre par tranches de nb_processus * TAILLE_LOT pas, chaque
+    tranche étant partagée entre les processus : la mémoire utilisée ne
+    dépend pas de la longueur de la trajectoire.
+
+    :param trajectoire: Trajectoire souhaitée
+    :param geometrie: géométrie du robot, dont les pas maximaux
+    :param nb_processus: nombre de processus
+    :param taille_bloc: nombre maximal de pas de chaque bloc
+    :param periode_resync: voir commande_longeurs_cables
+    :param tolerance: voir commande_longeurs_cables
+    :param slerp: voir discretisation_trajectoire
+
+    :type trajectoire: np.array de dimension (n, 6)
+    :type geometrie: RobotGeometry
+    :type nb_processus: int
+    :type taille_bloc: int
+
+    :return: générateur de couples (longueurs, variations de longueurs) de
+    dimension (n, 8)
+    :rtype: generator
+    """
+    longueurs_precedentes = None
+    with _executeur(nb_processus) as executeur:
+        for debut_fenetre in range(0, len(trajectoire) - 1, TAILLE_LOT):
+            fenetre = np.array(
+                trajectoire[debut_fenetre:debut_fenetre + TAILLE_LOT + 1],
+                dtype=float)
+            quaternions = quaternions_lot(fenetre[:, 3:6]) if slerp else None
+            nombre_pas, decalages = planification_pas(
+                fenetre, geometrie.pas_maximal, quaternions)
+            if longueurs_precedentes is None:
+                longueurs_precedentes = calcul_longueurs_cables_lot(
+                    fenetre[:1], geometrie)
+            nb_pas_fenetre = int(decalages[-1])
+            for debut in range(0, nb_pas_fenetre, nb_processus * TAILLE_LOT):
+                fin = min(debut + nb_processus * TAILLE_LOT, nb_pas_fenetre)
+                longueurs = _longueurs_paralleles(
+                    executeur, nb_processus, fenetre, nombre_pas, decalages,
+                    quaternions, debut, fin, geometrie, periode_resync,
+                    tolerance)
+                variations = np.diff(longueurs, axis=0,
+                                     prepend=longueurs_precedentes)
+                longueurs_precedentes = longueurs[-1:]
+                for debut_bloc in range(0, len(longueurs), taille_bloc):
+                    yield (longueurs[debut_bloc:debut_bloc + taille_bloc],
+                           variations[debut_bloc:debut_bloc + taille_bloc])
+
+
+def _longueurs_tranche(position, variations, geometrie, longueurs,
+                       periode_resync=None, tolerance=TOLERANCE_INCREMENTALE):
+    # Étapes 1. à 3. de commande_longeurs_cables pour une tranche de
+    # déplacements partant de position : les positions successives sont
+    # obtenues en cumulant les déplacements dans le même ordre que le ferait
+    # une boucle, puis les longueurs sont calculées par lot et écrites dans
+    # longueurs. Renvoie la position atteinte à la fin de la tranche.
+    if periode_resync is not None:
+        return _longueurs_tranche_incrementale(position, variations,
+                                               geometrie, longueurs,
+                                               periode_resync, tolerance)[0]
+    positions = np.empty((len(variations) + 1, 6))
+    positions[0] = position
+    positions[1:] = variations
+    np.cumsum(positions, axis=0, out=positions)
+    calcul_longueurs_cables_lot(positions[1:], geometrie, longueurs)
+    return positions[-1].copy()
+
+
+def _derivees_rotation_lot(angles):
+    # Dérivées des matrices de rotation_lot par rapport à chacun des trois
+    # angles : dimension (N, 3, 3, 3), l'indice 1 étant celui de l'angle. Les
+    # dérivées par rapport à rho et phi s'expriment avec les coefficients de
+    # la matrice elle-même.
+    matrices = rotation_lot(angles)
+    cos_rho, cos_theta, cos_phi = np.cos(angles).T
+    sin_rho, sin_theta, sin_phi = np.sin(angles).T
+
+    derivees = np.zeros((len(angles), 3, 3, 3))
+    derivees[:, 0, 1] = matrices[:, 2]
+    derivees[:, 0, 2] = -matrices[:, 1]
+    derivees[:, 1, 0, 0] = -sin_theta * cos_phi
+    derivees[:, 1, 0, 1] = -sin_theta * sin_phi
+    derivees[:, 1, 0, 2] = -cos_theta
+    derivees[:, 1, 1, 0] = sin_rho * cos_theta * cos_phi
+    derivees[:, 1, 1, 1] = sin_rho * cos_theta * sin_phi
+    derivees[:, 1, 1, 2] = -sin_rho * sin_theta
+    derivees[:, 1, 2, 0] = cos_rho * cos_theta * cos_phi
+    derivees[:, 1, 2, 1] = cos_rho * cos_theta * sin_phi
+    derivees[:, 1, 2, 2] = -cos_rho * sin_theta
+    derivees[:, 2, :, 0] = -matrices[:, :, 1]
+    derivees[:, 2, :, 1] = matrices[:, :, 0]
+    return derivees
+
+
+def jacobienne_longueurs_lot(positions_mobile, geometrie):
+    """
+    Calcule la jacobienne des longueurs des 8 câbles par rapport aux 6
+    coordonnées de la position du mobile, pour N positions à la fois. La
+    dérivée de la longueur d'un câble est la projection, sur la direction du
+    câble, de la vitesse de son point d'attache sur le mobile.
+
+    :param positions_mobile: N positions du mobile (3 positions, 3 angles)
+    :param geometrie: géométrie du robot
+
+    :type positions_mobile: np.array de dimension (N, 6)
+    :type geometrie: RobotGeometry
+
+    :return: longueurs des câbles et jacobiennes, la jacobienne [n, i, j]
+    étant la dérivée de la longueur du câble i par rapport à la coordonnée j
+    de la nième position
+    :rtype: (np.array de dimension (N, 8), np.array de dimension (N, 8, 6))
+    """
+    positions_mobile = np.asarray(positions_mobile, dtype=float)
+    vecteurs = _coins_tournes_lot(positions_mobile,
+                                  geometrie.coins_attache_transposes)
+    vecteurs -= geometrie.coins_hangar_transposes
+    longueurs = np.sqrt(np.einsum('nik,nik->nk', vecteurs, vecteurs))
+    directions = vecteurs / longueurs[:, np.newaxis]
+
+    # Dérivées des coins par rapport aux angles, rangées par coordonnée :
+    # dimension (N, 3, 3, 8), l'indice 1 étant celui de l'angle.
+    nb_positions = len(positions_mobile)
+    derivees = _derivees_rotation_lot(positions_mobile[:, 3:6])
+    coins_derives = np.matmul(derivees.reshape(9 * nb_positions, 3),
+                              geometrie.coins_attache_transposes).reshape(
+                                  nb_positions, 3, 3, 8)
+
+    # Rangées (N, 6, 8) pour le calcul, renvoyées transposées.
+    jacobiennes = np.empty((nb_positions, 6, 8))
+    jacobiennes[:, 0:3] = directions
+    jacobiennes[:, 3:6] = np.einsum('nik,naik->nak', directions,
+                                    coins_derives)
+    return longueurs, jacobiennes.transpose(0, 2, 1)
+
+
+def matrice_structure_lot(positions_mobile, geometrie):
+    """
+    Calcule la matrice de structure du robot pour N positions du mobile. Sa
+    ième colonne est le torseur exercé sur le mobile par une tension unité
+    dans le ième câble : la force, qui est le vecteur unitaire du câble
+    dirigé du mobile vers le hangar, puis son moment au centre du mobile. Un
+    vecteur de tensions t tient le mobile en équilibre sous un torseur
+    extérieur w si la matrice de structure W vérifie W t + w = 0.
+
+    :param positions_mobile: N positions du mobile (3 positions, 3 angles)
+    :param geometrie: géométrie du robot
+
+    :type positions_mobile: np.array de dimension (N, 6)
+    :type geometrie: RobotGeometry
+
+    :return: longueurs des câbles et matrices de structure
+    :rtype: (np.array de dimension (N, 8), np.array de dimension (N, 6, 8))
+    """
+    positions_mobile = np.asarray(positions_mobile, dtype=float)
+    attaches = _coins_tournes_lot(positions_mobile,
+                                  geometrie.coins_attache_transposes)
+    directions = geometrie.coins_hangar_transposes - attaches
+    longueurs = np.sqrt(np.einsum('nik,nik->nk', directions, directions))
+    directions /= longueurs[:, np.newaxis]
+    attaches -= positions_mobile[:, 0:3, np.newaxis]
+
+    matrices = np.empty((len(positions_mobile), 6, 8))
+    matrices[:, 0:3] = directions
+    matrices[:, 3:6] = np.cross(attaches, directions, axis=1)
+    return longueurs, matrices
+
+
+def position_centrale(geometrie):
+    """
+    Position du mobile au centre du hangar, sans rotation : point de départ
+    par défaut de la cinématique directe.
+
+    :param geometrie: géométrie du robot
+
+    :type geometrie: RobotGeometry
+
+    :return: position du mobile (3 positions, 3 angles)
+    :rtype: np.array de taille 6
+    """
+    return np.concatenate([geometrie.coins_hangar.mean(axis=0), np.zeros(3)])
+
+
+def cinematique_directe_lot(longueurs, geometrie, positions_initiales=None,
+                            iterations_max=ITERATIONS_DIRECTE,
+                            tolerance=TOLERANCE_DIRECTE):
+    """
+    Cinématique directe : retrouve les positions du mobile à partir des
+    longueurs des 8 câbles, pour N vecteurs de longueurs à la fois. C'est
+    l'inverse de calcul_longueurs_cables_lot, au sens des moindres carrés
+    puisque 8 longueurs mesurées (ou arrondies aux ticks des moteurs) ne
+    correspondent en général à aucune position exactement.
+
+    Chaque position est cherchée par la méthode de Levenberg-Marquardt, avec
+    la jacobienne de jacobienne_longueurs_lot : le pas résout
+    (JᵀJ + λ diag(JᵀJ)) dx = -Jᵀr, où r est l'écart entre les longueurs de la
+    position courante et les longueurs données. Un pas qui diminue l'écart
+    est accepté et λ divisé par 10, sinon il est refusé et λ multiplié par
+    10 ; près de la solution c'est la méthode de Gauss-Newton, qui converge
+    en quelques itérations. Les N résolutions avancent ensemble, chacune avec
+    son propre λ, et celles qui ont convergé sortent du lot.
+
+    Une position converge quand son pas devient plus petit que tolerance
+    (sur chaque coordonnée). Elle est abandonnée quand λ dépasse
+    AMORTISSEMENT_MAX ou au bout de iterations_max itérations. Partir d'une
+    position proche (la solution précédente quand les longueurs sont
+    mesurées à chaque pas de temps) ne demande que 2 ou 3 itérations.
+
+    :param longueurs: N vecteurs des longueurs des 8 câbles (en m)
+    :param geometrie: géométrie du robot
+    :param positions_initiales: positions de départ, une seule pour toutes ou
+    une par vecteur de longueurs, position_centrale si None
+    :param iterations_max: nombre maximal d'itérations
+    :param tolerance: pas (en m et en radians) en dessous duquel une position
+    est considérée comme trouvée
+
+    :type longueurs: np.array de dimension (N, 8) ou de taille 8
+    :type geometrie: RobotGeometry
+    :type positions_initiales: np.array de taille 6 ou de dimension (N, 6)
+    :type iterations_max: int
+    :type tolerance: float
+
+    :return: positions trouvées et rapport de convergence : nombre de
+    vecteurs de longueurs, nombre de positions qui ont convergé, indices de
+    celles qui n'ont pas convergé, nombres maximal et moyen d'itérations,
+    écart maximal et écart quadratique moyen (en m) entre les longueurs des
+    positions trouvées et les longueurs données
+    :rtype: (np.array de dimension (N, 6), dict)
+    """
+    longueurs = np.atleast_2d(np.asarray(longueurs, dtype=float))
+    nb_positions = len(longueurs)
+    if positions_initiales is None:
+        positions_initiales = position_centrale(geometrie)
+    positions = np.array(np.broadcast_to(positions_initiales,
+                                         (nb_positions, 6)), dtype=float)
+
+    # Les jacobiennes sont gardées transposées, (N, 6, 8), la disposition
+    # contiguë dans laquelle jacobienne_longueurs_lot les calcule.
+    calculees, jacobiennes = jacobienne_longueurs_lot(positions, geometrie)
+    jacobiennes = jacobiennes.transpose(0, 2, 1)
+    residus = calculees - longueurs
+    couts = np.einsum('ni,ni->n', residus, residus)
+    amortissements = np.full(nb_positions, AMORTISSEMENT_INITIAL)
+    iterations = np.zeros(nb_positions, dtype=int)
+    convergees = np.zeros(nb_positions, dtype=bool)
+    actives = np.arange(nb_positions)
+    diagonale = np.arange(6)
+    for _ in range(iterations_max):
+        if len(actives) == 0:
+            break
+        toutes = len(actives) == nb_positions
+        jacobiennes_actives = jacobiennes if toutes else jacobiennes[actives]
+        residus_actifs = residus if toutes else residus[actives]
+        normales = np.matmul(jacobiennes_actives,
+                             jacobiennes_actives.transpose(0, 2, 1))
+        gradients = np.matmul(jacobiennes_actives,
+                              residus_actifs[..., np.newaxis])
+        # Le petit terme ajouté garde le système inversible même quand une
+        # coordonnée n'a aucune influence sur les longueurs.
+        normales[:, diagonale, diagonale] *= (
+            1 + amortissements[actives, np.newaxis])
+        normales[:, diagonale, diagonale] += 1e-12
+        pas = np.linalg.solve(normales, gradients)[..., 0]
+        np.negative(pas, out=pas)
+        iterations[actives] += 1
+
+        # Un pas plus petit que tolerance termine la résolution : il est
+        # appliqué sans évaluer les longueurs de la nouvelle position, dont
+        # l'écart ne change plus que de l'ordre de tolerance.
+        finies = np.abs(pas).max(axis=1) < tolerance
+        indices = actives[finies]
+        positions[indices] += pas[finies]
+        convergees[indices] = True
+        actives = actives[~finies]
+        pas = pas[~finies]
+
+        essais = positions[actives] + pas
+        calculees, jacobiennes_essais = jacobienne_longueurs_lot(essais,
+                                                                 geometrie)
+        residus_essais = calculees - longueurs[actives]
+        couts_essais = np.einsum('ni,ni->n', residus_essais, residus_essais)
+        acceptes = couts_essais <= couts[actives]
+        indices = actives[acceptes]
+        positions[indices] = essais[acceptes]
+        jacobiennes[indices] = jacobiennes_essais.transpose(0, 2, 1)[acceptes]
+        residus[indices] = residus_essais[acceptes]
+        couts[indices] = couts_essais[acceptes]
+        amortissements[indices] = np.maximum(amortissements[indices] / 10,
+                                             1e-12)
+        amortissements[actives[~acceptes]] *= 10
+        actives = actives[amortissements[actives] < AMORTISSEMENT_MAX]
+
+    non_convergees = np.flatnonzero(~convergees)
+    rapport = {"nombre": nb_positions,
+               "convergees": nb_positions - len(non_convergees),
+               "non_convergees": non_convergees,
+               "iterations_max": int(iterations.max(initial=0)),
+               "iterations_moyenne":
+                   float(iterations.mean()) if nb_positions else 0.0,
+               "residu_max": float(np.abs(residus).max(initial=0)),
+               "residu_quadratique_moyen":
+                   float(np.sqrt(couts.sum() / max(8 * nb_positions, 1)))}
+    return positions, rapport
+
+
+def cinematique_directe(longueurs, geometrie, position_initiale=None,
+                        taille_bloc=TAILLE_BLOC_DIRECTE,
+                        iterations_max=ITERATIONS_DIRECTE,
+                        tolerance=TOLERANCE_DIRECTE):
+    """
+    Cinématique directe d'une suite de N mesures successives des longueurs
+    des câbles, par exemple l'enregistrement d'une séance : les mesures sont
+    résolues par blocs de taille_bloc avec cinematique_directe_lot.
+
+    Chaque bloc part de la dernière position trouvée dans le bloc précédent
+    (position_initiale pour le premier), linéarisée : la position de départ
+    de chaque mesure est cette position corrigée de l'écart de longueurs par
+    la pseudo-inverse de la jacobienne. Des mesures proches les unes des
+    autres partent ainsi presque de leur solution, sans que les mesures d'un
+    bloc attendent la solution de la précédente.
+
+    :param longueurs: N vecteurs des longueurs des 8 câbles (en m)
+    :param geometrie: géométrie du robot
+    :param position_initiale: position proche de la première mesure,
+    position_centrale si None
+    :param taille_bloc: nombre de mesures résolues ensemble
+    :param iterations_max: voir cinematique_directe_lot
+    :param tolerance: voir cinematique_directe_lot
+
+    :type longueurs: np.array de dimension (N, 8)
+    :type geometrie: RobotGeometry
+    :type position_initiale: np.array de taille 6
+    :type taille_bloc: int
+    :type iterations_max: int
+    :type tolerance: float
+
+    :return: positions trouvées et rapport de convergence de l'ensemble des
+    mesures, voir cinematique_directe_lot
+    :rtype: (np.array de dimension (N, 6), dict)
+    """
+    nb_mesures = len(longueurs)
+    positions = np.empty((nb_mesures, 6))
+    reference = (position_centrale(geometrie) if position_initiale is None
+                 else np.asarray(position_initiale, dtype=float))
+    non_convergees = [np.zeros(0, dtype=int)]
+    iterations_max_suite = 0
+    somme_iterations = 0.0
+    residu_max = 0.0
+    somme_couts = 0.0
+    for debut in range(0, nb_mesures, taille_bloc):
+        bloc = np.asarray(longueurs[debut:debut + taille_bloc], dtype=float)
+        longueurs_reference, jacobienne = jacobienne_longueurs_lot(
+            reference[np.newaxis], geometrie)
+        initiales = reference + np.dot(bloc - longueurs_reference,
+                                       np.linalg.pinv(jacobienne[0]).T)
+        positions_bloc, rapport = cinematique_directe_lot(
+            bloc, geometrie, initiales, iterations_max, tolerance)
+        echecs = rapport["non_convergees"]
+        iterations_bloc = rapport["iterations_max"]
+        somme_iterations += rapport["iterations_moyenne"] * len(bloc)
+        if len(echecs):
+            # Mesures trop loin de la prédiction (mouvement rapide, saut dans
+            # l'enregistrement) : elles repartent du centre du hangar.
+            reprises, rapport = cinematique_directe_lot(
+                bloc[echecs], geometrie, None, iterations_max, tolerance)
+            positions_bloc[echecs] = reprises
+            echecs = echecs[rapport["non_convergees"]]
+            iterations_bloc += rapport["iterations_max"]
+            somme_iterations += rapport["iterations_moyenne"] * len(reprises)
+        positions[debut:debut + len(bloc)] = positions_bloc
+        non_convergees.append(echecs + debut)
+        iterations_max_suite = max(iterations_max_suite, iterations_bloc)
+        ecarts = calcul_longueurs_cables_lot(positions_bloc, geometrie) - bloc
+        residu_max = max(residu_max, float(np.abs(ecarts).max()))
+        somme_couts += float(np.einsum('ni,ni->', ecarts, ecarts))
+
+        # Le bloc suivant part de la dernière position trouvée, jamais d'une
+        # position qui n'a pas convergé.
+        trouvees = np.setdiff1d(np.arange(len(bloc)), echecs)
+        if len(trouvees):
+            reference = positions_bloc[trouvees[-1]]
+
+    non_convergees = np.concatenate(non_convergees)
+    return positions, {
+        "nombre": nb_mesures,
+        "convergees": nb_mesures - len(non_convergees),
+        "non_convergees": non_convergees,
+        "iterations_max": iterations_max_suite,
+        "iterations_moyenne": somme_iterations / max(nb_mesures, 1),
+        "residu_max": residu_max,
+        "residu_quadratique_moyen":
+            float(np.sqrt(somme_couts / max(8 * nb_mesures, 1)))}
+
+
+def _longueurs_tranche_incrementale(position, variations, geometrie,
+                                    longueurs, periode_resync, tolerance):
+    # Équivalent incrémental de _longueurs_tranche. Les positions sont
+    # cumulées de la même façon ; les pas sont groupés par periode_resync et
+    # les longueurs et la jacobienne ne sont calculées exactement qu'au pas
+    # d'ancrage, au milieu de chaque groupe : les longueurs des autres pas
+    # sont extrapolées au premier ordre à partir de leur écart de position à
+    # l'ancrage, qui est ainsi au plus d'un demi-groupe (le reste de Taylor,
+    # quadratique en l'écart, est quatre fois plus petit qu'avec un ancrage
+    # au début du groupe). Tout est fait par lot, les pas d'un même ancrage
+    # formant une matrice (periode_resync, 6) ; la dernière est complétée en
+    # répétant la position finale.
+    #
+    # Le reste de Taylor est estimé par ((t + r a)² / L + r a²) / 2, où t est
+    # le déplacement en translation depuis l'ancrage, a la somme des écarts
+    # d'angles, r la distance maximale d'un coin au centre du mobile et L la
+    # plus courte longueur de câble à l'ancrage. Les pas dont l'estimation
+    # dépasse tolerance sont recalculés exactement.
+    #
+    # Si au moins la moitié des pas de la tranche seraient recalculés, ce qui
+    # arrive aux pas maximaux par défaut dès que periode_resync dépasse 2 ou
+    # 4, la tranche est calculée exactement sans calculer de jacobienne. Ce
+    # cas est d'abord cherché sur un échantillon des pas : l'estimation pour
+    # un pas médian, à un quart de groupe de son ancrage et avec la longueur
+    # de câble maximale du robot pour L, ne coûte presque rien, et la tranche
+    # ne coûte alors pas plus que le calcul exact.
+    #
+    # Même avec des pas fins, le calcul des écarts, de leur borne et de
+    # l'extrapolation coûte presque autant que le calcul exact des
+    # longueurs : le gain ne dépasse pas 1,5, et il y a une perte pour
+    # periode_resync inférieur à 16 (voir PERIODE_RESYNC).
+    #
+    # Renvoie la position atteinte à la fin de la tranche et le nombre de
+    # longueurs calculées exactement (ancrages et recalculs).
+    nombre_pas = len(variations)
+    rayon = np.sqrt(np.max(np.sum(geometrie.coins_mobile ** 2, axis=1)))
+    echantillon = np.asarray(variations[::max(nombre_pas // 1024, 1)])
+    if len(echantillon):
+        ecart = periode_resync / 4
+        translation = ecart * np.median(
+            np.sqrt(np.sum(echantillon[:, 0:3] ** 2, axis=1)))
+        angles = ecart * np.median(
+            np.sum(np.abs(echantillon[:, 3:6]), axis=1))
+        if ((translation + rayon * angles) ** 2 / geometrie.longueur_cable_max
+                + rayon * angles ** 2) > 2 * tolerance:
+            return (_longueurs_tranche(position, variations, geometrie,
+                                       longueurs), nombre_pas)
+
+    nb_ancres = -(-nombre_pas // periode_resync)
+    positions = np.zeros((nb_ancres * periode_resync + 1, 6))
+    positions[0] = position
+    positions[1:nombre_pas + 1] = variations
+    np.cumsum(positions, axis=0, out=positions)
+    if nombre_pas == 0:
+        return positions[0].copy(), 0
+    positions[nombre_pas + 1:] = positions[nombre_pas]
+
+    positions_pas = positions[1:].reshape(nb_ancres, periode_resync, 6)
+    milieu = periode_resync // 2
+    ancres = positions_pas[:, milieu]
+    ecarts = positions_pas - ancres[:, np.newaxis]
+    longueurs_min = calcul_longueurs_cables_lot(ancres, geometrie).min(axis=1)
+
+    translation = np.sqrt(np.sum(ecarts[:, :, 0:3] ** 2, axis=2))
+    angles = np.sum(np.abs(ecarts[:, :, 3:6]), axis=2)
+    borne = ((translation + rayon * angles) ** 2 /
+             longueurs_min[:, np.newaxis] + rayon * angles ** 2) / 2
+    depassements = np.flatnonzero(borne.reshape(-1)[:nombre_pas] > tolerance)
+    if 2 * len(depassements) >= nombre_pas:
+        calcul_longueurs_cables_lot(positions[1:nombre_pas + 1], geometrie,
+                                    longueurs)
+        return positions[nombre_pas].copy(), nombre_pas
+
+    longueurs_ancres, jacobiennes = jacobienne_longueurs_lot(ancres,
+                                                             geometrie)
+    extrapolees = np.matmul(ecarts, jacobiennes.transpose(0, 2, 1))
+    extrapolees += longueurs_ancres[:, np.newaxis]
+    longueurs[:] = extrapolees.reshape(-1, 8)[:nombre_pas]
+    if len(depassements):
+        longueurs[depassements] = calcul_longueurs_cables_lot(
+            positions[1:][depassements], geometrie)
+    return (positions[nombre_pas].copy(),
+            nb_ancres + len(depassements))
+
+
+def _executeur(nb_processus):
+    # Processus des modes parallèles. Sous Unix ils sont créés par un serveur
+    # (forkserver) plutôt que par fork du processus courant : un fork fait
+    # pendant qu'un autre fil d'exécution tient un verrou, par exemple celui
+    # de l'entrée standard que l'outil en ligne de commande lit en
+    # permanence, bloquerait les processus créés.
+    # Les imports sont faits ici pour que l'import de cable_math reste léger.
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    contexte = None
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        contexte = multiprocessing.get_context("forkserver")
+    return ProcessPoolExecutor(nb_processus, mp_context=contexte)
+
+
+def _longueurs_paralleles(executeur, nb_morceaux, trajectoire, nombre_pas,
+                          decalages, quaternions, debut, fin, geometrie,
+                          periode_resync, tolerance):
+    # Longueurs des câbles après les pas debut à fin (exclu) de la
+    # trajectoire discrétisée, planifiée par planification_pas (nombre_pas,
+    # decalages et quaternions éventuels), dans un tableau (fin - debut, 8).
+    # Les pas sont découpés en au plus nb_morceaux morceaux d'au moins
+    # TAILLE_LOT pas, calculés par les processus d'executeur dans une même
+    # mémoire partagée (voir _longueurs_morceau).
+    from multiprocessing import shared_memory
+
+    nombre_lignes = fin - debut
+    taille_morceau = max(-(-nombre_lignes // nb_morceaux), TAILLE_LOT)
+    memoire = shared_memory.SharedMemory(create=True,
+                                         size=max(nombre_lignes * 8 * 8, 1))
+    try:
+        morceaux = []
+        for debut_morceau in range(debut, fin, taille_morceau):
+            fin_morceau = min(debut_morceau + taille_morceau, fin)
+            # Seuls les intervalles du morceau sont envoyés au processus, avec
+            # leurs décalages ramenés au premier d'entre eux.
+            (premier, dernier), _ = intervalle_du_pas(
+                decalages, [debut_morceau, fin_morceau - 1])
+            morceaux.append(executeur.submit(
+                _longueurs_morceau, memoire.name, nombre_lignes,
+                debut_morceau - debut, fin_morceau - debut,
+                trajectoire[premier:dernier + 2],
+                nombre_pas[premier:dernier + 1],
+                decalages[premier:dernier + 2] - decalages[premier],
+                debut_morceau - decalages[premier],
+                None if quaternions is None
+                else quaternions[premier:dernier + 2],
+                geometrie, periode_resync, tolerance))
+        for morceau in morceaux:
+            morceau.result()
+        longueurs = np.ndarray((nombre_lignes, 8),
+                               buffer=memoire.buf).copy()
+    finally:
+        memoire.close()
+        memoire.unlink()
+    return longueurs
+
+
+def _longueurs_morceau(nom_memoire, nombre_lignes, ligne, fin_ligne,
+                       trajectoire, nombre_pas, decalages, debut, quaternions,
+                       geometrie, periode_resync, tolerance):
+    # Exécuté dans un processus de _longueurs_paralleles : discrétise les
+    # intervalles de trajectoire à partir du pas debut, TAILLE_LOT pas à la
+    # fois, et écrit les longueurs des câbles après chaque pas dans les
+    # lignes ligne à fin_ligne (exclu) de la mémoire partagée.
+    from multiprocessing import shared_memory
+
+    memoire = shared_memory.SharedMemory(name=nom_memoire)
+    try:
+        longueurs = np.ndarray((nombre_lignes, 8), buffer=memoire.buf)
+        traj_bloc = np.empty((TAILLE_LOT, 6))
+        var_bloc = np.empty((TAILLE_LOT, 6))
+        position = None
+        for decalage in range(0, fin_ligne - ligne, TAILLE_LOT):
+            nombre = min(TAILLE_LOT, fin_ligne - ligne - decalage)
+            _remplissage_discretisation(trajectoire, nombre_pas, decalages,
+                                        debut + decalage,
+                                        debut + decalage + nombre,
+                                        traj_bloc[:nombre],
+                                        var_bloc[:nombre], quaternions)
+            if position is None:
+                position = traj_bloc[0].copy()
+            position = _longueurs_tranche(
+                position, var_bloc[:nombre], geometrie,
+                longueurs[ligne + decalage:ligne + decalage + nombre],
+                periode_resync, tolerance)
+        del longueurs
+    finally:
+        memoire.close()
+
+
+def rapport_erreur_incrementale(traj_disc, geometrie,
+                                periode_resync=PERIODE_RESYNC,
+                                tolerance=TOLERANCE_INCREMENTALE):
+    """
+    Compare le mode incrémental de commande_longeurs_cables au calcul exact,
+    tranche par tranche pour borner la mémoire utilisée.
+
+    :param traj_disc: trajectoire discrétisée, voir commande_longeurs_cables
+    :param geometrie: géométrie du robot
+    :param periode_resync: nombre de pas entre deux calculs exacts
+    :param tolerance: borne d'erreur estimée déclenchant un recalcul exact (m)
+
+    :type traj_disc: couple d'np.array de dimension (N, 6)
+    :type geometrie: RobotGeometry
+    :type periode_resync: int
+    :type tolerance: float
+
+    :return: dictionnaire avec le nombre de pas, le nombre de longueurs
+    calculées exactement, l'erreur maximale et l'erreur quadratique moyenne sur les
+    longueurs (m), et l'erreur maximale de chaque câble
+    :rtype: dict
+    """
+    nombre_pas = len(traj_disc[1])
+    position_exacte = np.asarray(traj_disc[0][0], dtype=float)
+    position_incrementale = position_exacte
+    erreur_par_cable = np.zeros(8)
+    somme_carres = 0.0
+    nb_exacts = 0
+    for debut in range(0, nombre_pas, TAILLE_LOT):
+        fin = min(debut + TAILLE_LOT, nombre_pas)
+        exactes = np.empty((fin - debut, 8))
+        incrementales = np.empty((fin - debut, 8))
+        position_exacte = _longueurs_tranche(
+            position_exacte, traj_disc[1][debut:fin], geometrie, exactes)
+        position_incrementale, exacts = _longueurs_tranche_incrementale(
+            position_incrementale, traj_disc[1][debut:fin], geometrie,
+            incrementales, periode_resync, tolerance)
+        nb_exacts += exacts
+        erreurs = np.abs(incrementales - exactes)
+        np.maximum(erreur_par_cable, erreurs.max(axis=0), out=erreur_par_cable)
+        somme_carres += np.sum(erreurs ** 2)
+
+    return {"nombre_pas": nombre_pas,
+            "calculs_exacts": nb_exacts,
+            "erreur_max": float(erreur_par_cable.max()),
+            "erreur_quadratique_moyenne":
+                float(np.sqrt(somme_carres / max(8 * nombre_pas, 1))),
+            "erreur_max_par_cable": erreur_par_cable.tolist()}
+
+
+def validation_trajectoire(trajectoire, geometrie, pas_temps,
+                           taille_bloc=TAILLE_BLOC_VALIDATION, profil=None,
+                           slerp=False):
+    """
+    Vérifie, avant de l'exécuter, qu'une trajectoire respecte les limites
+    physiques du robot en chaque point de la trajectoire discrétisée :
+    1. les 8 coins du mobile restent dans le pavé englobant les coins du
+    hangar ;
+    2. les longueurs des câbles restent entre geometrie.longueur_cable_min et
+    geometrie.longueur_cable_max ;
+    3. la variation de longueur de chaque câble à chaque pas, divisée par
+    pas_temps, ne dépasse pas geometrie.vitesse_cable_max.
+
+    La trajectoire est discrétisée en flux (voir
+    discretisation_trajectoire_flux, ou ProfilVitesse si profil est donné)
+    et chaque bloc est vérifié par lot, sans boucle sur les pas. Les coins
+    d'attache des câbles étant les 8 coins du mobile dans un autre ordre, les
+    coins tournés servent à la fois au test du hangar et au calcul des
+    longueurs.
+
+    Les positions sont numérotées à partir de 0, le point de départ : la
+    position i est celle atteinte après le ième déplacement, et la vitesse
+    du ième déplacement est rapportée à la position i.
+
+    :param trajectoire: Trajectoire souhaitée
+    :param geometrie: géométrie du robot
+    :param pas_temps: durée d'un pas (en s)
+    :param taille_bloc: nombre de pas vérifiés à la fois
+    :param profil: profil de vitesse de la trajectoire, None pour la
+    discrétisation à vitesse constante par intervalle
+    :param slerp: interpolation sphérique des orientations, pour la
+    discrétisation à vitesse constante (un profil a la sienne)
+
+    :type trajectoire: np.array de dimension (n, 6)
+    :type geometrie: RobotGeometry
+    :type pas_temps: float
+    :type taille_bloc: int
+    :type profil: ProfilVitesse
+    :type slerp: bool
+
+    :return: dictionnaire avec le nombre de pas, le nombre de positions en
+    défaut pour chacun des trois tests (hors_hangar, longueurs_hors_limites,
+    vitesses_excessives) et la première d'entre elles (dans premiers, None
+    s'il n'y en a pas), les longueurs extrêmes (m), la vitesse maximale d'un
+    câble (m/s) et valide, vrai si aucun test n'a échoué
+    :rtype: dict
+    """
+    bornes_min = geometrie.coins_hangar.min(axis=0)
+    bornes_max = geometrie.coins_hangar.max(axis=0)
+    rapport = {"nombre_pas": 0,
+               "hors_hangar": 0,
+               "longueurs_hors_limites": 0,
+               "vitesses_excessives": 0,
+               "premiers": {"hors_hangar": None,
+                            "longueurs_hors_limites": None,
+                            "vitesses_excessives": None},
+               "longueur_min": np.inf,
+               "longueur_max": 0.0,
+               "vitesse_max": 0.0}
+
+    if profil is None:
+        blocs_disc = discretisation_trajectoire_flux(
+            trajectoire, geometrie.pas_maximal, taille_bloc, slerp)
+    else:
+        blocs_disc = profil.discretisation_flux(
+            trajectoire, geometrie.pas_maximal, taille_bloc)
+    blocs_disc = profiling.timed("discretisation", blocs_disc)
+    # Le point de départ, puis les positions atteintes après chaque pas.
+    morceaux = itertools.chain(
+        [np.array(trajectoire[0:1], dtype=float)],
+        (traj_bloc + var_bloc for traj_bloc, var_bloc in blocs_disc))
+    indice = 0
+    longueurs_precedentes = None
+    for positions in morceaux:
+        if len(positions) == 0:
+            continue
+        vecteurs = _coins_tournes_lot(positions,
+                                      geometrie.coins_attache_transposes)
+        # Chaque test est d'abord fait sur le bloc entier : une réduction sur
+        # tout un tableau est bien plus rapide qu'une réduction position par
+        # position sur 8 câbles, et les positions en défaut ne sont
+        # recherchées que dans un bloc qui a échoué.
+        defauts = {}
+        if any(vecteurs[:, c].min() < bornes_min[c] or
+               vecteurs[:, c].max() > bornes_max[c] for c in range(3)):
+            defauts["hors_hangar"] = (
+                np.any(vecteurs.min(axis=2) < bornes_min, axis=1) |
+                np.any(vecteurs.max(axis=2) > bornes_max, axis=1))
+        vecteurs -= geometrie.coins_hangar_transposes
+        longueurs = np.sqrt(np.einsum('nik,nik->nk', vecteurs, vecteurs))
+        longueur_min = float(longueurs.min())
+        longueur_max = float(longueurs.max())
+        if (longueur_min < geometrie.longueur_cable_min or
+                longueur_max > geometrie.longueur_cable_max):
+            defauts["longueurs_hors_limites"] = (
+                (longueurs.min(axis=1) < geometrie.longueur_cable_min) |
+                (longueurs.max(axis=1) > geometrie.longueur_cable_max))
+        if longueurs_precedentes is None:
+            longueurs_precedentes = longueurs[:1]
+        variations = np.diff(longueurs, axis=0, prepend=longueurs_precedentes)
+        np.abs(variations, out=variations)
+        vitesse_max = float(variations.max()) / pas_temps
+        if vitesse_max > geometrie.vitesse_cable_max:
+            defauts["vitesses_excessives"] = (
+                variations.max(axis=1) > geometrie.vitesse_cable_max *
+                pas_temps)
+
+        for cle, defaut in defauts.items():
+            nombre = int(np.count_nonzero(defaut))
+            if nombre and rapport["premiers"][cle] is None:
+                rapport["premiers"][cle] = indice + int(np.argmax(defaut))
+            rapport[cle] += nombre
+        rapport["longueur_min"] = min(rapport["longueur_min"], longueur_min)
+        rapport["longueur_max"] = max(rapport["longueur_max"], longueur_max)
+        rapport["vitesse_max"] = max(rapport["vitesse_max"], vitesse_max)
+        longueurs_precedentes = longueurs[-1:]
+        indice += len(positions)
+
+    rapport["nombre_pas"] = max(indice - 1, 0)
+    rapport["valide"] = not (rapport["hors_hangar"] or
+                             rapport["longueurs_hors_limites"] or
+                             rapport["vitesses_excessives"])
+    return rapport
+
+
+######################## Troisième partie : Commande du robot #################
+
+def commande(trajectoire, geometrie, periode_resync=None):
+    # Les définitions de tous les arguments sont données respectivement dans
+    # discretisation_trajectoire, calcul_pas_adapte, reconstruction_coins,
+    # commande_longeurs_cables. Les pas maximaux et le diamètre des tambours
+    # sont ceux de la géométrie du robot. periode_resync active le mode
+    # incrémental de commande_longeurs_cables.
+
+    # Cette fonction est la fonction de haut niveau dont on se servira pour
+    # commander la maquette.
+    # Elle prend en argument la trajectoire souhaitée et renvoie la commande à
+    # passer aux moteurs.
+    # Ces étapes de fonctionnement sont :
+    # - 1 : On discrétise la trajectoire donnée en argument.
+    # - 2 : On déduit de la trajectoire discrétisée les variations de longueurs
+    # des câbles.
+    # - 3 : On traduit ces variations de longueur des câbles en commande de
+    # rotation angulaire des moteurs.
+
+    # Cette fonction renvoie le tableau des commandes des moteurs, de dimension
+    # (nombre de pas, 8). Chaque commande moteur est une ligne dont le ième
+    # élément est la commande destinée au ième moteur.
+
+    trajectoireDiscretisee = discretisation_trajectoire(trajectoire,
+                                                        geometrie.pas_maximal)
+    longueurCable, _ = commande_longeurs_cables(trajectoireDiscretisee,
+                                                geometrie, periode_resync)
+    rotationMoteur = np.arctan(longueurCable / geometrie.diametre_tambour)
+
+    return rotationMoteur
+
+
+def commande_flux(trajectoire, geometrie, taille_bloc=TAILLE_LOT,
+                  periode_resync=None, nb_processus=None):
+    # Version en flux de commande : les trois étapes sont enchaînées bloc par
+    # bloc (de taille_bloc pas), si bien que la mémoire utilisée ne dépend pas
+    # de la longueur de la trajectoire et que les premières commandes peuvent
+    # être envoyées aux moteurs avant que toute la trajectoire soit calculée.
+
+    # Cette fonction renvoie un générateur de blocs de commandes des moteurs,
+    # chacun étant un np.array de dimension (taille_bloc, 8). Mis bout à bout,
+    # ces blocs sont identiques au résultat de commande. Si nb_processus est
+    # donné, la discrétisation et le calcul des longueurs sont répartis entre
+    # autant de processus (voir commande_longeurs_cables_paralleles_flux).
+
+    if nb_processus is not None:
+        blocs_longueurs = profiling.timed(
+            "kinematics", commande_longeurs_cables_paralleles_flux(
+                trajectoire, geometrie, nb_processus, taille_bloc,
+                periode_resync))
+    else:
+        blocs_disc = profiling.timed("discretisation",
+                                     discretisation_trajectoire_flux(
+                                         trajectoire, geometrie.pas_maximal,
+                                         taille_bloc))
+        blocs_longueurs = profiling.timed("kinematics",
+                                          commande_longeurs_cables_flux(
+                                              blocs_disc, geometrie,
+                                              periode_resync))
+    for longueurCable, _ in blocs_longueurs:
+        yield np.arctan(longueurCable / geometrie.diametre_tambour)
+
+
+class QuantificateurTicks(object):
+    """
+    Convertit les variations de longueur des câbles en nombres entiers de
+    micropas (ticks) des moteurs, voir RobotGeometry.longueur_tick.
+
+    Arrondir chaque variation séparément perdrait à chaque pas une fraction
+    de tick, et les câbles dériveraient au fil de la trajectoire. Le reste de
+    l'arrondi est donc reporté sur les pas suivants : c'est la somme cumulée
+    des variations qui est arrondie, si bien que la position de chaque moteur
+    ne s'écarte jamais de plus d'un demi-tick de la position exacte. Le
+    calcul est fait par lots, sans boucle sur les pas, et le reste est gardé
+    d'un appel à l'autre pour quantifier une commande en flux.
+
+    Attributs :
+    - residu : écart (en ticks) entre la position exacte et la position
+    commandée de chaque moteur après le dernier pas quantifié ;
+    - erreur_max : plus grand écart (en ticks) atteint par chaque moteur.
+    """
+
+    def __init__(self, geometrie):
+        self.longueur_tick = geometrie.longueur_tick
+        self.residu = np.zeros(8)
+        self.erreur_max = np.zeros(8)
+
+    def quantifie(self, variations_longueurs):
+        """
+        :param variations_longueurs: variations des longueurs des câbles (en
+        m), une ligne par pas
+
+        :type variations_longueurs: np.array de dimension (N, 8)
+
+        :return: nombre de ticks de chaque moteur à chaque pas
+        :rtype: np.array d'entiers de dimension (N, 8)
+        """
+        if len(variations_longueurs) == 0:
+            return np.empty((0, 8), dtype=np.int64)
+        cumul = np.cumsum(variations_longueurs, axis=0)
+        cumul /= self.longueur_tick
+        cumul += self.residu
+        positions = np.rint(cumul)
+        cumul -= positions
+        np.maximum(self.erreur_max, np.abs(cumul).max(axis=0),
+                   out=self.erreur_max)
+        self.residu = cumul[-1].copy()
+        return np.diff(positions, axis=0,
+                       prepend=np.zeros((1, 8))).astype(np.int64)
+
+
+def commande_ticks(trajectoire, geometrie):
+    # Variante de commande pour des moteurs pas à pas : renvoie le nombre de
+    # micropas de chaque moteur à chaque pas, de dimension (nombre de pas, 8),
+    # et la plus grande erreur de position (en ticks) de chaque moteur, voir
+    # QuantificateurTicks.
+    trajectoireDiscretisee = discretisation_trajectoire(trajectoire,
+                                                        geometrie.pas_maximal)
+    _, varLongueurCable = commande_longeurs_cables(trajectoireDiscretisee,
+                                                   geometrie)
+    quantificateur = QuantificateurTicks(geometrie)
+    ticks = quantificateur.quantifie(varLongueurCable)
+    return ticks, quantificateur.erreur_max
+
+
+def commande_ticks_flux(trajectoire, geometrie, taille_bloc=TAILLE_LOT,
+                        quantificateur=None, profil=None, slerp=False,
+                        nb_processus=None):
+    # Version en flux de commande_ticks : générateur de blocs de micropas,
+    # identiques mis bout à bout au résultat de commande_ticks. L'erreur
+    # maximale peut être lue dans quantificateur une fois le flux épuisé.
+    # Si profil est donné, la trajectoire est discrétisée avec ce profil de
+    # vitesse (voir ProfilVitesse), un pas par pas de temps ; sinon slerp
+    # choisit l'interpolation des orientations (voir
+    # discretisation_trajectoire) et nb_processus, s'il est donné, répartit
+    # la discrétisation et le calcul des longueurs entre autant de processus
+    # (voir commande_longeurs_cables_paralleles_flux).
+    if quantificateur is None:
+        quantificateur = QuantificateurTicks(geometrie)
+    if profil is None and nb_processus is not None:
+        # Chaque processus discrétise lui-même ses pas : les deux étapes
+        # sont mesurées ensemble.
+        blocs_longueurs = profiling.timed(
+            "kinematics", commande_longeurs_cables_paralleles_flux(
+                trajectoire, geometrie, nb_processus, taille_bloc,
+                slerp=slerp))
+    else:
+        if profil is None:
+            blocs_disc = discretisation_trajectoire_flux(
+                trajectoire, geometrie.pas_maximal, taille_bloc, slerp)
+        else:
+            blocs_disc = profil.discretisation_flux(trajectoire,
+                                                    geometrie.pas_maximal,
+                                                    taille_bloc)
+        blocs_disc = profiling.timed("discretisation", blocs_disc)
+        blocs_longueurs = profiling.timed("kinematics",
+                                          commande_longeurs_cables_flux(
+                                              blocs_disc, geometrie))
+    for _, varLongueurCable in blocs_longueurs:
+        with profiling.stage("quantisation", len(varLongueurCable)):
+            ticks = quantificateur.quantifie(varLongueurCable)
+        yield ticks
+
+
+# origine = np.array([0., 0., 0., 0., 0., 0.])
+# destination = np.array([0.5, 0., 0., 0, 0, 0])
+# n = calcul_pas_adapte(origine, destination, pas_maximal)
@@ -1,16 +1,212 @@
+import time
+import asyncio
+import inspect
+import itertools
 import numpy as np
 
+import profiling
 
-def auto(array, temps):
+
+class StepScheduler(object):
+    """Sends one command per time step against absolute deadlines.
+
+    The deadline of the kth command is start + k * time_step, so the error of
+    one sleep never adds up with the next ones and the drift over a whole
+    trajectory stays bounded by the jitter of a single step.
+
+    When the scheduler falls behind, the policy decides what happens :
+    - "catchup" sends every late command immediately, until the schedule is
+    met again ;
+    - "skip" does not send the commands whose successor is already due.
+    Commands are relative moves, so the motion of the commands not sent is
+    added to the next command that is, and the robot jumps on time to where
+    it should be. The last command is always sent.
+
+    Jitter (how late each command is sent) and overrun statistics are kept in
+    self.stats while the trajectory runs, and handed every report_period
+    seconds to the report callback, if any.
+
+    run blocks the calling thread, run_async is a coroutine that can be
+    cancelled between two commands, for instance to halt the robot. The time
+    step can be changed with set_time_step while a trajectory runs : the
+    commands that follow are then spaced by the new time step.
+
+    clock, sleep and sleep_async (the sleep of run_async) can be replaced,
+    for instance by a simulation.VirtualClock to run faster than real time.
+    """
+
+    policies = ["catchup", "skip"]
+
+    def __init__(self, time_step, policy="catchup", report=None, report_period=1.0, clock=time.monotonic, sleep=time.sleep, sleep_async=asyncio.sleep):
+        if time_step <= 0:
+            raise ValueError(f"The time step must be positive, not {time_step}")
+        if policy not in self.policies:
+            raise ValueError(f"Unknown late policy {policy}, use one of {', '.join(self.policies)}")
+        self.time_step = time_step
+        self.policy = policy
+        self.report = report
+        self.report_period = report_period
+        self.clock = clock
+        self.sleep = sleep
+        self.sleep_async = sleep_async
+        self.stats = self.empty_stats()
+        # The deadline of the kth command is origin + (k - origin_step) * time_step, the origin moves when the time step changes.
+        self.origin = 0.0
+        self.origin_step = 0
+        self.step = 0
+
+    @staticmethod
+    def empty_stats():
+        return {"sent": 0, "skipped": 0, "overruns": 0, "mean_jitter": 0.0, "max_jitter": 0.0, "elapsed": 0.0}
+
+    def set_time_step(self, time_step):
+        if time_step <= 0:
+            raise ValueError(f"The time step must be positive, not {time_step}")
+        # The next deadline keeps its old value, the following ones are spaced by the new time step.
+        self.origin += (self.step - self.origin_step) * self.time_step
+        self.origin_step = self.step
+        self.time_step = time_step
+
+    def run(self, commands, send):
+        # commands is an iterable of blocks of commands (one row per step), send is called with each command that is actually sent.
+        for deadline in self.steps(commands, send):
+            delay = deadline - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+        return self.stats
+
+    async def run_async(self, commands, send):
+        # Same as run, but control goes back to the event loop before every command, even when the robot is late, so that other tasks keep running and the trajectory can be cancelled. send can be a coroutine function, for a backend that has to wait for room (back-pressure) : it is awaited before waiting for the next deadline.
+        if not inspect.iscoroutinefunction(send):
+            for deadline in self.steps(commands, send):
+                await self.sleep_async(max(deadline - self.clock(), 0))
+            return self.stats
+        sent = []
+        for deadline in self.steps(commands, sent.append):
+            if sent:
+                await send(sent.pop())
+            await self.sleep_async(max(deadline - self.clock(), 0))
+        if sent:
+            await send(sent.pop())
+        return self.stats
+
+    def steps(self, commands, send):
+        # Generator shared by run and run_async : it yields the deadline of each command and sends the command once resumed.
+        self.stats = stats = self.empty_stats()
+        total_jitter = 0.0
+        rows = (row for block in commands for row in block)
+        pending = next(rows, None)
+        start = self.clock()
+        self.origin = start
+        self.origin_step = 0
+        self.step = 0
+        next_report = start + self.report_period
+        # Sum of the commands skipped since the last one sent.
+        skipped = None
+        while pending is not None:
+            command = pending
+            pending = next(rows, None)
+            deadline = self.origin + (self.step - self.origin_step) * self.time_step
+            self.step += 1
+            yield deadline
+            now = self.clock()
+            lateness = now - deadline
+            if lateness >= self.time_step:
+                # The deadline of the next command has already passed.
+                stats["overruns"] += 1
+                if self.policy == "skip" and pending is not None:
+                    stats["skipped"] += 1
+                    skipped = np.array(command) if skipped is None else skipped + command
+                    continue
+            if skipped is not None:
+                command = skipped + command
+                skipped = None
+            send(command)
+            stats["sent"] += 1
+            total_jitter += lateness
+            stats["mean_jitter"] = total_jitter / stats["sent"]
+            stats["max_jitter"] = max(stats["max_jitter"], lateness)
+            stats["elapsed"] = now - start
+            if self.report is not None and now >= next_report:
+                self.report(stats)
+                next_report += self.report_period
+
+
+def print_stats(stats):
+    print(f"sent {stats['sent']} commands in {stats['elapsed']:.3f} s, skipped {stats['skipped']}, overruns {stats['overruns']}, jitter mean {1000 * stats['mean_jitter']:.3f} ms max {1000 * stats['max_jitter']:.3f} ms")
+
+
+class PrintBackend(object):
+    """Backend that prints the commands instead of sending them to a robot.
+
+    A backend receives every command sent in auto mode (send), the manual commands (manual) and the halt orders (halt). It is the default backend, see use_backend to drive an actual robot, for instance with transport.SerialBackend.
+    """
+
+    def __init__(self):
+        self.counter = itertools.count()
+
+    def send(self, command):
+        print(next(self.counter), command)
+
+    def manual(self, vecteur, temps):
+        print("manual")
+        print(vecteur, temps)
+
+    def halt(self):
+        print("Interrupting")
+
+    def close(self):
+        pass
+
+
+backend = PrintBackend()
+
+
+def use_backend(new_backend):
+    # Every following command goes to new_backend, the previous backend is closed.
+    global backend
+    backend.close()
+    backend = new_backend
+
+
+def auto(commandes, temps, policy="catchup"):
+    # commandes is either a single array of motor commands (one row per step)
+    # or an iterable of such arrays, for instance the generator returned by
+    # cable_math.commande_ticks_flux. Blocks are consumed as soon as they are
+    # produced, so the robot can start moving before the whole trajectory is
+    # computed. One command is sent every temps seconds, see StepScheduler.
+    print("auto")
+    scheduler = StepScheduler(temps, policy, report=print_stats)
+    print_stats(scheduler.run(as_blocks(commandes), profiling.timed_call("send", backend.send)))
+
+
+async def auto_async(commandes, scheduler):
+    # Coroutine version of auto, driven by a scheduler created by the caller so that it can change its time step or read its statistics while the trajectory runs. Cancelling it halts the trajectory between two commands.
     print("auto")
-    for i in range(np.shape(array)[0]):
-        print(i, array[i], temps)
+    try:
+        stats = await scheduler.run_async(as_blocks(commandes), backend_send_async())
+    except asyncio.CancelledError:
+        print("trajectory interrupted")
+        print_stats(scheduler.stats)
+        raise
+    print_stats(stats)
+    return stats
+
+
+def backend_send_async():
+    # The send of the backend for run_async : its coroutine version if it has one (see transport.SerialBackend), which does not block the event loop while the robot catches up.
+    return profiling.timed_call("send", getattr(backend, "send_async", backend.send))
+
+
+def as_blocks(commandes):
+    if isinstance(commandes, np.ndarray):
+        return [commandes]
+    return commandes
 
 
 def manual(vecteur, temps):
-    print("manual")
-    print(vecteur, temps)
+    backend.manual(vecteur, temps)
 
 
 def halt():
-    print("Interrupting")
+    backend.halt()
@@ -1,5 +1,8 @@
 import os
 import sys
+import time
+import asyncio  # stdlib as well, runs the command loop and the trajectories concurrently.
+import threading
 import pickle  # pickle is in stdlib so we won't ever get an import error here.
 import argparse  # same, argparse is part of stdlib
 from textwrap import fill  # same, part of stdlib
@@ -13,6 +16,46 @@ try:
 except ImportError:
     print("---X This command line tool is an interface to a python module (more like script actually) called cable_robot. In order to use this tool you must first make sure that this module is available (it currently isn't). The recommended way to do this is to grab the source code cable_robot.py and put it in the same directory as this cli.py file. The source code for cable_robot is available freely on GitHub at [...].")
     sys.exit(1)
+try:
+    import cable_math as cm  # Computes the motor commands from the trajectory.
+except ImportError:
+    print("---X This command line tool computes the motor commands of the robot using a python module called cable_math. In order to use this tool you must first make sure that this module is available (it currently isn't). The recommended way to do this is to grab the source code cable_math.py and put it in the same directory as this cli.py file.")
+    sys.exit(1)
+from command_cache import CommandCache  # Shipped along with cable_math, same directory.
+import text_trajectory  # Same, parses the txt and csv trajectories.
+import trajectory_archive  # Same, archives of named trajectories.
+import profiling  # Same, times the stages of the computation for the stats command.
+import tensions  # Same, checks that the cables can hold the mobile.
+
+# Number of steps of the blocks of commands computed while the robot moves. Each block is computed on the event loop, so small blocks keep the tool responsive to halt.
+MOTION_BLOCK_SIZE = 4096
+
+
+class LineReader(object):
+    """Reads the standard input line by line without blocking the event loop.
+
+    The lines are read in a daemon thread and handed to the event loop through a queue, which works the same whether the standard input is a terminal, a pipe or a file, and never keeps the tool from exiting.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        threading.Thread(target=self.read, daemon=True).start()
+
+    def read(self):
+        while True:
+            line = sys.stdin.readline()
+            # An empty string means EOF, it is handed over as None.
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, line or None)
+            if not line:
+                return
+
+    async def readline(self, prompt):
+        print(prompt, end="", flush=True)
+        line = await self.queue.get()
+        if line is None:
+            raise EOFError()
+        return line.rstrip("\n")
 
 
 class CLI(object):
@@ -32,14 +75,111 @@ class CLI(object):
         # To leave the tool.
         self.exit_list = ["exit", "EXIT", "Exit", "e", "E", "leave", "LEAVE", "Leave", "l", "L", "quit", "QUIT", "Quit", "q", "Q"]
         self.halt_list = ["halt", "HALT", "Halt", "h", "H", "stop", "STOP", "Stop", "s", "S"]
+        # To inspect or clear the cache of computed commands.
+        self.cache_list = ["cache", "CACHE", "Cache", "c", "C"]
+        # To see what the robot is doing, mostly while a trajectory runs.
+        self.status_list = ["status", "STATUS", "Status"]
+        # To see where the time went during the last trajectory.
+        self.stats_list = ["stats", "STATS", "Stats"]
+        # To find where the mobile is from the lengths of its cables.
+        self.locate_list = ["locate", "LOCATE", "Locate"]
+        # Last position found by locate, the next search starts from there.
+        self.located_pose = None
         self.time_step = 0.1
         # Full output by default.
         self.silence = 2 - cli_args.verbosity
         # Safe mode, annoys users for their safety
         self.safe = not cli_args.unsafe
         self.speed_limit = 100  # steps per second, above that value the robot is deemed unstable.
+        # What to do with late commands in auto mode, see cable_robot.StepScheduler.
+        self.late_policy = cli_args.late_policy
+        # Whether the pre-flight check also checks the tensions of the cables, see tensions.faisabilite_trajectoire.
+        self.check_tensions = cli_args.check_tensions
+        # The stages of the computation of the commands are only timed on demand, it costs close to nothing otherwise.
+        if cli_args.profiling or cli_args.profiling_memory:
+            profiling.profiler.enable(memory=cli_args.profiling_memory)
+        # How the robot speeds up and slows down along a trajectory in auto mode, see motion_profile.
+        self.motion_profile = cli_args.motion_profile
+        self.acceleration = cli_args.acceleration
+        self.jerk = cli_args.jerk
+        # Orientations are interpolated along great circles (slerp) or angle by angle (euler), see cable_math.discretisation_trajectoire.
+        self.slerp = cli_args.orientation == "slerp"
+        # Number of processes computing the commands at constant speed, None to compute them in the tool itself, see cable_math.commande_longeurs_cables_paralleles.
+        self.processes = cli_args.processes
+        if self.processes is not None and self.processes < 1:
+            self.bprint(f"The number of processes must be at least 1, not {self.processes}.", 2)
+            sys.exit(1)
+        if self.acceleration <= 0 or self.jerk <= 0:
+            self.bprint(f"The acceleration and the jerk of the motion profile must be positive, not {self.acceleration} and {self.jerk}.", 2)
+            sys.exit(1)
+        # Commands computed for a trajectory are kept on disk, so that replaying the same trajectory does not compute them again.
+        self.cache = CommandCache(cli_args.cache_dir, int(cli_args.cache_size * 2**20))
+        # Same for the trajectories read from text files, which are kept parsed in a subdirectory of the cache. Both count against the same --cache-size.
+        self.sidecars = CommandCache(os.path.join(self.cache.directory, "trajectories"), shared_with=self.cache)
+        # Physical characteristics of the robot, read once from the profile file and then used for every computation.
+        if cli_args.profile is None:
+            self.geometry = cm.GEOMETRIE_MAQUETTE
+        else:
+            try:
+                self.geometry = cm.RobotGeometry.depuis_profil(cli_args.profile)
+            except (OSError, ValueError, TypeError) as e:
+                self.bprint(f"The profile file {cli_args.profile} could not be loaded : {e}\nA profile is a JSON file whose keys are some of dimensions_mobile, dimensions_hangar, diametre_tambour, pas_maximal, chgt_num, coins_mobile, coins_hangar, rapport_reduction, pas_par_tour, micropas, longueur_cable_min, longueur_cable_max and vitesse_cable_max. Keys that are not given keep the value of the default robot.", 2)
+                sys.exit(1)
+            self.bprint(f"Robot profile loaded from {cli_args.profile}.")
+        # Where the commands go : printed (the default), to the controllers on a serial port, to a fake controller on a pseudo-terminal to test the serial link, or to simulated motors.
+        self.fake_controller = None
+        # The simulated robot of the simulated backend, and the VirtualClock pacing its trajectories when they run faster than real time.
+        self.simulator = None
+        self.virtual_clock = None
+        if cli_args.backend == "simulated":
+            import simulation
+            if cli_args.motor_acceleration <= 0:
+                self.bprint(f"The acceleration of the simulated motors must be positive, not {cli_args.motor_acceleration}.", 2)
+                sys.exit(1)
+            # The motors turn at most as fast as the cables of the robot may be wound, both limits are converted from meters of cable to ticks.
+            tick = self.geometry.longueur_tick
+            if cli_args.fast_simulation:
+                self.virtual_clock = simulation.VirtualClock()
+            self.simulator = simulation.SimulatedRobot(self.geometry.vitesse_cable_max / tick, cli_args.motor_acceleration / tick, self.time_step,
+                                                       clock=self.virtual_clock.time if self.virtual_clock is not None else time.monotonic)
+            cr.use_backend(self.simulator)
+            self.bprint(f"Sending the commands to a simulated robot, {'faster than' if cli_args.fast_simulation else 'in'} real time.")
+        elif cli_args.backend != "print":
+            # transport relies on termios and pseudo-terminals, it is only imported when needed.
+            import transport
+            port = cli_args.port
+            if cli_args.backend == "loopback":
+                self.fake_controller = transport.FakeController()
+                port = self.fake_controller.path
+            elif port is None:
+                self.bprint("The serial backend needs the serial port of the motor controllers, please give it with the --port option.", 2)
+                sys.exit(1)
+            try:
+                cr.use_backend(transport.SerialBackend(transport.SerialTransport(port, cli_args.baudrate)))
+            except (OSError, ValueError) as e:
+                self.bprint(f"The serial port {port} could not be opened : {e}", 2)
+                sys.exit(1)
+            self.bprint(f"Sending the commands to the motor controllers on {port}.")
+        # Trajectories run as asyncio tasks while the tool keeps reading commands. motion is the task of the current trajectory and scheduler the StepScheduler pacing it.
+        self.motion = None
+        self.scheduler = None
+        self.reader = None
 
-    def read_command(self, command):
+    async def run(self):
+        # Main loop of the tool, reads and executes commands until exit or EOF.
+        self.reader = LineReader(asyncio.get_running_loop())
+        while True:
+            try:
+                command = await self.reader.readline(">> ")
+                await self.read_command(command)
+            except EOFError:
+                print("exit")  # In order to avoid ugly output
+                self.exit()
+
+    def moving(self):
+        return self.motion is not None and not self.motion.done()
+
+    async def read_command(self, command):
         # cursor is used to keep track of how many argument we read from the users command.
         cursor = 0
         split_command = str.split(command)
@@ -52,29 +192,75 @@ class CLI(object):
         if instruction in self.auto_list:
             return self.process_auto(split_command, cursor)
         elif instruction in self.manual_list:
-            return self.process_manual()
+            return await self.process_manual()
         elif instruction in self.time_list:
             return self.process_time(split_command, cursor)
         elif instruction in self.freq_list:
             return self.process_freq(split_command, cursor)
         elif instruction in self.help_list:
             return self.process_help(split_command, cursor)
+        elif instruction in self.cache_list:
+            return self.process_cache(split_command, cursor)
+        elif instruction in self.status_list:
+            return self.process_status()
+        elif instruction in self.stats_list:
+            return self.process_stats(split_command, cursor)
+        elif instruction in self.locate_list:
+            return self.process_locate(split_command, cursor)
         elif instruction in self.exit_list:
             return self.exit()
         elif instruction in self.halt_list:
-            cr.halt()
-            self.bprint("Halting the robot ...")
-            return
+            return self.halt()
         else:
             self.bprint(f"The inputed command {command} could not be parsed, because the tool did not understand the term '{instruction}'. If you wish to you can use :\n'>> help'\nThat instruction will bring a list of the available instruction and their use cases.", 2)
             return
 
+    def halt(self):
+        # Interrupts the running trajectory, if any, before the next command is sent.
+        if self.moving():
+            self.motion.cancel()
+        self.halt_robot()
+        self.bprint("Halting the robot ...")
+
     def exit(self):
         # Used to leave the tool. When triggered this will always halt the robot.
-        cr.halt()
+        if self.moving():
+            self.motion.cancel()
+        self.halt_robot()
         self.bprint("Leaving the tool... The robot is being halted.")
         sys.exit(0)
 
+    def halt_robot(self):
+        try:
+            cr.halt()
+        except OSError as e:
+            # The link to the robot is broken, there is nothing more the tool can do.
+            self.bprint(f"The halt order could not be sent to the robot : {e}", 2)
+
+    def set_time_step(self, time_step):
+        self.time_step = time_step
+        if self.moving():
+            self.scheduler.set_time_step(time_step)
+            if self.simulator is not None:
+                self.simulator.set_time_step(time_step)
+            self.bprint(f"The running trajectory now moves at {time_step} seconds per step.")
+
+    def motion_profile_at(self, time_step):
+        # The cable_math.ProfilVitesse trajectories are discretised with, or None for the constant speed discretisation.
+        if self.motion_profile == "constant":
+            return None
+        jerk = self.jerk if self.motion_profile == "scurve" else None
+        return cm.ProfilVitesse(time_step, self.acceleration, secousse_max=jerk, slerp=self.slerp)
+
+    def process_status(self):
+        if not self.moving():
+            self.bprint(f"The robot is not running any trajectory. The time step is {self.time_step} seconds ({int(1/self.time_step)} steps per second).")
+            return
+        stats = self.scheduler.stats
+        self.bprint(f"A trajectory is running at {self.scheduler.time_step} seconds per step : {stats['sent']} commands sent in {stats['elapsed']:.1f} seconds, {stats['skipped']} skipped, {stats['overruns']} overruns, the commands were sent {1000 * stats['mean_jitter']:.3f} ms late on average and {1000 * stats['max_jitter']:.3f} ms late at most.")
+        if self.simulator is not None:
+            self.bprint(self.simulator.describe())
+
     def process_freq(self, split_command, cursor):
         if len(split_command) == cursor:
             # i.e. we have no more arguments available
@@ -94,9 +280,9 @@ class CLI(object):
                         self.bprint(f"Caution, the behavior of the robot is strongly undefined at a high speed. The inputed speed is too high to be accepted when the robot is in safe mode. Please input a step frequency that is smaller than {self.speed_limit} seconds (i.e. {1/self.speed_limit} seconds between each steps). If you know what you are doing you can also try to raise the speed limit, please consult the help manual to see how to do that.\nThe inputed step frequency {int_freq} has been refused, it will remain at its old value {int(1/self.time_step)}", 2)
                     else:
                         self.bprint(f"The inputed speed is above the preset speed limit (of {self.speed_limit} steps per second). However the robot currently is in unsafe mode, hence the value {int_freq} steps per second won't be refused. Please be carefull during your manipulations.", 1)
-                        self.time_step = 1/int_freq
+                        self.set_time_step(1/int_freq)
                 else:
-                    self.time_step = 1/int_freq
+                    self.set_time_step(1/int_freq)
 
             except ValueError as e:
                 self.bprint(f"The value of the step frequency has to be a positive int, but the tool could not parse {freq} as an int. The correct syntax to set the step frequency is :\n'>> frequency <step frequency>'", 2)
@@ -121,16 +307,22 @@ class CLI(object):
                         self.bprint(f"Caution, the behavior of the robot is strongly undefined at a high speed. The inputed speed is too high to be accepted when the robot is in safe mode. Please input a time step that is bigger than {1/self.speed_limit} seconds (i.e. {self.speed_limit} steps per seconds). If you know what you are doing you can also try to raise the speed limit, please consult the help manual to see how to do that.\nThe inputed time step {float_pace} has been refused, it will remain at its old value {self.time_step}", 2)
                     else:
                         self.bprint(f"The inputed speed is above the preset speed limit (of {self.speed_limit} steps per second). However the robot currently is in unsafe mode, hence the value {float_pace} seconds (i.e. {int(1/float_pace)} steps per second) won't be refused. Please be carefull during your manipulations.", 1)
-                        self.time_step = float_pace
+                        self.set_time_step(float_pace)
                 else:
-                    self.time_step = float_pace
+                    self.set_time_step(float_pace)
 
             except ValueError as e:
                 self.bprint(f"The value of the time step has to be a positive float, but the tool could not parse {pace} as a float. The correct syntax to set the time step is :\n'>> time <time step>'", 2)
                 return
 
     def process_auto(self, split_command, cursor):
+        if self.moving():
+            self.bprint("A trajectory is already running. Wait for it to end or interrupt it with :\n'>> halt'\nbefore starting another one.", 2)
+            return
+        # Every auto command starts a new run for the stats command, even if it is refused later on.
+        profiling.profiler.reset()
         file_path = ""
+        name = None
         if len(split_command) == cursor:
             # i.e. no other argument, we will look if we find any suiting file.
             self.bprint("You didn't supply file for the trajectory. Looking for an appropriate file ...", 1)
@@ -144,8 +336,12 @@ class CLI(object):
             file_path = split_command[cursor]
             cursor += 1
             if not os.path.exists(file_path):
-                self.bprint(f"The supplied file {file_path} does not exists", 2)
-                return
+                # archive:name selects one trajectory of an archive.
+                reference = trajectory_archive.split_reference(file_path)
+                if reference is None:
+                    self.bprint(f"The supplied file {file_path} does not exists", 2)
+                    return
+                file_path, name = reference
 
         # We have found the trajectory file, we now need to find how to read it.
         method = ""
@@ -169,49 +365,141 @@ class CLI(object):
             elif extension == ".csv":
                 self.bprint("Your file seems to be numpy array saved in the csv format")
                 method = "csv"
+            elif extension == trajectory_archive.EXTENSION or name is not None:
+                self.bprint("Your file seems to be an archive of trajectories.")
+                method = "archive"
         else:
             method = split_command[cursor]
-            known_methods = ["npy", "txt", "dat", "csv", "pickle"]
+            known_methods = ["npy", "txt", "dat", "csv", "pickle", "archive"]
             if method not in known_methods:
-                self.bprint(f"The reading method you specified : {method} is unknown to this tool. Please use one of npy, txt, dat, csv or pickle. Read the help manual in order to see how to use either of these.", 2)
+                self.bprint(f"The reading method you specified : {method} is unknown to this tool. Please use one of npy, txt, dat, csv, pickle or archive. Read the help manual in order to see how to use either of these.", 2)
+                return
+            if name is not None and method != "archive":
+                self.bprint(f"{file_path}:{name} designates the trajectory {name} of an archive, it can only be read with the archive method.", 2)
+                return
+
+        with profiling.stage("load"):
+            array = self.load_trajectory(file_path, method, name)
+        if array is None:
+            return
+
+        if np.ndim(array) != 2 or np.shape(array)[1] != 6:
+            self.bprint(f"The trajectory in the file {file_path} has shape {np.shape(array)}, but a trajectory must have 6 columns (3 positions and 3 rotations) and as many rows as you want it to.", 2)
+            return
+        profiling.count("trajectory_points", len(array))
+
+        # Pre-flight check : the whole trajectory is checked against the physical limits of the robot before the first command is sent, rather than finding out half way through that it leaves the hangar or that the motors can not keep up.
+        profile = self.motion_profile_at(self.time_step)
+        with profiling.stage("validation"):
+            report = cm.validation_trajectoire(array, self.geometry, self.time_step, profil=profile, slerp=self.slerp)
+        # On demand, the cables must also be able to hold the mobile at every step, with tensions within the limits of tensions. It is much slower than the other checks, hence off by default.
+        infeasible = None
+        if self.check_tensions:
+            with profiling.stage("tensions"):
+                feasible, margins = tensions.faisabilite_trajectoire(array, self.geometry, profil=profile, slerp=self.slerp)
+            infeasible = np.flatnonzero(~feasible)
+        if not report["valide"] or (infeasible is not None and len(infeasible)):
+            problems = []
+            first = report["premiers"]
+            if report["hors_hangar"]:
+                problems.append(f" - the mobile leaves the hangar at {report['hors_hangar']} steps, the first one being step {first['hors_hangar']} ;")
+            if report["longueurs_hors_limites"]:
+                problems.append(f" - the cables would be shorter than {self.geometry.longueur_cable_min} m or longer than {self.geometry.longueur_cable_max:.3f} m at {report['longueurs_hors_limites']} steps, the first one being step {first['longueurs_hors_limites']} (the cable lengths range from {report['longueur_min']:.3f} m to {report['longueur_max']:.3f} m) ;")
+            if report["vitesses_excessives"]:
+                problems.append(f" - the cables would have to move faster than the motors can ({self.geometry.vitesse_cable_max} m/s) at {report['vitesses_excessives']} steps, the first one being step {first['vitesses_excessives']}. They reach {report['vitesse_max']:.3f} m/s at the current time step, a time step of at least {self.time_step * report['vitesse_max'] / self.geometry.vitesse_cable_max:.4f} seconds would be needed ;")
+            if infeasible is not None and len(infeasible):
+                problems.append(f" - the cables can not hold the mobile with tensions between {tensions.TENSION_MIN} N and {tensions.TENSION_MAX} N at {len(infeasible)} steps, the first one being step {infeasible[0]} (the tension is {-margins.min():.1f} N beyond the limits at worst) ;")
+            problems = "\n".join(problems)
+            if self.safe:
+                self.bprint(f"The trajectory in the file {file_path} does not fit the physical limits of the robot :\n{problems}\nThe trajectory has been refused. Steps are numbered from 0, the starting point, in the discretised trajectory of {report['nombre_pas']} steps.", 2)
                 return
+            self.bprint(f"The trajectory in the file {file_path} does not fit the physical limits of the robot :\n{problems}\nHowever the robot currently is in unsafe mode, hence the trajectory won't be refused. Please be carefull during your manipulations.", 1)
 
+        # We finally start the trajectory computation. The motor commands are computed block by block and each block is handed to the robot as soon as it is ready, so the robot does not have to wait for the whole trajectory to be computed. If this trajectory has already been computed for this robot, the commands are read from the cache instead.
+        commands = None
+        if self.cache.max_size > 0:
+            key = self.cache.key(array, self.geometry, profile, self.slerp)
+            commands = self.cache.get(key)
+        if commands is not None:
+            self.bprint("The commands for this trajectory were found in the cache, no computation is needed.")
+            profiling.count("cache_hits")
+        else:
+            # The commands are the number of ticks each motor turns at each step.
+            commands = cm.commande_ticks_flux(array, self.geometry, MOTION_BLOCK_SIZE, profil=profile, slerp=self.slerp, nb_processus=self.processes)
+            if self.cache.max_size > 0:
+                commands = profiling.timed("cache", self.cache.record(key, commands, '<i8'))
+        # The trajectory runs in the background, the tool keeps reading commands so that it can be halted or inspected at any time.
+        if self.virtual_clock is not None:
+            # Faster than real time, the scheduler sleeps on the simulated clock. Its reports would come every simulated second, the simulated robot reports once the trajectory is over instead.
+            clock = self.virtual_clock
+            self.scheduler = cr.StepScheduler(self.time_step, self.late_policy, clock=clock.time, sleep=clock.sleep, sleep_async=clock.sleep_async)
+        else:
+            self.scheduler = cr.StepScheduler(self.time_step, self.late_policy, report=cr.print_stats)
+        if self.simulator is not None:
+            self.simulator.start(self.time_step)
+        self.motion = asyncio.get_running_loop().create_task(self.run_motion(commands))
+        return
+
+    def load_trajectory(self, file_path, method, name=None):
+        # Reads the trajectory in file_path with the given reading method. Returns the array, or None if it could not be read, the reason having been printed. name is the trajectory to read in an archive.
         array = np.array(0)
+        if method == "archive":
+            try:
+                archive = trajectory_archive.TrajectoryArchive(file_path)
+                if name is None:
+                    if len(archive) != 1:
+                        self.bprint(f"The archive {file_path} holds {len(archive)} trajectories, choose one of them with :\n'>> auto {file_path}:<name>'\nThe trajectories of this archive are : {', '.join(archive.names())}.", 2)
+                        return None
+                    name = archive.names()[0]
+                if name not in archive:
+                    self.bprint(f"The archive {file_path} holds no trajectory named {name}. The trajectories of this archive are : {', '.join(archive.names())}.", 2)
+                    return None
+                # Only the selected trajectory is mapped in memory, after its checksum has been checked.
+                array = archive.get(name)
+            except (OSError, ValueError) as e:
+                self.bprint(f"The archive {file_path} could not be read : {e}", 2)
+                return None
+            geometry = archive.geometry(name)
+            if geometry is not None and geometry["fingerprint"] != trajectory_archive.geometry_metadata(self.geometry)["fingerprint"]:
+                self.bprint(f"The trajectory {name} was packed for {'the robot of the profile ' + geometry['profile'] if geometry['profile'] else 'the default robot'}, which is not the robot this tool is currently using. Make sure it still fits, or start the tool with the matching --profile.", 1)
+            return array
         if method == "npy":
             try:
-                array = np.load(file_path)
-            except IOException as e:
+                # The file is mapped in memory rather than read, so that even multi-gigabyte trajectories open instantly. The computation then walks the mapped array window by window.
+                array = np.load(file_path, mmap_mode='r')
+            except (OSError, ValueError) as e:
                 self.bprint(f"The data in the file {file_path} could not be loaded. Consider explicitely telling the tool how to open your file, or using another format if the problem persists.", 2)
                 self.bprint(f"The minimal syntax to explain how to open a file is :\n'>> auto <trajectory_file> <method>'\n Method should be one of 'pickle', 'npy', 'dat', 'csv', 'txt'. Read the help for more information about those methods.")
-                return
-        elif method == "txt":
+                return None
+        elif method in ["txt", "csv"]:
             try:
-                array = np.loadtxt(file_path, dtype=float)
-            except Exception as e:
-                # I don't know which exception to expect here, but hopefully nothing will go wrong here
+                # The text is parsed chunk by chunk, and only once : the parsed trajectory is saved as a binary sidecar next to the cached commands, which is mapped in memory the next times this file is used.
+                array, from_sidecar = text_trajectory.load(file_path, ',' if method == "csv" else None, self.sidecars)
+            except text_trajectory.TrajectoryFormatError as e:
+                self.bprint(f"The file {file_path} is not a trajectory in the {method} format : line {e.line} is not a row of 6 numbers ({e}). Each row of the file must hold the 3 positions and the 3 rotations of one step.", 2)
+                return None
+            except (OSError, UnicodeError) as e:
                 self.bprint(f"The data in the file {file_path} could not be loaded. Consider explicitely telling the tool how to open your file, or using another format if the problem persists.", 2)
                 self.bprint(f"The minimal syntax to explain how to open a file is :\n'>> auto <trajectory_file> <method>'\n Method should be one of 'pickle', 'npy', 'dat', 'csv', 'txt'. Read the help for more information about those methods.")
-                return
+                return None
+            if from_sidecar:
+                self.bprint("This file was already read once, its trajectory was loaded from the sidecar saved then instead of parsing the text again.")
+                profiling.count("sidecar_hits")
         elif method == "dat":
             try:
-                # The dat format saves array in one line (like its machine representation) so we must to reshape it.
-                array_flat = np.fromfile(file_path, dtype=float)
-                size = np.size(array_flat)
-                array = array_flat.reshape((size//6, 6))
+                # The dat format saves array in one line (like its machine representation) so we must give its shape to the memory map ourselves.
+                row_size = 6 * np.dtype(float).itemsize
+                file_size = os.path.getsize(file_path)
+                if file_size % row_size != 0:
+                    self.bprint(f"The size of the file {file_path} ({file_size} bytes) is not a multiple of the size of a row of 6 floats ({row_size} bytes), so it can not hold a trajectory with 6 columns.", 2)
+                    return None
+                array = np.memmap(file_path, dtype=float, mode='r', shape=(file_size // row_size, 6))
                 self.bprint("The dat file format is deprecated and dangerous as it is not plateform independant. Please use the npy format as an alternative instead.", 1)
             except Exception as e:
                 # same
                 self.bprint(f"The data in the file {file_path} could not be loaded. Consider explicitely telling the tool how to open your file, or using another format if the problem persists.", 2)
                 self.bprint(f"The minimal syntax to explain how to open a file is :\n'>> auto <trajectory_file> <method>'\n Method should be one of 'pickle', 'npy', 'dat', 'csv', 'txt'. Read the help for more information about those methods.")
-                return
-        elif method == "csv":
-            try:
-                array = np.loadtxt(file_path, dtype=float, delimiter=',')
-            except Exception as e:
-                # Well, I guess I could get used to this. But really, the numpy documentation never seems to mention the raised exceptions
-                self.bprint(f"The data in the file {file_path} could not be loaded. Consider explicitely telling the tool how to open your file, or using another format if the problem persists.", 2)
-                self.bprint(f"The minimal syntax to explain how to open a file is :\n'>> auto <trajectory_file> <method>'\n Method should be one of 'pickle', 'npy', 'dat', 'csv', 'txt'. Read the help for more information about those methods.")
-                return
+                return None
         else:   # i.e. method = pickle
             try:
                 with open(file_path, 'rb') as source_file:
@@ -220,13 +508,138 @@ class CLI(object):
             except pickle.UnpicklingError as e:
                 self.bprint(f"The data in the file {file_path} could not be loaded. Consider explicitely telling the tool how to open your file, or using another format if the problem persists.", 2)
                 self.bprint(f"The minimal syntax to explain how to open a file is :\n'>> auto <trajectory_file> <method>'\n Method should be one of 'pickle', 'npy', 'dat', 'csv', 'txt'. Read the help for more information about those methods.")
+                return None
+        return array
+
+    async def run_motion(self, commands):
+        try:
+            await cr.auto_async(commands, self.scheduler)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Nobody awaits this task, so errors would otherwise go unnoticed.
+            self.halt_robot()
+            self.bprint(f"The trajectory was interrupted by an error : {e}", 2)
+        finally:
+            profiling.profiler.finish()
+            if self.simulator is not None:
+                self.bprint(self.simulator.describe())
+
+    def process_locate(self, split_command, cursor):
+        arguments = split_command[cursor:]
+        if len(arguments) == 8:
+            try:
+                lengths = np.array([float(argument) for argument in arguments])
+            except ValueError:
+                self.bprint(f"The lengths of the cables must be numbers, in meters, not {' '.join(arguments)}.", 2)
                 return
+            # Starting from the last position found makes the search a matter of 2 or 3 iterations when the mobile has not moved much since.
+            poses, report = cm.cinematique_directe_lot(lengths, self.geometry, self.located_pose)
+            pose = poses[0]
+            if report["convergees"] == 0:
+                self.bprint(f"No position of the mobile matches these lengths, the closest one found is {np.array2string(pose, precision=4)}, which is {report['residu_max'] * 1000:.3f} mm off.", 2)
+                return
+            self.located_pose = pose
+            self.bprint(f"The mobile is at x = {pose[0]:.4f} m, y = {pose[1]:.4f} m, z = {pose[2]:.4f} m, with the angles rho = {pose[3]:.4f}, theta = {pose[4]:.4f} and phi = {pose[5]:.4f} radians ({report['iterations_max']} iterations).")
+            if report["residu_max"] > self.geometry.longueur_tick * 8:
+                self.bprint(f"The lengths of the cables do not quite match each other : at that position one of them is {report['residu_max'] * 1000:.3f} mm off. A cable may be slack or the lengths wrong.", 1)
+            return
+        if len(arguments) == 2:
+            source, target = arguments
+            try:
+                lengths = np.load(source, mmap_mode='r')
+            except (OSError, ValueError) as e:
+                self.bprint(f"The lengths could not be read from {source} : {e}", 2)
+                return
+            if np.ndim(lengths) != 2 or np.shape(lengths)[1] != 8:
+                self.bprint(f"The file {source} holds an array of shape {np.shape(lengths)}, but lengths must be saved as an array of 8 columns, one row per sample.", 2)
+                return
+            poses, report = cm.cinematique_directe(lengths, self.geometry, self.located_pose)
+            try:
+                np.save(target, poses)
+            except OSError as e:
+                self.bprint(f"The positions could not be saved to {target} : {e}", 2)
+                return
+            self.bprint(f"The {report['nombre']} positions were saved to {target}, {report['convergees']} of them were found with at most {report['iterations_max']} iterations ({report['iterations_moyenne']:.1f} on average). The lengths of the positions found are {report['residu_quadratique_moyen'] * 1000:.4f} mm off the given ones on average, and {report['residu_max'] * 1000:.4f} mm at most.")
+            if report["convergees"] < report["nombre"]:
+                self.bprint(f"{report['nombre'] - report['convergees']} samples have no matching position, the first one being sample {report['non_convergees'][0]} (numbered from 0). Their positions are the closest ones found.", 1)
+            return
+        self.bprint("The syntax of the locate command is :\n'>> locate <l1> <l2> <l3> <l4> <l5> <l6> <l7> <l8>'\nwith the lengths of the 8 cables in meters, or\n'>> locate <lengths.npy> <positions.npy>'\nto find the positions of a whole recording of lengths.", 2)
+        return
+
+    def process_stats(self, split_command, cursor):
+        profiler = profiling.profiler
+        if len(split_command) == cursor:
+            # i.e. no more arguments, the user wants to see the statistics of the last run.
+            if not profiler.enabled and not profiler.stages:
+                self.bprint("Nothing has been measured : the stages of the computation are only timed once profiling is on. Turn it on with :\n'>> stats on'\nor start the tool with the --profiling option, then run a trajectory.", 1)
+                return
+            self.bprint(self.describe_stats(profiler.report()))
+            return
+        action = split_command[cursor]
+        cursor += 1
+        if action in ["on", "ON", "On"]:
+            memory = len(split_command) > cursor and split_command[cursor] in ["memory", "MEMORY", "Memory"]
+            profiler.enable(memory=memory)
+            if memory:
+                self.bprint("Profiling is on, the next trajectories will be timed stage by stage and the peak memory of each stage will be measured, which slows the computation down.")
+            else:
+                self.bprint("Profiling is on, the next trajectories will be timed stage by stage.")
+        elif action in ["off", "OFF", "Off"]:
+            profiler.disable()
+            self.bprint("Profiling is off.")
+        elif action in ["json", "JSON", "Json"] and len(split_command) > cursor:
+            path = split_command[cursor]
+            try:
+                profiler.save(path)
+            except OSError as e:
+                self.bprint(f"The statistics could not be saved to {path} : {e}", 2)
+                return
+            self.bprint(f"The statistics of the last run were saved to {path}.")
+        else:
+            self.bprint(f"The stats command does not know the action {' '.join(split_command[cursor - 1:])}. The syntax to use the stats command is :\n'>> stats'\nto see the statistics of the last run,\n'>> stats json <file>'\nto save them as JSON and\n'>> stats on', '>> stats on memory' or '>> stats off'\nto turn profiling on (measuring the memory of each stage as well) or off.", 2)
+        return
+
+    def describe_stats(self, report):
+        # Human readable table of the statistics of the last run, one line per stage.
+        state = "finished" if report["finished"] else "still running or refused"
+        lines = [f"Last run ({state}) : {report['wall_time']:.3f} s of wall time."]
+        if report["peak_memory"] is not None:
+            lines.append(f"Peak memory allocated during the run : {report['peak_memory'] / 2**20:.1f} MB.")
+        if report["max_rss"] is not None:
+            lines.append(f"Peak resident memory of the tool since it started : {report['max_rss'] / 2**20:.1f} MB.")
+        lines.append(f"{'stage':>14} {'calls':>7} {'wall (s)':>9} {'own (s)':>9} {'items':>10} {'items/s':>10} {'MB':>7}")
+        for name, stage in sorted(report["stages"].items(), key=lambda item: -item[1]["own_time"]):
+            rate = f"{stage['items_per_second']:.0f}" if stage["items"] and stage["items_per_second"] is not None else "-"
+            memory = f"{stage['peak_memory'] / 2**20:.1f}" if report["peak_memory"] is not None else "-"
+            lines.append(f"{name:>14} {stage['calls']:>7} {stage['wall_time']:>9.4f} {stage['own_time']:>9.4f} {stage['items']:>10} {rate:>10} {memory:>7}")
+        for name, value in report["counters"].items():
+            lines.append(f"{name} : {value}")
+        return "\n".join(lines)
 
-        # We finally start the trajectory computation
-        cr.auto(array, self.time_step)
+    def process_cache(self, split_command, cursor):
+        if len(split_command) == cursor:
+            # i.e. no more arguments, the user just wants to see what is in the cache.
+            self.bprint(self.cache.describe())
+            self.bprint(f"Parsed text trajectories : {self.sidecars.describe()}")
+            return
+        action = split_command[cursor]
+        cursor += 1
+        if action in ["clear", "CLEAR", "Clear"]:
+            try:
+                removed = self.cache.clear() + self.sidecars.clear()
+            except OSError as e:
+                self.bprint(f"The cache could not be cleared : {e}", 2)
+                return
+            self.bprint(f"{removed} entries were removed from the cache.")
+        else:
+            self.bprint(f"The cache command does not know the action {action}. The syntax to use the cache command is :\n'>> cache'\nto see what is in the cache and\n'>> cache clear'\nto empty it.", 2)
         return
 
-    def process_manual(self):
+    async def process_manual(self):
+        if self.moving():
+            self.bprint("The robot is running a trajectory in auto mode. Interrupt it with :\n'>> halt'\nbefore switching to manual mode.", 2)
+            return
         vector = np.zeros(8)
         # Used in unsafe mode
         old_vector = np.zeros(8)
@@ -235,8 +648,8 @@ class CLI(object):
         exit_list = self.exit_list
         self.bprint("Manual command mode triggered.\nIn this mode you can only control a single motor at once. The syntax to use manual mode is :\n'(manual) >> <motor number>'\nThis will cause the targeted motor (numbered from 1 to 8) to start moving at the desired pace while all other motors will stay still. You can use that syntax again to move the focus to another motor. If you wish unroll the cables of that motor instead you can use :\n'(manual) >> -<motor number>'\nThat will cause the motor to start moving in reverse.\nIf you for some reason wish to halt the robot you can use :\n'(manual) >> halt'\nIn order to leave manual mode just use :\n'(manual) >> exit'")
         while keep_manual:
-            # Note that we will block on the following line until something is entered.
-            command = input("(manual) >> ")
+            # Note that we will wait on the following line until something is entered.
+            command = await self.reader.readline("(manual) >> ")
             vector = np.zeros(8)
             if command in halt_list or command in exit_list:
                 # leaving the manual mode of courses halts the robot.
@@ -286,21 +699,15 @@ class CLI(object):
 
     # That one needs to be a method in order to have access to the bprint method, which in turn needs to be a method in order to have access to the self.silent value.
     def lookup_trajectory_file(self):
-        def lookup(file_path):
-            self.bprint(f"Looking up {file_path} ...")
-            if os.path.exists(file_path):
-                self.bprint(f"File {file_path} found.")
-                return True
-            # else ...
-            return False
-
         lookup_basename_list = ["trajectoire", "TRAJECTOIRE", "Trajectoire", "trajectory", "TRAJECTORY", "Trajectory", "traj", "TRAJ", "Traj"]
-        lookup_extension_list = [".txt", ".csv", ".npy", ".dat", ""]
+        lookup_extension_list = [".txt", ".csv", ".npy", ".dat", "", trajectory_archive.EXTENSION]
 
+        # The working directory is listed once, rather than probing each of the candidate names in turn. The first candidate in the order above wins.
+        files = set(entry.name for entry in os.scandir() if entry.is_file())
         for basename in lookup_basename_list:
             for extension in lookup_extension_list:
-                file_found = lookup(f"{basename}{extension}")
-                if file_found:
+                if f"{basename}{extension}" in files:
+                    self.bprint(f"File {basename}{extension} found.")
                     # Returning path of the found file
                     return f"{basename}{extension}"
 
@@ -336,6 +743,10 @@ class CLI(object):
             " - frequency : Changes the speed of the robot by specifying how often it will perform a step. For more informations about the time command, please use :\n'>> help frequency'\n\n"
             " - help : Brings out various help message, including this one.\n\n"
             " - halt : Will stop the robot immediately, regardless of what it was doing.\n\n"
+            " - status : Tells whether a trajectory is running and how well the robot keeps up with it. For more informations about the status command, please use :\n'>> help status'\n\n"
+            " - cache : Shows or clears the cache of computed commands. For more informations about the cache command, please use :\n'>> help cache'\n\n"
+            " - stats : Shows where the time went during the last trajectory, stage by stage. For more informations about the stats command, please use :\n'>> help stats'\n\n"
+            " - locate : Finds where the mobile is from the lengths of its cables. For more informations about the locate command, please use :\n'>> help locate'\n\n"
             " - exit : Leaves this tool. If your are using a keyboard you can also use EOF shortcut (Ctrl + D on Linux for instance). This will also cause the robot to halt.\n"
             )
             self.bprint(command_help)
@@ -352,6 +763,46 @@ class CLI(object):
             elif topic in self.help_list:
                 self.bprint("Is the robot not working so badly that you started writing random input in the tool ? If so, have you tried (in that order) :\n\n - Checking that everything is correctly plugged-in ?\n - Turning it off and on again ?\n - Looking for help online ?\n - Yelling at the machine ?\n\nIf you are unsure where the problem stems from, try initializing the robot in manual mode. That should help you check whether the communication is working properly.\nIf you are able to initialize the robot in manual mode but can't use it in auto mode, then try reading the detailed help about the various ways to give the targeted trajectory to the robot using :\n'>> help auto'\nIf none of that works then you may (or may not) have some hardware issue. Please read the online manual to get an idea of how to troubleshoot that.")
                 return
+            elif topic in self.status_list:
+                self.bprint("The status command tells whether the robot is running a trajectory in auto mode. While a trajectory runs, the tool keeps accepting commands : status shows how many commands were sent so far and how late they were, time and frequency change the pace of the running trajectory and halt or exit interrupt it before the next step. The syntax of the status command is :\n'>> status'")
+                return
+            elif topic in self.stats_list:
+                stats_help = (
+                "The stats command shows where the time went during the last trajectory run in auto mode : loading the file, validation, planning, discretisation, kinematics, quantisation, writing to the cache and sending to the robot. For each stage it gives the number of calls, the wall time (including the stages it drives) and its own time, the number of steps it went through per second of its own time and, if asked for, the peak memory (MB) while it ran. Measuring the memory slows every allocation down, so it is off unless profiling is turned on with the memory option. Profiling is off by default, it costs close to nothing then. The syntax to turn it on (without or with the memory of each stage) or off is :\n"
+                "'>> stats on'\n"
+                "'>> stats on memory'\n"
+                "'>> stats off'\n"
+                "It can also be turned on from the start with the --profiling or --profiling-memory options of this tool. The syntax to see the statistics of the last run is :\n"
+                "'>> stats'\n"
+                "And the syntax to save them as JSON, along with a histogram of the duration of the calls of each stage, is :\n"
+                "'>> stats json <file>'"
+                )
+                self.bprint(stats_help)
+                return
+            elif topic in self.locate_list:
+                locate_help = (
+                "The locate command finds the position of the mobile from the lengths of its 8 cables, for instance measured after a halt or after moving the motors in manual mode. It is the reverse of what the tool does in auto mode, where the lengths are computed from the positions. The syntax to use the locate command is :\n"
+                "'>> locate <l1> <l2> <l3> <l4> <l5> <l6> <l7> <l8>'\n"
+                "Where l1 to l8 are the lengths of the cables, in meters, in the order of the motors. The search starts from the last position found, so locating the mobile again after a small move is very fast.\n"
+                "A whole recording of lengths, saved as an npy array of 8 columns with one row per sample, is processed at once with :\n"
+                "'>> locate <lengths.npy> <positions.npy>'\n"
+                "which saves the positions (6 columns, like a trajectory) to positions.npy.\n"
+                "8 lengths are more than the 6 coordinates of a position need, so the position found is the one whose cable lengths are the closest to the given ones. The tool tells how far off they are : more than a few motor ticks means that a cable is slack or that a length is wrong."
+                )
+                self.bprint(locate_help)
+                return
+            elif topic in self.cache_list:
+                cache_help = (
+                "The commands sent to the motors in auto mode are computed from the trajectory, which can take a while for long trajectories. Once computed, they are saved in a cache on the disk, so that the next time the same trajectory is used with the same robot profile the commands are read directly from the cache.\n"
+                "The syntax to see what the cache contains is :\n"
+                "'>> cache'\n"
+                "And the syntax to empty the cache is :\n"
+                "'>> cache clear'\n"
+                "The trajectories read from txt or csv files are kept in the cache as well, once parsed, in its trajectories subdirectory. They are found again as long as the text file keeps the same path, size and modification time.\n"
+                f"The cache lives in {self.cache.directory} and its size, parsed trajectories included, is limited to {self.cache.max_size / 2**20:.1f} MB, the least recently used entries are removed when it grows beyond that limit. Both can be changed with the --cache-dir and --cache-size options of this tool, and a size of 0 disables the cache."
+                )
+                self.bprint(cache_help)
+                return
             elif topic in self.time_list:
                 time_help = (
                 "The time command is used to alter the pace of the robot by specifying how much time each of its steps should last. That time is specified in seconds as a positive float.\n"
@@ -402,11 +853,18 @@ class CLI(object):
                     "The complete syntax of the auto command is :\n"
                     "'>> auto <trajectory file> <reading method>'\n"
                     "Where trajectory file is the file in which the tool will read the trajectory and reading method is the method that should be used to get the numpy array of the trajectory from the file. Both arguments are optionnal.\n\n"
+                    "Many trajectories can be kept in a single archive, each under its own name. The syntax to follow the trajectory circle of the archive trajectories.traj is :\n"
+                    "'>> auto trajectories.traj:circle'\n"
+                    "Only that trajectory is read from the archive. For more information on archives just use :\n"
+                    "'>> help auto archive'\n\n"
                     "Trajectory file is a path to the file and can be either relative to your working directory or absolute. The trajctory file must contain (in some form) a numpy array of the trajectory and nothing else. That numpy array must have 6 columns (3 positions and 3 rotations) but can have as many rows as you want it to.\n"
-                    "Reading method has to be one of npy (recommended), txt, csv, dat (deprecated), pickle. For mor information on either of those methods just use :\n"
+                    "Reading method has to be one of npy (recommended), txt, csv, dat (deprecated), pickle, archive. For mor information on either of those methods just use :\n"
                     "'>> help auto <method>'\n\n"
-                    "If no files are provided, the tool will try to guess which file in the current working directory you want it to use. It will look for files whose name resembles 'trajectory' and whose extension is one of .npy, .txt, .csv, .dat or no extension at all. The tool will use the first matching file it finds.\n\n"
-                    "If no reading method is provided, the tool will try to guess the appropriate one using the extension of the file. A file that ends with .npy will be read using the npy method, a file in .txt with the txt method, a file in .csv with the csv method, a file in .dat with the dat method and a file without extension with the pickle method."
+                    "Before the robot moves, the whole trajectory is checked against the physical limits of the robot : the mobile must stay inside the hangar, the cables must stay between their minimal and maximal lengths and no cable may move faster than its motor at the current time step. In safe mode a trajectory that fails one of these checks is refused, in unsafe mode it only causes a warning. The limits are part of the robot profile (longueur_cable_min, longueur_cable_max and vitesse_cable_max).\n\n"
+                    "By default the trajectory is cut in maximal steps and every step takes one time step, so the robot moves at constant speed and changes direction abruptly at each point of the trajectory. With the --motion-profile option the robot instead speeds up and slows down smoothly : trapezoid bounds the acceleration (--acceleration, in maximal steps per second squared) and slows down in the sharp turns, scurve also bounds the jerk (--jerk, in maximal steps per second cubed). The robot never exceeds one maximal step per time step, but it can then safely run at a smaller time step.\n\n"
+                    "The three rotations of the trajectory are angles, which are interpolated one by one between two points of the trajectory by default. With --orientation slerp the mobile instead turns around a fixed axis at a constant angular speed between two points, along the shortest rotation, and the maximal angular step bounds the angle the mobile turns by at each step.\n\n"
+                    "If no files are provided, the tool will try to guess which file in the current working directory you want it to use. It will look for files whose name resembles 'trajectory' and whose extension is one of .npy, .txt, .csv, .dat, .traj or no extension at all. The tool will use the first matching file it finds.\n\n"
+                    "If no reading method is provided, the tool will try to guess the appropriate one using the extension of the file. A file that ends with .npy will be read using the npy method, a file in .txt with the txt method, a file in .csv with the csv method, a file in .dat with the dat method, a file in .traj with the archive method and a file without extension with the pickle method."
                     )
                     self.bprint(auto_help)
                     return
@@ -420,7 +878,8 @@ class CLI(object):
                         "np.save('trajectory.npy', trajectory)\n}\n\n"
                         "And that's it. Pretty convenient is it not ? The file will be read by this tool using the snippet :\n\n{\n"
                         "# import numpy as np\n"
-                        "array = np.load('trajectory.py')\n}\n\n"
+                        "array = np.load('trajectory.npy', mmap_mode='r')\n}\n\n"
+                        "The file is mapped in memory rather than read, so even very large trajectories are opened instantly and are never loaded in memory all at once.\n"
                         "Remember that your array must have 6 columns (3 positions + 3 rotations) but can have as many rows as you'd like."
                         )
                         self.bprint(npy_help)
@@ -430,9 +889,10 @@ class CLI(object):
                         "The txt method is not one I would recommend, but at least it saves the arrays in a human readable way, which you might be interested in. Given that the numpy array you want to save is called trajectory and the file you want to save it to is trajectory.txt, the code snippet to save the array is:\n\n{\n"
                         "# import numpy as np\n"
                         "np.savetxt('trajectory.txt', trajectory)\n}\n\n"
-                        "The array can then be read using any application you'd like (for instance notepad on Windows) if you wish to verify it, but be aware that the csv method might be a better fit for that use case. The file will be read by this tool using the snippet :\n\n{\n"
+                        "The array can then be read using any application you'd like (for instance notepad on Windows) if you wish to verify it, but be aware that the csv method might be a better fit for that use case. The file will be read by this tool the way the snippet :\n\n{\n"
                         "# import numpy as np\n"
                         "array = np.loadtxt('trajectory.txt', dtype=float)\n}\n\n"
+                        "would read it, except that it is parsed in chunks and that the number of the first line which is not a row of 6 numbers is reported. Parsing text is slow, so the first time a file is read the parsed trajectory is saved in the cache of this tool (see '>> help cache') and the next times the same file is used, unchanged, it is loaded from there instantly.\n"
                         "Remember that your array must have 6 columns (3 positions + 3 rotations) but can have as many rows as you'd like."
                         )
                         self.bprint(txt_help)
@@ -442,9 +902,10 @@ class CLI(object):
                         "The csv file format ('comma separated values') is a well established one and is supported so that you may be able to use this tool more easily with other solutions that may not support anything else. Given that the numpy array you want to save is called trajectory and the file you want to save it to is trajectory.csv, the code snippet to save the array is:\n\n{\n"
                         "# import numpy as np\n"
                         "np.savetxt('trajectory.csv', trajectory, delimiter=',')\n}\n\n"
-                        "csv files can be opened by most bureautic applications such as LibreOffice or Excel for verification. The file will be read by this tool using the snippet :\n\n{\n"
+                        "csv files can be opened by most bureautic applications such as LibreOffice or Excel for verification. The file will be read by this tool the way the snippet :\n\n{\n"
                         "# import numpy as np\n"
                         "array = np.loadtxt('trajectory.csv', dtype=float, delimiter=',')\n}\n\n"
+                        "would read it, except that it is parsed in chunks and that the number of the first line which is not a row of 6 numbers is reported. As for the txt method, the parsed trajectory is saved in the cache of this tool the first time the file is read, and loaded from there instantly the next times.\n"
                         "Remember that your array must have 6 columns (3 positions + 3 rotations) but can have as many rows as you'd like."
                         )
                         self.bprint(csv_help)
@@ -456,7 +917,8 @@ class CLI(object):
                         "trajectory.tofile('trajectory.dat')\n}\n\n"
                         "Once again, those .dat files aren't plateform independant, so you if you created them on another machine you are likely to run into issues here. The file will be read by this tool using the snippet :\n\n{\n"
                         "# import numpy as np\n"
-                        "array = np.fromfile('trajectory.dat', dtype=float)\n}\n\n"
+                        "array = np.memmap('trajectory.dat', dtype=float, mode='r', shape=(rows, 6))\n}\n\n"
+                        "Where rows is deduced from the size of the file, which must hold a whole number of rows of 6 floats.\n"
                         "Remember that your array must have 6 columns (3 positions + 3 rotations) but can have as many rows as you'd like."
                         )
                         self.bprint(dat_help)
@@ -475,8 +937,20 @@ class CLI(object):
                         )
                         self.bprint(pickle_help)
                         return
+                    elif method == "archive":
+                        archive_help = (
+                        "An archive keeps many named trajectories in a single file, so that hundreds of trajectories do not need hundreds of files. Trajectories saved with any of the other methods are packed into an archive with the trajectory_archive tool, shipped along with this one :\n\n{\n"
+                        "$ python3 trajectory_archive.py pack trajectories.traj circle.npy square.csv spiral=old/traj.txt --profile robot.json\n}\n\n"
+                        "Each trajectory is named after its file, without the extension, unless a name is given before the file as for spiral above. --append adds the trajectories to an existing archive instead of replacing it, and --profile records the robot the trajectories were made for (the default robot if not given) : this tool warns when a trajectory is used with another robot. The trajectories of an archive are listed with :\n\n{\n"
+                        "$ python3 trajectory_archive.py list trajectories.traj\n}\n\n"
+                        "The syntax to follow the trajectory circle of that archive is :\n"
+                        "'>> auto trajectories.traj:circle'\n"
+                        "Only the index of the archive and the selected trajectory are read : the trajectory is mapped in memory like an npy file, once its checksum has been checked. An archive that holds a single trajectory can be given without a name."
+                        )
+                        self.bprint(archive_help)
+                        return
                     else:
-                        self.bprint(f"The reading method {method} is unknown to this tool, please use one of npy, txt, csv, dat or pickle.", 1)
+                        self.bprint(f"The reading method {method} is unknown to this tool, please use one of npy, txt, csv, dat, pickle or archive.", 1)
                         return
 
 
@@ -488,7 +962,39 @@ if __name__ == '__main__':
 
     parser.add_argument("--unsafe", action='store_true', help="Control the robot in unsafe mode, only use if you know what you are doing!")
 
-    parser.add_argument("--profile", default=None, help="A profile file describing the physical characteristics of the cable driven robot you are using. More informations can be found online.")
+    parser.add_argument("--profile", default=None, help="A profile file describing the physical characteristics of the cable driven robot you are using. It is a JSON file whose keys are some of dimensions_mobile, dimensions_hangar, diametre_tambour, pas_maximal, chgt_num, coins_mobile, coins_hangar, rapport_reduction, pas_par_tour, micropas, longueur_cable_min, longueur_cable_max and vitesse_cable_max, the missing ones keep the value of the default robot.")
+
+    parser.add_argument("--late-policy", choices=["catchup", "skip"], default="catchup", help="What to do in auto mode when the robot falls behind its schedule. With catchup (the default) late commands are sent as fast as possible until the schedule is met again, with skip the commands that are already overdue are not sent one by one but added up into the next command, so that the robot jumps to where it should be at once and still ends the trajectory where it should.")
+
+    parser.add_argument("--motion-profile", choices=["constant", "trapezoid", "scurve"], default="constant", help="How the robot moves along a trajectory in auto mode. constant (the default) moves one maximal step per time step, trapezoid speeds up and slows down with a bounded acceleration, slowing down in the sharp turns, and scurve also bounds the jerk.")
+
+    parser.add_argument("--acceleration", type=float, default=200, help="Maximal acceleration of the trapezoid and scurve motion profiles, in maximal steps per second squared. Default is 200.")
+
+    parser.add_argument("--jerk", type=float, default=2000, help="Maximal jerk of the scurve motion profile, in maximal steps per second cubed. Default is 2000.")
+
+    parser.add_argument("--orientation", choices=["euler", "slerp"], default="euler", help="How the orientation of the mobile is interpolated between the points of a trajectory. euler (the default) interpolates each of the three angles linearly, slerp turns around a fixed axis at a constant angular speed.")
+
+    parser.add_argument("--check-tensions", action='store_true', help="Before running a trajectory in auto mode, also check that at every step the cables can hold the mobile with tensions between the minimal tension that keeps a cable taut and the maximal tension of the cables and motors. Much slower than the other checks, off by default.")
+
+    parser.add_argument("--processes", type=int, default=None, help="Number of processes computing the commands of a trajectory in auto mode with the constant motion profile, to use several cores on long trajectories. By default they are computed by the tool itself.")
+
+    parser.add_argument("--profiling", action='store_true', help="Time every stage of the computation of the commands in auto mode, see the stats command. Off by default.")
+
+    parser.add_argument("--profiling-memory", action='store_true', help="Same as --profiling, and measure the peak memory of every stage as well with tracemalloc, which slows the computation down.")
+
+    parser.add_argument("--cache-dir", default=None, help="Directory of the cache of computed commands. Default is cable_robot in the user cache directory (~/.cache/cable_robot on Linux).")
+
+    parser.add_argument("--cache-size", type=float, default=1024, help="Maximal size of the cache of computed commands, in MB, parsed text trajectories included. The least recently used entries are removed beyond that size. 0 disables the cache.")
+
+    parser.add_argument("--backend", choices=["print", "serial", "loopback", "simulated"], default="print", help="Where the motor commands go. print (the default) only prints them, serial sends them to the motor controllers on the serial port given by --port, loopback sends them over a pseudo-terminal to a fake controller, to test the serial link without any hardware, and simulated sends them to simulated motors that report missed deadlines, saturated motors, the number of commands per second and the drift of the schedule at the end of each trajectory.")
+
+    parser.add_argument("--fast-simulation", action='store_true', help="With the simulated backend, run the trajectories as fast as possible on a simulated clock rather than in real time, to replay long trajectories in seconds. Deadlines can then never be missed.")
+
+    parser.add_argument("--motor-acceleration", type=float, default=2.0, help="Maximal acceleration of the simulated motors, in meters of cable per second squared. Default is 2. Their maximal speed is the one of the robot profile.")
+
+    parser.add_argument("--port", default=None, help="Serial port of the motor controllers for the serial backend, for instance /dev/ttyUSB0.")
+
+    parser.add_argument("--baudrate", type=int, default=115200, help="Speed of the serial port, in bauds. Default is 115200.")
 
     parser.add_argument("--version", action='version', version="tool version 0.1")
 
@@ -505,12 +1011,4 @@ if __name__ == '__main__':
     print(header)
 
     cli = CLI(args)
-
-    while True:
-        try:
-            command = input(">> ")
-            cli.read_command(command)
-        except EOFError:
-            print("exit")  # In order to avoid ugly output
-            cli.exit()
-            break
+    asyncio.run(cli.run())
@@ -0,0 +1,145 @@
+import os
+import time
+import hashlib
+import numpy as np
+
+import cable_math as cm
+
+# Bumped whenever the way commands are computed changes, so that old entries are never reused.
+CACHE_VERSION = 2
+
+
+def default_directory():
+    # Follows the XDG convention, like most command line tools on Linux.
+    base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "cable_robot")
+
+
+class CommandCache(object):
+    """On-disk cache of computed motor commands.
+
+    Each entry is the (steps, 8) array of motor commands of a trajectory, stored as an npy file whose name is a hash of everything the commands depend on : the trajectory itself, the maximal steps, the geometry of the robot, the length of cable wound by one motor tick, the velocity profile, if any, and the interpolation of the orientations (see key). A hit is opened as a read-only memory map, so replaying a trajectory skips the whole computation.
+
+    Entries are evicted in least recently used order as soon as the cache grows beyond max_size bytes. Using an entry refreshes its modification time, which is what the eviction order relies on.
+
+    A cache created with shared_with shares the max_size of that other cache instead of having its own : the entries of both directories count against the same budget, and are evicted together in least recently used order.
+    """
+
+    def __init__(self, directory=None, max_size=2**30, shared_with=None):
+        self.directory = default_directory() if directory is None else directory
+        self.max_size = max_size
+        # Caches sharing the budget of this one, itself included.
+        self.group = [self]
+        if shared_with is not None:
+            self.max_size = shared_with.max_size
+            self.group = shared_with.group
+            self.group.append(self)
+
+    def key(self, trajectory, geometry, profile=None, slerp=False):
+        # The trajectory is hashed window by window, so that a memory mapped trajectory is never copied as a whole. profile is the cable_math.ProfilVitesse the trajectory is discretised with, if any, and slerp whether the orientations are interpolated along great circles.
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"version {CACHE_VERSION} shape {np.shape(trajectory)}".encode())
+        if profile is not None:
+            digest.update(b"profile")
+            digest.update(np.ascontiguousarray(profile.parametres(), dtype='<f8').data)
+        if slerp:
+            digest.update(b"slerp")
+        for start in range(0, len(trajectory), cm.TAILLE_LOT):
+            window = np.ascontiguousarray(trajectory[start:start + cm.TAILLE_LOT], dtype='<f8')
+            digest.update(window.data)
+        for parameter in [geometry.pas_maximal, geometry.coins_mobile, geometry.coins_hangar, geometry.chgt_num, geometry.diametre_tambour, geometry.longueur_tick]:
+            digest.update(np.ascontiguousarray(parameter, dtype='<f8').data)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key):
+        # Returns the cached commands as a read-only memory map, or None on a miss.
+        path = self.path(key)
+        try:
+            commands = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return commands
+
+    def record(self, key, commands, dtype='<f8', columns=8):
+        # Generator that yields the blocks of commands unchanged while writing them to the cache, as dtype. The entry only appears once the last block has been consumed : a run that is interrupted leaves nothing behind. columns is the number of columns of the blocks, other arrays than motor commands can be cached as well (text_trajectory keeps its sidecars in a CommandCache).
+        if self.max_size <= 0:
+            yield from commands
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        rows = 0
+        completed = False
+        try:
+            with open(temporary_path, "wb") as target:
+                # The number of rows is unknown until the end. The header is written with a placeholder shape and rewritten at the end, npy headers are padded so both have the same length.
+                dtype = np.dtype(dtype)
+                header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (0, columns)}
+                np.lib.format.write_array_header_1_0(target, header)
+                for block in commands:
+                    target.write(np.ascontiguousarray(block, dtype=dtype).data)
+                    rows += len(block)
+                    yield block
+                header_end = target.tell() - rows * columns * dtype.itemsize
+                target.seek(0)
+                header['shape'] = (rows, columns)
+                np.lib.format.write_array_header_1_0(target, header)
+                if target.tell() != header_end:
+                    raise ValueError("The npy header changed length while being rewritten")
+            os.replace(temporary_path, self.path(key))
+            completed = True
+        finally:
+            if not completed and os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        self.evict()
+
+    def entries(self):
+        # List of (key, size in bytes, last use timestamp), least recently used first.
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                status = os.stat(os.path.join(self.directory, name))
+                entries.append((name[:-len(".npy")], status.st_size, status.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def shared_size(self):
+        # Size of the entries of every cache sharing the budget of this one.
+        return sum(cache.size() for cache in self.group)
+
+    def evict(self):
+        # Removes the least recently used entries, of this cache or of those sharing its budget, until they all fit in max_size. Returns the number of removed entries.
+        entries = sorted(((cache, key, size, last_use) for cache in self.group for key, size, last_use in cache.entries()), key=lambda entry: entry[3])
+        total = sum(entry[2] for entry in entries)
+        removed = 0
+        for cache, key, size, _ in entries:
+            if total <= self.max_size:
+                break
+            os.remove(cache.path(key))
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        entries = self.entries()
+        for key, _, _ in entries:
+            os.remove(self.path(key))
+        return len(entries)
+
+    def describe(self):
+        # Human readable summary of the cache, one line per entry.
+        entries = self.entries()
+        shared = f" shared with {', '.join(cache.directory for cache in self.group if cache is not self)}, {self.shared_size() / 2**20:.1f} MB used in total" if len(self.group) > 1 else ""
+        lines = [f"Cache directory {self.directory} : {len(entries)} entries, {self.size() / 2**20:.1f} MB used out of {self.max_size / 2**20:.1f} MB{shared}."]
+        for key, size, last_use in reversed(entries):
+            steps = np.load(self.path(key), mmap_mode='r').shape[0]
+            lines.append(f" - {key[:16]} : {steps} steps, {size / 2**20:.1f} MB, last used {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_use))}")
+        return "\n".join(lines)
@@ -0,0 +1,200 @@
+import json
+import math
+import time
+import inspect
+import contextlib
+import tracemalloc
+try:
+    import resource  # Unix only, gives the peak resident memory of the process.
+except ImportError:
+    resource = None
+
+# Instrumentation of the stages of the command pipeline : loading, planning, discretisation, kinematics, quantisation, sending...
+#
+# It is off by default. Disabled, stage returns a shared no-op context manager and timed / timed_call return the iterable or function they were given, untouched : a disabled hook costs one function call per block of steps, never one per step. Enabled, each stage records its number of calls, its wall time, the time spent in itself rather than in the stages it drives (the pipeline is a chain of generators, each one pulling blocks from the previous one), the number of items (steps) it went through, a histogram of the duration of its calls and, on demand (enable(memory=True)), the peak memory while it ran, measured with tracemalloc. tracemalloc slows down every allocation by a third or more, so memory is only measured when asked for : report always gives the peak resident memory of the process from getrusage, which costs nothing.
+
+# Calls are sorted by duration in buckets of powers of 2, from under a microsecond to over half an hour.
+HISTOGRAM_BUCKETS = 32
+NO_STAGE = contextlib.nullcontext()
+
+
+class Stage(object):
+    """Statistics of one stage, accumulated over all its calls since the last reset."""
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_time = 0.0
+        self.own_time = 0.0
+        self.items = 0
+        self.peak_memory = 0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+
+    def record(self, duration, own_time, items, peak_memory):
+        self.calls += 1
+        self.wall_time += duration
+        self.own_time += own_time
+        self.items += items
+        self.peak_memory = max(self.peak_memory, peak_memory)
+        # Bucket k holds the calls that lasted between 2^(k-1) and 2^k microseconds.
+        bucket = math.frexp(duration * 1e6)[1]
+        self.histogram[min(max(bucket, 0), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def report(self):
+        return {"calls": self.calls, "wall_time": self.wall_time, "own_time": self.own_time, "items": self.items,
+                "items_per_second": self.items / self.own_time if self.own_time > 0 else None,
+                "peak_memory": self.peak_memory,
+                "histogram": [{"max_duration": 2.0**bucket * 1e-6, "calls": calls} for bucket, calls in enumerate(self.histogram) if calls]}
+
+
+class Profiler(object):
+    """Collects per-stage statistics of the last run, see the module comment.
+
+    reset starts a new run and finish marks its end. The stages can be nested, in one thread at a time : time spent in a nested stage counts in the wall time of its parent, but not in its own time.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.enabled = False
+        self.memory = False
+        self.reset()
+
+    def enable(self, memory=False):
+        # memory turns on tracemalloc to measure the peak memory of each stage, which slows down every allocation. It is stopped again by disable if it was started here.
+        if self.enabled:
+            self.disable()
+        self.enabled = True
+        self.memory = memory
+        self.started_tracemalloc = memory and not tracemalloc.is_tracing()
+        if self.started_tracemalloc:
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if self.memory and self.started_tracemalloc:
+            tracemalloc.stop()
+        self.memory = False
+
+    def reset(self):
+        self.stages = {}
+        self.counters = {}
+        self.frames = []
+        self.peak_memory = 0
+        self.start_time = self.clock()
+        self.end_time = None
+
+    def finish(self):
+        self.end_time = self.clock()
+
+    def enter(self, name):
+        # A frame is [name, start time, time spent in nested stages, peak memory before the last nested stage started].
+        peak = 0
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            if self.frames:
+                self.frames[-1][3] = max(self.frames[-1][3], peak)
+            tracemalloc.reset_peak()
+        frame = [name, self.clock(), 0.0, 0]
+        self.frames.append(frame)
+        return frame
+
+    def exit(self, frame, items=0):
+        duration = self.clock() - frame[1]
+        self.frames.pop()
+        peak = max(frame[3], tracemalloc.get_traced_memory()[1]) if self.memory else 0
+        if self.frames:
+            self.frames[-1][2] += duration
+            self.frames[-1][3] = max(self.frames[-1][3], peak)
+        self.peak_memory = max(self.peak_memory, peak)
+        stage = self.stages.get(frame[0])
+        if stage is None:
+            stage = self.stages[frame[0]] = Stage()
+        stage.record(duration, duration - frame[2], items, peak)
+
+    @contextlib.contextmanager
+    def measure(self, name, items):
+        frame = self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit(frame, items)
+
+    def stage(self, name, items=0):
+        # Context manager timing the code it wraps as one call of the stage name, which went through items steps.
+        if not self.enabled:
+            return NO_STAGE
+        return self.measure(name, items)
+
+    def timed(self, name, blocks):
+        # Iterable of the same blocks as blocks, producing each one being a call of the stage name. The items of a block are its rows (or those of its first element for a tuple of arrays).
+        if not self.enabled:
+            return blocks
+        return self.timed_blocks(name, blocks)
+
+    def timed_blocks(self, name, blocks):
+        iterator = iter(blocks)
+        while True:
+            frame = self.enter(name)
+            try:
+                block = next(iterator)
+            except StopIteration:
+                # Finding out that there is nothing left can take time as well, upstream stages may have had work left.
+                self.exit(frame)
+                return
+            except BaseException:
+                self.exit(frame)
+                raise
+            self.exit(frame, len(block[0]) if isinstance(block, tuple) else len(block))
+            yield block
+            # Holding on to the block while the next one is computed would keep the memory of the previous block from being reused.
+            del block
+
+    def timed_call(self, name, function, items=1):
+        # function wrapped so that each call is a call of the stage name, going through items items.
+        if not self.enabled:
+            return function
+        if inspect.iscoroutinefunction(function):
+            # The call lasts until the coroutine returns. Other tasks must not enter stages in the meantime, which holds for the command line tool : only the running trajectory is profiled.
+            async def timed_coroutine(*args, **kwargs):
+                frame = self.enter(name)
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    self.exit(frame, items)
+            return timed_coroutine
+
+        def timed_function(*args, **kwargs):
+            frame = self.enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit(frame, items)
+        return timed_function
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        # Everything measured during the last run, as a dictionary of plain values that json can save.
+        end = self.end_time if self.end_time is not None else self.clock()
+        peak_memory = self.peak_memory
+        if self.memory:
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        return {"enabled": self.enabled, "finished": self.end_time is not None, "wall_time": end - self.start_time,
+                "peak_memory": peak_memory if self.memory else None,
+                # ru_maxrss is in kilobytes on Linux.
+                "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource is not None else None,
+                "stages": {name: stage.report() for name, stage in self.stages.items()},
+                "counters": dict(self.counters)}
+
+    def save(self, path):
+        with open(path, "w") as target:
+            json.dump(self.report(), target, indent=2)
+
+
+# The profiler of the process, shared by cable_math, cable_robot and the command line tool.
+profiler = Profiler()
+stage = profiler.stage
+timed = profiler.timed
+timed_call = profiler.timed_call
+count = profiler.count
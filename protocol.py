@@ -0,0 +1,199 @@
+import zlib
+import struct
+import numpy as np
+
+# Binary format of the motor commands sent to the controllers.
+#
+# A frame is a 16 bytes header followed by count records. The header is, in little endian :
+# - the magic bytes b"CR" and the format version (1 byte) ;
+# - the width in bytes of the integers of the records, 2 or 4 (1 byte) ;
+# - the sequence number of the first record (4 bytes) ;
+# - the number of records (4 bytes) ;
+# - the CRC32 of the records (4 bytes).
+# A record is the sequence number of the command, truncated to the width, followed by the step delta of each of the 8 motors, all signed integers of the same width : 18 bytes per command in int16, 36 in int32.
+#
+# Two short messages complete the frames, both made of magic bytes and a sequence number (4 bytes) :
+# - b"CH" halt, sent by the computer : the controllers stop the motors and drop every command they have not executed yet ;
+# - b"CA" acknowledgement, sent by the controllers : every command before the sequence number has been executed.
+
+MAGIC = b"CR"
+VERSION = 1
+HEADER = struct.Struct("<2sBBIII")
+HALT_MAGIC = b"CH"
+ACK_MAGIC = b"CA"
+MESSAGE = struct.Struct("<2sI")
+MOTORS = 8
+# Frames are kept small enough that a transmission error only loses a fraction of a second of commands.
+RECORDS_PER_FRAME = 1024
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def record_dtype(width):
+    if width not in (2, 4):
+        raise ValueError(f"The width of the records must be 2 or 4 bytes, not {width}")
+    return np.dtype([("sequence", f"<u{width}"), ("deltas", f"<i{width}", (MOTORS,))])
+
+
+def smallest_width(deltas):
+    # Width of the smallest integers that can hold every delta.
+    deltas = np.asarray(deltas)
+    if len(deltas) == 0 or (deltas.min() >= -2**15 and deltas.max() < 2**15):
+        return 2
+    if deltas.min() >= -2**31 and deltas.max() < 2**31:
+        return 4
+    raise ValueError("Some step deltas do not fit in 32 bits")
+
+
+def encode(deltas, sequence=0, width=None):
+    """Encodes an (N, 8) array of integer step deltas, N being at most RECORDS_PER_FRAME, into a single frame.
+
+    The frame is allocated once and the records are written in place through a numpy view of it, so the cost does not depend on a per command Python loop. The first command gets the given sequence number, the following ones the next numbers. The width defaults to the smallest one that holds every delta.
+
+    Returns the frame as a bytearray.
+    """
+    deltas = np.asarray(deltas)
+    if deltas.ndim != 2 or deltas.shape[1] != MOTORS:
+        raise ValueError(f"The step deltas must be an (N, {MOTORS}) array, not {deltas.shape}")
+    if not np.issubdtype(deltas.dtype, np.integer):
+        raise ValueError(f"The step deltas must be integers, not {deltas.dtype}")
+    if len(deltas) > RECORDS_PER_FRAME:
+        raise ValueError(f"A frame holds at most {RECORDS_PER_FRAME} commands, not {len(deltas)}, use encode_frames for longer arrays")
+    if width is None:
+        width = smallest_width(deltas)
+    elif smallest_width(deltas) > width:
+        raise ValueError(f"Some step deltas do not fit in {8 * width} bits")
+    dtype = record_dtype(width)
+
+    frame = bytearray(HEADER.size + len(deltas) * dtype.itemsize)
+    records = np.frombuffer(frame, dtype=dtype, offset=HEADER.size)
+    records["sequence"] = np.arange(sequence, sequence + len(deltas), dtype=np.uint64) % 2**(8 * width)
+    records["deltas"] = deltas
+    checksum = zlib.crc32(memoryview(frame)[HEADER.size:])
+    HEADER.pack_into(frame, 0, MAGIC, VERSION, width, sequence % 2**32, len(deltas), checksum)
+    return frame
+
+
+def encode_frames(deltas, sequence=0, width=None, records_per_frame=RECORDS_PER_FRAME):
+    # Generator of the frames of a long array of step deltas, records_per_frame commands each (at most RECORDS_PER_FRAME), numbered continuously from sequence. The width is chosen once for the whole array.
+    deltas = np.asarray(deltas)
+    if width is None:
+        width = smallest_width(deltas)
+    for start in range(0, len(deltas), records_per_frame):
+        yield encode(deltas[start:start + records_per_frame], sequence + start, width)
+
+
+def decode(buffer):
+    """Decodes the frame at the start of buffer.
+
+    Returns (sequence, deltas, size) : the sequence number of the first command, the (N, 8) step deltas, which are a view of buffer and not a copy, and the size of the frame in bytes. Raises ProtocolError if the frame is truncated or corrupted.
+    """
+    buffer = memoryview(buffer).cast("B")
+    if len(buffer) < HEADER.size:
+        raise ProtocolError(f"Truncated header : {len(buffer)} bytes out of {HEADER.size}")
+    magic, version, width, sequence, count, checksum = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ProtocolError(f"Bad magic bytes {magic!r}")
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported format version {version}, expected {VERSION}")
+    try:
+        dtype = record_dtype(width)
+    except ValueError as error:
+        raise ProtocolError(str(error)) from None
+    if count > RECORDS_PER_FRAME:
+        raise ProtocolError(f"Frame of {count} records, at most {RECORDS_PER_FRAME} are allowed")
+    size = HEADER.size + count * dtype.itemsize
+    if len(buffer) < size:
+        raise ProtocolError(f"Truncated frame : {len(buffer)} bytes out of {size}")
+    payload = buffer[HEADER.size:size]
+    if zlib.crc32(payload) != checksum:
+        raise ProtocolError(f"Bad checksum for the frame of sequence number {sequence}")
+    records = np.frombuffer(payload, dtype=dtype)
+    expected = np.arange(sequence, sequence + count, dtype=np.uint64) % 2**(8 * width)
+    if not np.array_equal(records["sequence"], expected):
+        raise ProtocolError(f"Records out of sequence in the frame of sequence number {sequence}")
+    return sequence, records["deltas"], size
+
+
+def decode_stream(buffer):
+    # Generator of (sequence, deltas) for each frame of a buffer holding frames back to back.
+    buffer = memoryview(buffer).cast("B")
+    offset = 0
+    while offset < len(buffer):
+        sequence, deltas, size = decode(buffer[offset:])
+        yield sequence, deltas
+        offset += size
+
+
+def encode_halt(sequence=0):
+    return MESSAGE.pack(HALT_MAGIC, sequence % 2**32)
+
+
+def encode_ack(sequence):
+    return MESSAGE.pack(ACK_MAGIC, sequence % 2**32)
+
+
+class FrameReader(object):
+    """Splits a byte stream, as read from a serial link, into frames and messages.
+
+    Bytes are given to feed as they arrive, in chunks of any size. feed returns the list of the messages completed so far, each one a tuple : ("commands", sequence, deltas), ("halt", sequence) or ("ack", sequence). The deltas are copied out of the stream buffer.
+
+    A transmission error does not stop the reader : bytes that do not start a message, and frames with a bad header or checksum, are skipped up to the next magic bytes and the stream is read from there. Only the commands of the corrupted frame are lost. self.errors counts the transmission errors (corrupted bytes between two good messages count once), self.skipped the bytes dropped, and self.last_error tells what the last error was.
+    """
+
+    MAGICS = (MAGIC, HALT_MAGIC, ACK_MAGIC)
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.errors = 0
+        self.skipped = 0
+        self.last_error = None
+        self.resyncing = False
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        while len(self.buffer) >= 2:
+            magic = bytes(self.buffer[:2])
+            if magic in (HALT_MAGIC, ACK_MAGIC):
+                if len(self.buffer) < MESSAGE.size:
+                    break
+                _, sequence = MESSAGE.unpack_from(self.buffer)
+                messages.append(("halt" if magic == HALT_MAGIC else "ack", sequence))
+                del self.buffer[:MESSAGE.size]
+                self.resyncing = False
+            elif magic == MAGIC:
+                if len(self.buffer) < HEADER.size:
+                    break
+                _, version, width, _, count, _ = HEADER.unpack_from(self.buffer)
+                # A corrupted header must not make the reader wait for a frame that will never come : it is rejected before its records arrive.
+                if version != VERSION or width not in (2, 4) or count > RECORDS_PER_FRAME:
+                    self.resync(ProtocolError(f"Bad frame header : version {version}, width {width}, {count} records"))
+                    continue
+                size = HEADER.size + count * record_dtype(width).itemsize
+                if len(self.buffer) < size:
+                    break
+                try:
+                    sequence, deltas, _ = decode(bytes(self.buffer[:size]))
+                except ProtocolError as error:
+                    self.resync(error)
+                    continue
+                messages.append(("commands", sequence, deltas))
+                del self.buffer[:size]
+                self.resyncing = False
+            else:
+                self.resync(ProtocolError(f"Bad magic bytes {magic!r} in the stream"))
+        return messages
+
+    def resync(self, error):
+        # Drops the bytes up to the next magic bytes after the start of the buffer, or all of them but the last one, which may be the start of magic bytes still to come.
+        if not self.resyncing:
+            self.errors += 1
+            self.resyncing = True
+        self.last_error = error
+        found = [index for index in (self.buffer.find(magic, 1) for magic in self.MAGICS) if index >= 0]
+        skip = min(found) if found else len(self.buffer) - 1
+        self.skipped += skip
+        del self.buffer[:skip]
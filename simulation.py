@@ -0,0 +1,155 @@
+import time
+import asyncio
+import numpy as np
+
+import protocol
+
+# Simulated robot, to run the command line tool and the whole command pipeline without hardware : load tests, replaying long trajectories, measuring throughput and timing.
+
+
+class VirtualClock(object):
+    """Simulated time for cable_robot.StepScheduler (clock, sleep and sleep_async).
+
+    Time only moves forward when the scheduler sleeps, by exactly the time it asked for, so a trajectory runs as fast as its commands are computed and sent instead of in real time : an hour long trajectory is replayed in seconds. The scheduler is then never late, deadlines can only be missed in real time.
+    """
+
+    # Control goes back to the event loop once every yield_period commands, often enough for the tool to stay responsive to halt, rarely enough not to slow the replay down.
+    yield_period = 256
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = 0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, duration):
+        if duration > 0:
+            self.now += duration
+
+    async def sleep_async(self, duration):
+        self.sleep(duration)
+        self.sleeps += 1
+        if self.sleeps % self.yield_period == 0:
+            await asyncio.sleep(0)
+
+
+class SimulatedRobot(object):
+    """cable_robot backend simulating the 8 motors of the robot, see cable_robot.use_backend.
+
+    Each command sent in auto mode is the number of ticks each motor turns during one time step. The simulated controllers add it to the target position of each motor, and each motor then moves towards its target within its limits : at most max_speed ticks per second and max_acceleration ticks per second squared. A motor that can not reach its target within the time step is saturated, and lags behind (its following error) until it catches up. In manual mode each input moves the selected motors by manual_ticks ticks, like transport.SerialBackend.
+
+    The controllers expect one command every time step from the first command of a trajectory on (see start). A command that arrives more than deadline_tolerance time steps after its slot is a missed deadline : the motors had nothing to execute in the meantime. The lateness of the last command is the drift of the schedule of the tool against the one of the robot.
+
+    Everything is measured against clock, which is time.monotonic for a simulation in real time, or the time of a VirtualClock to run faster than real time. report gives the statistics of the current trajectory and the state of the motors.
+    """
+
+    def __init__(self, max_speed, max_acceleration, time_step=0.1, manual_ticks=100, deadline_tolerance=1.0, clock=time.monotonic):
+        if max_speed <= 0 or max_acceleration <= 0:
+            raise ValueError(f"The maximal speed and acceleration of the motors must be positive, not {max_speed} and {max_acceleration}")
+        self.max_speed = float(max_speed)
+        self.max_acceleration = float(max_acceleration)
+        self.manual_ticks = manual_ticks
+        self.deadline_tolerance = deadline_tolerance
+        self.clock = clock
+        # Positions are kept as floats, a motor driven at its speed limit does not turn a whole number of ticks per step.
+        self.positions = np.zeros(protocol.MOTORS)
+        self.targets = np.zeros(protocol.MOTORS)
+        self.speeds = np.zeros(protocol.MOTORS)
+        self.halts = 0
+        self.closed = False
+        self.start(time_step)
+
+    def start(self, time_step):
+        # A new trajectory begins : the schedule starts with the next command and the statistics are reset.
+        if time_step <= 0:
+            raise ValueError(f"The time step must be positive, not {time_step}")
+        self.time_step = time_step
+        # origin is when the first command arrived, next_slot when the next one is due and spacing the time between the next command and the one after it.
+        self.origin = None
+        self.next_slot = None
+        self.spacing = time_step
+        self.wall_start = None
+        self.wall_end = None
+        self.stats = {"commands": 0, "missed_deadlines": 0, "mean_latency": 0.0, "max_latency": 0.0, "drift": 0.0,
+                      "saturated_steps": np.zeros(protocol.MOTORS, dtype=np.int64), "max_following_error": np.zeros(protocol.MOTORS)}
+        self.total_latency = 0.0
+
+    def set_time_step(self, time_step):
+        # Follows cable_robot.StepScheduler.set_time_step, called while the scheduler waits to send the next command : that command and the one after it keep their slots, the following ones are spaced by the new time step.
+        if time_step <= 0:
+            raise ValueError(f"The time step must be positive, not {time_step}")
+        if self.origin is None:
+            self.spacing = time_step
+        self.time_step = time_step
+
+    def move(self, deltas, time_step):
+        # Moves the motors towards their targets, shifted by deltas, during time_step seconds. Returns the motors whose limits kept them from reaching their target.
+        self.targets += deltas
+        wanted = (self.targets - self.positions) / time_step
+        speed_change = self.max_acceleration * time_step
+        speeds = np.clip(wanted, self.speeds - speed_change, self.speeds + speed_change)
+        np.clip(speeds, -self.max_speed, self.max_speed, out=speeds)
+        self.positions += speeds * time_step
+        self.speeds = speeds
+        # Half a tick of tolerance, the targets are whole ticks.
+        return np.abs(self.targets - self.positions) > 0.5
+
+    def send(self, command):
+        now = self.clock()
+        if self.origin is None:
+            self.origin = self.next_slot = now
+            self.wall_start = time.perf_counter()
+        stats = self.stats
+        latency = now - self.next_slot
+        # The motors execute the command until the next one is due.
+        time_step = self.spacing
+        self.next_slot += time_step
+        self.spacing = self.time_step
+        if latency > self.deadline_tolerance * time_step:
+            stats["missed_deadlines"] += 1
+        stats["commands"] += 1
+        self.total_latency += latency
+        stats["mean_latency"] = self.total_latency / stats["commands"]
+        stats["max_latency"] = max(stats["max_latency"], latency)
+        stats["drift"] = latency
+        saturated = self.move(np.asarray(command, dtype=float), time_step)
+        if saturated.any():
+            stats["saturated_steps"] += saturated
+            np.maximum(stats["max_following_error"], np.abs(self.targets - self.positions), out=stats["max_following_error"])
+        self.wall_end = time.perf_counter()
+
+    def manual(self, vector, time_step):
+        self.move(np.rint(np.asarray(vector) * self.manual_ticks), time_step)
+
+    def halt(self):
+        # The motors stop where they are, what they had not reached yet is dropped.
+        self.halts += 1
+        self.targets = np.round(self.positions)
+        self.positions = self.targets.copy()
+        self.speeds = np.zeros(protocol.MOTORS)
+
+    def close(self):
+        self.closed = True
+
+    def report(self):
+        # Statistics of the current trajectory, as plain values. commands_per_second is measured in real time, even when the simulation runs faster than real time.
+        stats = self.stats
+        wall_time = self.wall_end - self.wall_start if self.wall_start is not None else 0.0
+        return {"commands": stats["commands"], "wall_time": wall_time,
+                "commands_per_second": stats["commands"] / wall_time if wall_time > 0 else None,
+                "simulated_time": self.next_slot - self.origin if self.origin is not None else 0.0,
+                "missed_deadlines": stats["missed_deadlines"], "mean_latency": stats["mean_latency"], "max_latency": stats["max_latency"], "drift": stats["drift"],
+                "saturated_steps": stats["saturated_steps"].tolist(), "max_following_error": stats["max_following_error"].tolist(),
+                "positions": np.round(self.positions).astype(np.int64).tolist(), "halts": self.halts}
+
+    def describe(self):
+        report = self.report()
+        rate = f"{report['commands_per_second']:.0f} commands per second" if report["commands_per_second"] else "no command yet"
+        lines = [f"Simulated robot : {report['commands']} commands in {report['wall_time']:.3f} s ({rate}), {report['simulated_time']:.1f} s of robot time.",
+                 f"Commands arrived {1000 * report['mean_latency']:.3f} ms late on average, {1000 * report['max_latency']:.3f} ms at most, {report['missed_deadlines']} missed their deadline, the last one was {1000 * report['drift']:.3f} ms late."]
+        saturated = [f"motor {motor + 1} ({steps} steps, {report['max_following_error'][motor]:.0f} ticks behind at most)" for motor, steps in enumerate(report["saturated_steps"]) if steps]
+        if saturated:
+            lines.append(f"Saturated motors : {', '.join(saturated)}.")
+        lines.append(f"Motor positions (ticks) : {report['positions']}.")
+        return "\n".join(lines)
@@ -0,0 +1,281 @@
+# coding: utf8
+
+# Faisabilité en tension des positions du mobile. Un robot à câbles ne peut
+# tenir une position que si ses 8 câbles y restent tendus : il faut trouver
+# des tensions, comprises entre une tension minimale (câble tendu) et une
+# tension maximale (câble et moteur), qui équilibrent le poids du mobile.
+# Avec 8 câbles pour 6 degrés de liberté, les distributions de tensions qui
+# équilibrent le mobile forment un plan de dimension 2 dans l'espace des
+# tensions.
+# Comme cable_math, l'import de ce module ne fait aucun calcul.
+
+import itertools
+import collections
+import numpy as np
+
+import cable_math as cm
+
+# Tensions extrêmes admissibles dans un câble (en N).
+TENSION_MIN = 1.0
+TENSION_MAX = 100.0
+# Masse du mobile de la maquette (en kg) et accélération de la pesanteur
+# (en m/s²).
+MASSE_MOBILE = 1.0
+GRAVITE = 9.81
+# Nombre de positions traitées à la fois par la recherche exacte, dont les
+# tableaux intermédiaires ont 224 x 8 valeurs par position.
+TAILLE_LOT_EXACT = 1024
+
+# Points candidats de la recherche exacte (voir _distribution_exacte) :
+# triplets de câbles et signes de leurs écarts à la tension moyenne.
+_CABLES = np.repeat(np.array(list(itertools.combinations(range(8), 3))), 4,
+                    axis=0)
+_SIGNES = np.tile(np.array([[1, 1, 1], [1, 1, -1], [1, -1, 1], [1, -1, -1]]),
+                  (len(_CABLES) // 4, 1))
+
+
+def torseur_pesanteur(masse=MASSE_MOBILE):
+    """
+    Torseur exercé sur le mobile par son poids, au centre du mobile.
+
+    :param masse: masse du mobile (en kg)
+
+    :type masse: float
+
+    :return: force puis moment
+    :rtype: np.array de taille 6
+    """
+    return np.array([0, 0, -masse * GRAVITE, 0, 0, 0])
+
+
+def faisabilite_tensions(positions_mobile, geometrie,
+                         tension_min=TENSION_MIN, tension_max=TENSION_MAX,
+                         torseur=None, nb_processus=None):
+    """
+    Vérifie, pour N positions du mobile, qu'il existe des tensions des câbles
+    comprises entre tension_min et tension_max qui équilibrent le mobile.
+
+    La distribution de tensions retenue est d'abord celle, en forme close, qui
+    est la plus proche de la tension moyenne (tension_min + tension_max) / 2 :
+    t = t_m - W⁺ (w + W t_m), W étant la matrice de structure (voir
+    cable_math.matrice_structure_lot) et W⁺ sa pseudo-inverse. Elle est
+    calculée par lots, sans boucle sur les positions. Quand elle sort des
+    bornes, la position n'est pas forcément infaisable : la distribution qui
+    s'éloigne le plus des bornes est alors cherchée exactement, parmi les
+    sommets du problème linéaire (voir _distribution_exacte).
+
+    La marge d'une position est le plus petit écart (en N) entre les tensions
+    retenues et les bornes : positive, c'est la tension qui peut encore
+    varier dans chaque câble sans quitter les bornes ; négative, la position
+    est infaisable et aucune distribution ne fait mieux. Une position où les
+    câbles ne peuvent pas équilibrer le torseur, quelles que soient les
+    tensions, a une marge de -inf.
+
+    Les positions sont traitées par tranches de TAILLE_LOT. Si nb_processus
+    est donné, les tranches sont réparties entre nb_processus processus.
+
+    :param positions_mobile: N positions du mobile (3 positions, 3 angles)
+    :param geometrie: géométrie du robot
+    :param tension_min: tension minimale d'un câble (en N)
+    :param tension_max: tension maximale d'un câble (en N)
+    :param torseur: torseur extérieur exercé sur le mobile, son poids
+    (voir torseur_pesanteur) s'il n'est pas donné
+    :param nb_processus: nombre de processus, None pour tout calculer dans le
+    processus courant
+
+    :type positions_mobile: np.array de dimension (N, 6)
+    :type geometrie: cable_math.RobotGeometry
+    :type tension_min: float
+    :type tension_max: float
+    :type torseur: np.array de taille 6
+    :type nb_processus: int
+
+    :return: positions faisables, marges et tensions retenues
+    :rtype: (np.array de booléens de taille N, np.array de taille N,
+    np.array de dimension (N, 8))
+    """
+    tranches = (positions_mobile[debut:debut + cm.TAILLE_LOT]
+                for debut in range(0, len(positions_mobile), cm.TAILLE_LOT))
+    resultats = list(_tensions_tranches(tranches, geometrie, tension_min,
+                                        tension_max, torseur, nb_processus))
+    if not resultats:
+        return np.empty(0, dtype=bool), np.empty(0), np.empty((0, 8))
+    return tuple(np.concatenate(resultat) for resultat in zip(*resultats))
+
+
+def faisabilite_trajectoire(trajectoire, geometrie, tension_min=TENSION_MIN,
+                            tension_max=TENSION_MAX, torseur=None,
+                            nb_processus=None, profil=None, slerp=False):
+    """
+    Version de faisabilite_tensions pour une trajectoire entière : la
+    trajectoire est discrétisée en flux (voir
+    cable_math.discretisation_trajectoire_flux, ou le profil de vitesse s'il
+    est donné) et seuls les masques et les marges sont gardés, si bien que la
+    mémoire utilisée reste de 9 octets par pas. Les positions sont numérotées
+    comme dans cable_math.validation_trajectoire : la position 0 est le point
+    de départ et la position i celle atteinte après le ième déplacement.
+
+    :param trajectoire: Trajectoire souhaitée
+    :param geometrie: géométrie du robot
+    :param tension_min: voir faisabilite_tensions
+    :param tension_max: voir faisabilite_tensions
+    :param torseur: voir faisabilite_tensions
+    :param nb_processus: voir faisabilite_tensions
+    :param profil: voir cable_math.validation_trajectoire
+    :param slerp: voir cable_math.validation_trajectoire
+
+    :type trajectoire: np.array de dimension (n, 6)
+    :type geometrie: cable_math.RobotGeometry
+    :type profil: cable_math.ProfilVitesse
+    :type slerp: bool
+
+    :return: positions faisables et marges (en N)
+    :rtype: (np.array de booléens de taille N + 1, np.array de taille N + 1)
+    """
+    if profil is None:
+        blocs_disc = cm.discretisation_trajectoire_flux(
+            trajectoire, geometrie.pas_maximal, slerp=slerp)
+    else:
+        blocs_disc = profil.discretisation_flux(trajectoire,
+                                                geometrie.pas_maximal)
+    blocs = itertools.chain(
+        [np.array(trajectoire[0:1], dtype=float)],
+        (traj_bloc + var_bloc for traj_bloc, var_bloc in blocs_disc))
+    faisables = []
+    marges = []
+    for faisables_bloc, marges_bloc, _ in _tensions_tranches(
+            blocs, geometrie, tension_min, tension_max, torseur,
+            nb_processus):
+        faisables.append(faisables_bloc)
+        marges.append(marges_bloc)
+    if not faisables:
+        return np.empty(0, dtype=bool), np.empty(0)
+    return np.concatenate(faisables), np.concatenate(marges)
+
+
+def _tensions_tranches(tranches, geometrie, tension_min, tension_max, torseur,
+                       nb_processus):
+    # Générateur des résultats de _tensions_tranche pour chaque tranche de
+    # positions, dans l'ordre. En mode parallèle, au plus 2 tranches par
+    # processus sont en cours à la fois, pour borner la mémoire quand les
+    # tranches viennent d'un flux.
+    if torseur is None:
+        torseur = torseur_pesanteur()
+    torseur = np.asarray(torseur, dtype=float)
+    if not 0 <= tension_min < tension_max:
+        raise ValueError("Les tensions extrêmes doivent vérifier "
+                         "0 <= tension_min < tension_max")
+    parametres = (geometrie, tension_min, tension_max, torseur)
+    if nb_processus is None:
+        for tranche in tranches:
+            if len(tranche):
+                yield _tensions_tranche(tranche, *parametres)
+        return
+
+    # Les imports sont faits ici pour que l'import du module reste léger.
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(nb_processus) as executeur:
+        en_cours = collections.deque()
+        for tranche in tranches:
+            if len(tranche):
+                en_cours.append(executeur.submit(
+                    _tensions_tranche, np.asarray(tranche, dtype=float),
+                    *parametres))
+            if len(en_cours) >= 2 * nb_processus:
+                yield en_cours.popleft().result()
+        while en_cours:
+            yield en_cours.popleft().result()
+
+
+def _tensions_tranche(positions, geometrie, tension_min, tension_max,
+                      torseur):
+    # faisabilite_tensions pour une tranche de positions.
+    _, matrices = cm.matrice_structure_lot(positions, geometrie)
+    tension_moyenne = (tension_min + tension_max) / 2
+
+    # Distribution la plus proche de la tension moyenne :
+    # t = t_m - Wᵀ (W Wᵀ)⁻¹ (w + W t_m).
+    ecarts = torseur + tension_moyenne * matrices.sum(axis=2)
+    try:
+        multiplicateurs = np.linalg.solve(
+            np.matmul(matrices, matrices.transpose(0, 2, 1)),
+            ecarts[:, :, np.newaxis])[:, :, 0]
+        tensions = tension_moyenne - np.einsum('nji,nj->ni', matrices,
+                                               multiplicateurs)
+    except np.linalg.LinAlgError:
+        # Des câbles sont alignés dans au moins une position de la tranche.
+        tensions = tension_moyenne - np.einsum(
+            'nij,nj->ni', np.linalg.pinv(matrices), ecarts)
+    marges = np.minimum(tensions - tension_min,
+                        tension_max - tensions).min(axis=1)
+
+    hors_bornes = np.flatnonzero(marges < 0)
+    for debut in range(0, len(hors_bornes), TAILLE_LOT_EXACT):
+        indices = hors_bornes[debut:debut + TAILLE_LOT_EXACT]
+        tensions[indices], marges[indices] = _distribution_exacte(
+            matrices[indices], tensions[indices], torseur, tension_min,
+            tension_max)
+    return marges >= 0, marges, tensions
+
+
+def _distribution_exacte(matrices, particulieres, torseur, tension_min,
+                         tension_max):
+    # Distribution des tensions qui maximise le plus petit écart aux bornes,
+    # pour M positions à la fois. Les distributions d'équilibre sont
+    # t = t_p + N λ, t_p étant une solution particulière et N une base
+    # (8, 2) du noyau de W. Les bornes étant symétriques autour de la tension
+    # moyenne t_m, il s'agit de minimiser max_i |r_i(λ)|, avec
+    # r_i(λ) = t_p,i - t_m + N_i . λ : c'est une approximation de Tchebychev
+    # à 2 paramètres, dont l'optimum est atteint en un point où 3 des r_i
+    # ont la même valeur absolue. Les 224 points candidats (3 câbles parmi 8
+    # et 4 combinaisons de signes) sont calculés par lot, chacun en résolvant
+    # deux équations linéaires en λ par les formules de Cramer, et le
+    # meilleur est retenu : en tout point λ, max_i |r_i(λ)| est supérieur à
+    # l'optimum, qui est atteint au point candidat optimal.
+    nb_positions = len(matrices)
+    if nb_positions == 0:
+        return np.empty((0, 8)), np.empty(0)
+    _, _, vt = np.linalg.svd(matrices)
+    noyaux = vt[:, 6:8]
+    demi_intervalle = (tension_max - tension_min) / 2
+    ecarts = particulieres - (tension_min + tension_max) / 2
+
+    # Les égalités σ_p r_p(λ) = σ_q r_q(λ) = σ_r r_r(λ), pour chaque
+    # candidat, s'écrivent a . λ = b.
+    a = noyaux[:, :, _CABLES] * _SIGNES
+    b = ecarts[:, _CABLES] * _SIGNES
+    d1 = a[..., 0] - a[..., 1]
+    d2 = a[..., 0] - a[..., 2]
+    e1 = b[..., 1] - b[..., 0]
+    e2 = b[..., 2] - b[..., 0]
+    determinants = d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0]
+    candidats = np.abs(determinants) > 1e-12
+    determinants[~candidats] = 1
+    lambdas = np.stack([(e1 * d2[:, 1] - e2 * d1[:, 1]) / determinants,
+                        (d1[:, 0] * e2 - d2[:, 0] * e1) / determinants],
+                       axis=1)
+    # Rangés (M, 8, 224) : la réduction sur les câbles se fait alors entre
+    # lignes contiguës, bien plus vite que sur le dernier axe.
+    residus = np.matmul(noyaux.transpose(0, 2, 1), lambdas)
+    residus += ecarts[:, :, np.newaxis]
+    np.abs(residus, out=residus)
+    valeurs = demi_intervalle - residus.max(axis=1)
+    valeurs[~candidats] = -np.inf
+
+    meilleurs = valeurs.argmax(axis=1)
+    rang = np.arange(nb_positions)
+    marges = valeurs[rang, meilleurs]
+    tensions = particulieres + np.einsum('mk,mki->mi',
+                                         lambdas[rang, :, meilleurs], noyaux)
+
+    # Si les câbles ne peuvent pas équilibrer le torseur (matrice de
+    # structure de rang inférieur à 6), la solution particulière n'est pas à
+    # l'équilibre et aucune distribution ne convient.
+    desequilibres = np.einsum('mij,mj->mi', matrices, particulieres)
+    desequilibres += torseur
+    desequilibres = (np.sqrt(np.sum(desequilibres ** 2, axis=1)) >
+                     1e-9 * max(tension_max, np.abs(torseur).max()))
+    marges[desequilibres] = -np.inf
+    tensions[desequilibres] = np.nan
+    return tensions, marges
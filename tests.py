@@ -0,0 +1,659 @@
+import io
+import os
+import json
+import pty
+import tty
+import time
+import select
+import shutil
+import asyncio
+import tempfile
+import unittest
+import contextlib
+import tracemalloc
+import numpy as np
+
+import cable_math as cm
+import cable_robot as cr
+import protocol
+import profiling
+import simulation
+import tensions
+import text_trajectory
+import trajectory_archive
+import transport
+from command_cache import CommandCache
+
+# Tests of the command pipeline, run with python -m pytest tests.py or python -m unittest tests.
+
+
+def random_trajectory(points, seed=0):
+    # Random walk around the centre of the hangar, with steps of a few centimeters and a few hundredths of a radian.
+    generator = np.random.default_rng(seed)
+    trajectory = np.cumsum(generator.normal(0, 0.02, (points, 6)), axis=0) * [1, 1, 1, 0.5, 0.5, 0.5]
+    trajectory[:, 0:3] += cm.DIMENSIONS_HANGAR / 2
+    return trajectory
+
+
+def concatenate(blocks, columns=6):
+    blocks = list(blocks)
+    return np.concatenate(blocks) if blocks else np.empty((0, columns))
+
+
+class StreamingTest(unittest.TestCase):
+    # The streaming versions of the pipeline give the same results as the batch ones, whatever the size of the blocks.
+
+    def test_discretisation(self):
+        trajectory = random_trajectory(50)
+        for slerp in (False, True):
+            points, steps = cm.discretisation_trajectoire(trajectory, cm.pas_maximal, slerp)
+            for block_size in (1, 7, 1000):
+                blocks = list(cm.discretisation_trajectoire_flux(trajectory, cm.pas_maximal, block_size, slerp))
+                self.assertTrue(all(len(block[0]) <= block_size for block in blocks))
+                np.testing.assert_allclose(concatenate(block[0] for block in blocks), points, rtol=0, atol=1e-12)
+                np.testing.assert_allclose(concatenate(block[1] for block in blocks), steps, rtol=0, atol=1e-12)
+
+    def test_ticks(self):
+        trajectory = random_trajectory(30)
+        ticks, _ = cm.commande_ticks(trajectory, cm.GEOMETRIE_MAQUETTE)
+        for block_size in (13, cm.TAILLE_LOT):
+            streamed = concatenate(cm.commande_ticks_flux(trajectory, cm.GEOMETRIE_MAQUETTE, block_size), 8)
+            np.testing.assert_array_equal(streamed, ticks)
+
+    def test_velocity_profile(self):
+        trajectory = random_trajectory(20)
+        for jerk in (None, 40.0):
+            profile = cm.ProfilVitesse(0.01, 2.0, secousse_max=jerk)
+            points, steps = profile.discretisation(trajectory, cm.pas_maximal)
+            blocks = list(profile.discretisation_flux(trajectory, cm.pas_maximal, 100))
+            np.testing.assert_allclose(concatenate(block[0] for block in blocks), points, rtol=0, atol=1e-9)
+            np.testing.assert_allclose(concatenate(block[1] for block in blocks), steps, rtol=0, atol=1e-9)
+            np.testing.assert_allclose(points[0], trajectory[0])
+            np.testing.assert_allclose(points[-1] + steps[-1], trajectory[-1])
+
+
+class GeometryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_profile(self, profile):
+        path = os.path.join(self.directory, "robot.json")
+        with open(path, "w") as target:
+            json.dump(profile, target)
+        return path
+
+    def test_profile(self):
+        geometry = cm.RobotGeometry.depuis_profil(self.write_profile({"dimensions_mobile": [0.2, 0.3, 0.1], "diametre_tambour": 0.01}))
+        np.testing.assert_allclose(geometry.coins_mobile.max(axis=0), [0.1, 0.15, 0.05])
+        self.assertEqual(geometry.diametre_tambour, 0.01)
+        # The keys that are not given keep the value of the default robot.
+        np.testing.assert_array_equal(geometry.coins_hangar, cm.GEOMETRIE_MAQUETTE.coins_hangar)
+        np.testing.assert_array_equal(geometry.pas_maximal, cm.GEOMETRIE_MAQUETTE.pas_maximal)
+        for profile in ({"dimensions": [1, 1, 1]}, [0.2, 0.3, 0.1], {"diametre_tambour": -1}, {"chgt_num": [0, 0, 1, 2, 3, 4, 5, 6]}):
+            with self.assertRaises(ValueError):
+                cm.RobotGeometry.depuis_profil(self.write_profile(profile))
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_hit_and_miss(self):
+        cache = CommandCache(self.directory)
+        trajectory = random_trajectory(10)
+        key = cache.key(trajectory, cm.GEOMETRIE_MAQUETTE)
+        self.assertIsNone(cache.get(key))
+        recording = cache.record(key, cm.commande_ticks_flux(trajectory, cm.GEOMETRIE_MAQUETTE, 10), "<i8")
+        blocks = [next(recording)]
+        self.assertIsNone(cache.get(key), "an entry only appears once its commands are all consumed")
+        blocks += list(recording)
+        recorded = concatenate(blocks, 8)
+        self.assertGreater(len(blocks), 1)
+        cached = cache.get(key)
+        self.assertIsNotNone(cached)
+        np.testing.assert_array_equal(cached, recorded)
+        # Anything the commands depend on changes the key.
+        self.assertEqual(cache.key(trajectory.copy(), cm.GEOMETRIE_MAQUETTE), key)
+        self.assertNotEqual(cache.key(trajectory, cm.RobotGeometry(diametre_tambour=0.01)), key)
+        self.assertNotEqual(cache.key(trajectory, cm.GEOMETRIE_MAQUETTE, slerp=True), key)
+        self.assertNotEqual(cache.key(trajectory, cm.GEOMETRIE_MAQUETTE, cm.ProfilVitesse(0.01, 2.0)), key)
+        moved = trajectory.copy()
+        moved[3, 0] += 1e-9
+        self.assertIsNone(cache.get(cache.key(moved, cm.GEOMETRIE_MAQUETTE)))
+
+    def test_shared_budget(self):
+        # Each entry is 100 rows of 8 doubles and a 128 bytes header, the budget holds 3 of them.
+        cache = CommandCache(self.directory, 3 * 6528)
+        sidecars = CommandCache(os.path.join(self.directory, "trajectories"), shared_with=cache)
+        for index, target in enumerate([cache, sidecars, cache, sidecars]):
+            list(target.record(f"entry{index}", [np.zeros((100, 8))]))
+            path = target.path(f"entry{index}")
+            os.utime(path, (index, index))
+            target.evict()
+        self.assertEqual([key for key, _, _ in cache.entries()], ["entry2"])
+        self.assertEqual([key for key, _, _ in sidecars.entries()], ["entry1", "entry3"])
+        self.assertLessEqual(cache.shared_size(), cache.max_size)
+
+
+class IncrementalTest(unittest.TestCase):
+    # The incremental mode against the exact computation of the cable lengths.
+
+    def setUp(self):
+        self.geometry = cm.GEOMETRIE_MAQUETTE
+        self.trajectory = random_trajectory(20)
+
+    def test_maximal_steps(self):
+        # At the maximal steps the extrapolation would be too far off : every length is computed exactly.
+        discretised = cm.discretisation_trajectoire(self.trajectory, self.geometry.pas_maximal)
+        report = cm.rapport_erreur_incrementale(discretised, self.geometry)
+        self.assertEqual(report["calculs_exacts"], report["nombre_pas"])
+        self.assertEqual(report["erreur_max"], 0.0)
+
+    def test_drift(self):
+        # With steps a hundred times finer, most lengths are extrapolated, within the tolerance and without drifting from the exact ones.
+        discretised = cm.discretisation_trajectoire(self.trajectory, self.geometry.pas_maximal / 100)
+        exact, _ = cm.commande_longeurs_cables(discretised, self.geometry)
+        for period in (4, 16, 64):
+            report = cm.rapport_erreur_incrementale(discretised, self.geometry, period)
+            self.assertLess(report["calculs_exacts"], report["nombre_pas"] / 2)
+            self.assertLessEqual(report["erreur_max"], cm.TOLERANCE_INCREMENTALE)
+            self.assertEqual(report["erreur_max"], max(report["erreur_max_par_cable"]))
+            lengths, variations = cm.commande_longeurs_cables(discretised, self.geometry, period)
+            self.assertLessEqual(np.abs(lengths - exact).max(), cm.TOLERANCE_INCREMENTALE)
+            # The anchors, in the middle of each group of period steps, are computed exactly : the error never carries over to the next group.
+            np.testing.assert_array_equal(lengths[period // 2::period], exact[period // 2::period])
+            np.testing.assert_allclose(np.cumsum(variations, axis=0)[-1], lengths[-1] - cm.calcul_longueurs_cables_lot(self.trajectory[:1], self.geometry)[0], rtol=0, atol=1e-12)
+
+
+class ParallelTest(unittest.TestCase):
+
+    def test_same_as_serial(self):
+        # Steps a thousand times finer than the default, so that the steps are shared between several processes.
+        geometry = cm.RobotGeometry(pas_maximal=cm.pas_maximal / 1000)
+        trajectory = random_trajectory(50)
+        exact, exact_variations = cm.commande_longeurs_cables(cm.discretisation_trajectoire(trajectory, geometry.pas_maximal), geometry)
+        self.assertGreater(len(exact), 2 * cm.TAILLE_LOT)
+        lengths, variations = cm.commande_longeurs_cables_paralleles(trajectory, geometry, 2)
+        np.testing.assert_allclose(lengths, exact, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(variations, exact_variations, rtol=0, atol=1e-9)
+
+
+class ProtocolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.deltas = np.random.default_rng(0).integers(-1000, 1000, (100, protocol.MOTORS))
+
+    def test_round_trip(self):
+        for deltas, width in ((self.deltas, 2), (self.deltas * 100, 4)):
+            frame = protocol.encode(deltas, 2**32 - 10)
+            sequence, decoded, size = protocol.decode(frame)
+            self.assertEqual((sequence, size), (2**32 - 10, len(frame)))
+            self.assertEqual(frame[3], width)
+            np.testing.assert_array_equal(decoded, deltas)
+        frames = b"".join(protocol.encode_frames(self.deltas, 5, records_per_frame=32))
+        decoded = list(protocol.decode_stream(frames))
+        self.assertEqual([sequence for sequence, _ in decoded], [5, 37, 69, 101])
+        np.testing.assert_array_equal(np.concatenate([deltas for _, deltas in decoded]), self.deltas)
+
+    def test_corrupted_frames(self):
+        frame = protocol.encode(self.deltas)
+        corrupted = bytearray(frame)
+        corrupted[protocol.HEADER.size + 3] ^= 0x10
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode(corrupted)
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode(frame[:-1])
+        with self.assertRaises(protocol.ProtocolError):
+            protocol.decode(b"XX" + frame[2:])
+
+    def test_reader(self):
+        first = protocol.encode(self.deltas[:50], 0)
+        second = protocol.encode(self.deltas[50:], 50)
+        stream = first + protocol.encode_halt(50) + second + protocol.encode_ack(100)
+        reader = protocol.FrameReader()
+        messages = []
+        for start in range(0, len(stream), 7):
+            messages += reader.feed(stream[start:start + 7])
+        self.assertEqual([message[0] for message in messages], ["commands", "halt", "commands", "ack"])
+        np.testing.assert_array_equal(np.concatenate([messages[0][2], messages[2][2]]), self.deltas)
+        self.assertEqual(reader.errors, 0)
+
+    def test_long_arrays(self):
+        # Longer arrays than a frame holds go through encode_frames, whose frames the reader accepts.
+        deltas = np.random.default_rng(1).integers(-1000, 1000, (2 * protocol.RECORDS_PER_FRAME + 100, protocol.MOTORS))
+        with self.assertRaises(ValueError):
+            protocol.encode(deltas)
+        reader = protocol.FrameReader()
+        messages = reader.feed(b"".join(protocol.encode_frames(deltas, 7)))
+        self.assertEqual([message[1] for message in messages], [7, 7 + protocol.RECORDS_PER_FRAME, 7 + 2 * protocol.RECORDS_PER_FRAME])
+        np.testing.assert_array_equal(np.concatenate([message[2] for message in messages]), deltas)
+        self.assertEqual((reader.errors, reader.skipped), (0, 0))
+
+    def test_reader_resynchronises(self):
+        first = protocol.encode(self.deltas[:50], 0)
+        second = protocol.encode(self.deltas[50:], 50)
+        # A bad checksum, garbage between two messages and a header whose count would make the reader wait for gigabytes.
+        bad_checksum = bytearray(first)
+        bad_checksum[-1] ^= 0xFF
+        bad_count = bytearray(first)
+        bad_count[8:12] = (2**31).to_bytes(4, "little")
+        reader = protocol.FrameReader()
+        messages = reader.feed(bytes(bad_checksum) + b"noise" + second + bytes(bad_count) + protocol.encode_ack(100))
+        self.assertEqual([message[0] for message in messages], ["commands", "ack"])
+        self.assertEqual(messages[0][1], 50)
+        np.testing.assert_array_equal(messages[0][2], self.deltas[50:])
+        self.assertEqual(reader.errors, 2)
+        self.assertGreater(reader.skipped, 0)
+
+
+class QuantisationTest(unittest.TestCase):
+
+    def test_residual(self):
+        geometry = cm.GEOMETRIE_MAQUETTE
+        generator = np.random.default_rng(0)
+        quantiser = cm.QuantificateurTicks(geometry)
+        variations = generator.normal(0, 3 * geometry.longueur_tick, (10000, 8))
+        ticks = np.concatenate([quantiser.quantifie(block) for block in np.array_split(variations, 17)])
+        self.assertEqual(ticks.dtype, np.int64)
+        # The position of each motor never drifts from the exact one, it stays within half a tick.
+        exact = np.cumsum(variations, axis=0) / geometry.longueur_tick
+        self.assertLessEqual(np.abs(np.cumsum(ticks, axis=0) - exact).max(), 0.5 + 1e-9)
+        self.assertTrue(np.all(quantiser.erreur_max <= 0.5 + 1e-9))
+        self.assertTrue(np.all(np.abs(quantiser.residu) < 1))
+        np.testing.assert_allclose(quantiser.residu, exact[-1] - ticks.sum(axis=0), atol=1e-9)
+
+
+class AsyncHaltTest(unittest.TestCase):
+    # The command line tool runs trajectories as asyncio tasks, cancelling the task halts the trajectory between two commands.
+
+    class RecordingBackend(object):
+
+        def __init__(self):
+            self.sent = []
+            self.halts = 0
+
+        def send(self, command):
+            self.sent.append(command)
+
+        def halt(self):
+            self.halts += 1
+
+        def close(self):
+            pass
+
+    def setUp(self):
+        self.backend = self.RecordingBackend()
+        cr.use_backend(self.backend)
+        self.addCleanup(cr.use_backend, cr.PrintBackend())
+
+    def test_halt(self):
+        commands = np.ones((1000, protocol.MOTORS), dtype=np.int64)
+        scheduler = cr.StepScheduler(0.005)
+
+        async def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                motion = asyncio.create_task(cr.auto_async(commands, scheduler))
+                await asyncio.sleep(0.1)
+                self.assertFalse(motion.done())
+                motion.cancel()
+                cr.halt()
+                with self.assertRaises(asyncio.CancelledError):
+                    await motion
+        asyncio.run(run())
+        self.assertEqual(self.backend.halts, 1)
+        self.assertGreater(len(self.backend.sent), 0)
+        self.assertLess(len(self.backend.sent), len(commands))
+        self.assertEqual(scheduler.stats["sent"], len(self.backend.sent))
+
+
+class TransportTest(unittest.TestCase):
+    # The serial link, against the fake controllers on a pseudo-terminal.
+
+    def setUp(self):
+        self.controller = transport.FakeController(command_time=1e-4)
+        self.addCleanup(self.controller.close)
+
+    def open(self, **options):
+        link = transport.SerialTransport(self.controller.path, **options)
+        self.addCleanup(link.close)
+        return link
+
+    def test_back_pressure(self):
+        # The ring buffer and the window are much smaller than the commands sent : send waits for the controllers, nothing is lost.
+        link = self.open(capacity=64, window=32, records_per_frame=8)
+        ticks = np.random.default_rng(0).integers(-100, 100, (1000, protocol.MOTORS))
+        for block in np.array_split(ticks, 7):
+            link.send(block)
+        self.assertTrue(link.flush(10))
+        self.assertEqual(self.controller.positions.tolist(), ticks.sum(axis=0).tolist())
+        self.assertEqual(link.stats["commands"], len(ticks))
+        self.assertEqual(self.controller.errors, 0)
+
+    def test_send_async(self):
+        # Under back-pressure the event loop keeps running while send_async waits for room.
+        link = self.open(capacity=16, window=16, records_per_frame=4)
+        ticks = np.ones((400, protocol.MOTORS), dtype=np.int32)
+        gaps = []
+
+        async def ticker():
+            last = time.monotonic()
+            while True:
+                await asyncio.sleep(0.001)
+                gaps.append(time.monotonic() - last)
+                last = time.monotonic()
+
+        async def run():
+            task = asyncio.create_task(ticker())
+            for command in ticks:
+                await link.send_async(command)
+            task.cancel()
+        asyncio.run(run())
+        self.assertTrue(link.flush(10))
+        self.assertEqual(self.controller.positions.tolist(), ticks.sum(axis=0).tolist())
+        self.assertLess(max(gaps), 0.02)
+
+    def test_halt(self):
+        link = self.open(capacity=4096, window=64, records_per_frame=8)
+        link.send(np.ones((4000, protocol.MOTORS), dtype=np.int32))
+        link.halt()
+        self.assertEqual(len(link.ring), 0)
+        self.assertTrue(link.flush(10))
+        deadline = time.monotonic() + 5
+        while self.controller.halts == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.controller.halts, 1)
+        self.assertLess(self.controller.executed, 4000)
+        self.assertGreater(link.stats["dropped"], 0)
+
+    def test_halt_does_not_block(self):
+        # Nobody reads the other end of this pseudo-terminal : once its buffer is full the writer thread is stuck, and halt must still return at once.
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.addCleanup(os.close, master)
+        self.addCleanup(os.close, slave)
+        link = transport.SerialTransport(os.ttyname(slave), window=10**6, timeout=1.0)
+        link.send(np.full((20000, protocol.MOTORS), 30000, dtype=np.int32))
+        time.sleep(0.2)
+        self.assertGreater(len(link.ring), 0, "the writer should be stuck")
+        start = time.monotonic()
+        link.halt()
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertEqual(len(link.ring), 0)
+        # Reading the other end unblocks the writer, which then writes the halt message.
+        data = b""
+        while protocol.encode_halt(link.sequence) not in data:
+            ready, _, _ = select.select([master], [], [], 2)
+            self.assertTrue(ready, "the halt message never came")
+            data += os.read(master, 65536)
+        link.close()
+
+
+class ValidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.geometry = cm.GEOMETRIE_MAQUETTE
+        self.centre = cm.position_centrale(self.geometry)
+
+    def test_valid(self):
+        trajectory = random_trajectory(30)
+        report = cm.validation_trajectoire(trajectory, self.geometry, 0.1, taille_bloc=7)
+        self.assertTrue(report["valide"])
+        self.assertEqual(report["nombre_pas"], len(cm.discretisation_trajectoire(trajectory, self.geometry.pas_maximal)[1]))
+        self.assertEqual(report["premiers"], {"hors_hangar": None, "longueurs_hors_limites": None, "vitesses_excessives": None})
+        lengths = cm.calcul_longueurs_cables_lot(trajectory, self.geometry)
+        self.assertLessEqual(report["longueur_min"], lengths.min())
+        self.assertGreaterEqual(report["longueur_max"], lengths.max())
+
+    def test_limits(self):
+        trajectory = np.array([self.centre, self.centre + [0.8, 0, 0, 0, 0, 0]])
+        points, steps = cm.discretisation_trajectoire(trajectory, self.geometry.pas_maximal)
+        positions = np.concatenate([points[:1], points + steps])
+        corners = cm.reconstruction_coins_lot(positions, self.geometry)
+        outside = np.flatnonzero(np.any(corners > self.geometry.coins_hangar.max(axis=0), axis=(1, 2)))
+        for block_size in (5, 1000):
+            report = cm.validation_trajectoire(trajectory, self.geometry, 0.1, taille_bloc=block_size)
+            self.assertFalse(report["valide"])
+            self.assertEqual(report["hors_hangar"], len(outside))
+            self.assertEqual(report["premiers"]["hors_hangar"], outside[0])
+            self.assertEqual(report["vitesses_excessives"], 0)
+        # Much shorter time steps make the cables too fast from the first step on.
+        report = cm.validation_trajectoire(np.array([self.centre, self.centre + [0.1, 0, 0, 0, 0, 0]]), self.geometry, 1e-4)
+        self.assertEqual(report["vitesses_excessives"], report["nombre_pas"])
+        self.assertEqual(report["premiers"]["vitesses_excessives"], 1)
+
+
+class TensionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.geometry = cm.GEOMETRIE_MAQUETTE
+        self.centre = cm.position_centrale(self.geometry)
+
+    def test_equilibrium(self):
+        positions = self.centre + np.random.default_rng(0).uniform(-1, 1, (300, 6)) * [0.2, 0.2, 0.15, 0.1, 0.1, 0.1]
+        feasible, margins, tension = tensions.faisabilite_tensions(positions, self.geometry)
+        self.assertTrue(feasible.any())
+        # Where a position is feasible, its tensions hold the mobile (W t + w = 0) within the limits, and the margin is their distance to the limits.
+        _, structure = cm.matrice_structure_lot(positions, self.geometry)
+        residuals = np.einsum('nij,nj->ni', structure, tension) + tensions.torseur_pesanteur()
+        self.assertLess(np.abs(residuals[feasible]).max(), 1e-9)
+        self.assertTrue(np.all(tension[feasible] >= tensions.TENSION_MIN - 1e-9))
+        self.assertTrue(np.all(tension[feasible] <= tensions.TENSION_MAX + 1e-9))
+        np.testing.assert_allclose(margins, np.minimum(tension - tensions.TENSION_MIN, tensions.TENSION_MAX - tension).min(axis=1), atol=1e-9)
+
+    def test_infeasible(self):
+        # At the top of the hangar the upper cables are almost horizontal, and a 100 kg mobile is too heavy for 8 cables of 100 N anyway.
+        top = self.centre + [0, 0, 0.34, 0, 0, 0]
+        feasible, margins, _ = tensions.faisabilite_tensions(np.array([self.centre, top]), self.geometry)
+        self.assertEqual(feasible.tolist(), [True, False])
+        self.assertLess(margins[1], 0)
+        feasible, margins, _ = tensions.faisabilite_tensions(self.centre[np.newaxis], self.geometry, torseur=tensions.torseur_pesanteur(100))
+        self.assertFalse(feasible[0])
+        # Along a trajectory, the positions are numbered like in the validation of the trajectory.
+        feasible, margins = tensions.faisabilite_trajectoire(np.array([self.centre, top]), self.geometry)
+        self.assertEqual(len(feasible), cm.validation_trajectoire(np.array([self.centre, top]), self.geometry, 0.1)["nombre_pas"] + 1)
+        self.assertTrue(feasible[0])
+        self.assertFalse(feasible[-1])
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def test_disabled(self):
+        profiler = profiling.Profiler()
+        blocks = [np.zeros(3)]
+        self.assertIs(profiler.stage("load"), profiling.NO_STAGE)
+        self.assertIs(profiler.timed("discretisation", blocks), blocks)
+        self.assertIs(profiler.timed_call("send", print), print)
+        self.assertEqual(profiler.report()["stages"], {})
+
+    def test_stages(self):
+        # A clock that moves by one second each time it is read.
+        profiler = profiling.Profiler(clock=iter(range(1000)).__next__)
+        profiler.enable()
+        profiler.reset()
+        with profiler.stage("load"):
+            blocks = list(profiler.timed("discretisation", [np.zeros((4, 6)), np.zeros((6, 6))]))
+        profiler.finish()
+        report = profiler.report()
+        self.assertEqual(len(blocks), 2)
+        self.assertIsNone(report["peak_memory"], "memory is only measured on demand")
+        discretisation = report["stages"]["discretisation"]
+        self.assertEqual((discretisation["calls"], discretisation["items"], discretisation["wall_time"]), (3, 10, 3))
+        # The time spent in discretisation is not part of the own time of load.
+        load = report["stages"]["load"]
+        self.assertEqual((load["calls"], load["wall_time"], load["own_time"]), (1, 7, 4))
+
+    def test_memory(self):
+        profiler = profiling.Profiler()
+        profiler.enable(memory=True)
+        self.addCleanup(profiler.disable)
+        with profiler.stage("allocation"):
+            block = np.ones(10**6)
+        del block
+        self.assertGreaterEqual(profiler.report()["stages"]["allocation"]["peak_memory"], 8 * 10**6)
+        profiler.disable()
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+class TextTrajectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.trajectory = random_trajectory(500, 3)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as target:
+            target.write("\n".join(lines) + "\n")
+        return path
+
+    def test_parse(self):
+        path = os.path.join(self.directory, "trajectory.csv")
+        np.savetxt(path, self.trajectory, delimiter=",", header="x,y,z,a,b,c")
+        # Small chunks, so that the file is parsed in many of them.
+        np.testing.assert_array_equal(text_trajectory.parse(path, ",", chunk_size=1000), self.trajectory)
+        sidecars = CommandCache(os.path.join(self.directory, "sidecars"))
+        poses, from_sidecar = text_trajectory.load(path, ",", sidecars)
+        self.assertFalse(from_sidecar)
+        np.testing.assert_array_equal(poses, self.trajectory)
+        poses, from_sidecar = text_trajectory.load(path, ",", sidecars)
+        self.assertTrue(from_sidecar)
+        np.testing.assert_array_equal(poses, self.trajectory)
+        # A sidecar larger than the whole cache is evicted right away, the file is parsed again.
+        poses, from_sidecar = text_trajectory.load(path, ",", CommandCache(os.path.join(self.directory, "small"), 1000))
+        self.assertFalse(from_sidecar)
+        np.testing.assert_array_equal(poses, self.trajectory)
+
+    def test_bad_lines(self):
+        lines = [" ".join(map(repr, pose)) for pose in self.trajectory.tolist()]
+        for number, line, message in [(1, "1 2 3 4 5", "5 columns"), (321, "1 2 3 4 5 six", "'six' is not a number"), (500, "1,2,3,4,5,6", "1 columns")]:
+            bad = lines.copy()
+            bad[number - 1] = line
+            path = self.write("bad.txt", bad)
+            with self.assertRaises(text_trajectory.TrajectoryFormatError) as context:
+                text_trajectory.parse(path, chunk_size=1000)
+            self.assertEqual(context.exception.line, number)
+            self.assertIn(message, str(context.exception))
+
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "trajectories.crt")
+        self.trajectories = {"square": random_trajectory(40, 1), "line": random_trajectory(3, 2)}
+        metadata = {"geometry": trajectory_archive.geometry_metadata(cm.GEOMETRIE_MAQUETTE)}
+        trajectory_archive.write_archive(self.path, [(name, trajectory, metadata) for name, trajectory in self.trajectories.items()])
+
+    def test_round_trip(self):
+        archive = trajectory_archive.TrajectoryArchive(self.path)
+        self.assertEqual(archive.names(), list(self.trajectories))
+        for name, trajectory in self.trajectories.items():
+            np.testing.assert_array_equal(archive.get(name), trajectory)
+        self.assertEqual(archive.check(), [])
+        self.assertEqual(archive.geometry("line")["fingerprint"], trajectory_archive.geometry_metadata(cm.GEOMETRIE_MAQUETTE)["fingerprint"])
+        with self.assertRaises(KeyError):
+            archive.get("circle")
+
+    def test_checksum_failure(self):
+        offset = trajectory_archive.TrajectoryArchive(self.path).entry("square")["offset"]
+        with open(self.path, "r+b") as target:
+            target.seek(offset + 100)
+            byte = target.read(1)
+            target.seek(offset + 100)
+            target.write(bytes([byte[0] ^ 0x01]))
+        archive = trajectory_archive.TrajectoryArchive(self.path)
+        with self.assertRaises(trajectory_archive.ArchiveError):
+            archive.get("square")
+        self.assertEqual(archive.check(), ["square"])
+        np.testing.assert_array_equal(archive.get("line"), self.trajectories["line"])
+
+    def test_truncated(self):
+        entry = trajectory_archive.TrajectoryArchive(self.path).entry("line")
+        with open(self.path, "r+b") as target:
+            target.truncate(entry["offset"] + 8)
+        with self.assertRaises(trajectory_archive.ArchiveError):
+            trajectory_archive.TrajectoryArchive(self.path)
+
+    def test_malformed_index(self):
+        with open(self.path, "rb") as source:
+            _, _, _, header_size = trajectory_archive.PREAMBLE.unpack(source.read(trajectory_archive.PREAMBLE.size))
+            index = json.loads(source.read(header_size))
+        for change in ({"offset": None}, {"shape": [3]}, {"shape": [3, 5]}, {"name": 7}, {"dtype": "<i8"}, {"name": "square"}):
+            entries = [dict(entry) for entry in index["trajectories"]]
+            entries[1].update(change)
+            header = json.dumps({"trajectories": entries}).encode()
+            with open(self.path, "r+b") as target:
+                target.seek(trajectory_archive.PREAMBLE.size)
+                target.write(header + b" " * (header_size - len(header)))
+            with self.assertRaises(trajectory_archive.ArchiveError):
+                trajectory_archive.TrajectoryArchive(self.path)
+
+
+class ForwardKinematicsTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        geometry = cm.GEOMETRIE_MAQUETTE
+        generator = np.random.default_rng(0)
+        positions = cm.position_centrale(geometry) + generator.uniform(-1, 1, (200, 6)) * [0.2, 0.2, 0.15, 0.2, 0.2, 0.2]
+        lengths = cm.calcul_longueurs_cables_lot(positions, geometry)
+        found, report = cm.cinematique_directe_lot(lengths, geometry)
+        self.assertEqual(report["convergees"], len(positions))
+        self.assertLess(report["residu_max"], 1e-9)
+        np.testing.assert_allclose(found, positions, rtol=0, atol=1e-7)
+        np.testing.assert_allclose(cm.calcul_longueurs_cables_lot(found, geometry), lengths, rtol=0, atol=1e-9)
+
+
+class SimulationTest(unittest.TestCase):
+    # Replays of trajectories on the simulated robot, faster than real time.
+
+    def setUp(self):
+        self.ticks = np.random.default_rng(0).integers(-50, 50, (2000, protocol.MOTORS))
+        self.time_step = 0.01
+        self.clock = simulation.VirtualClock()
+        self.robot = simulation.SimulatedRobot(1e6, 1e9, self.time_step, clock=self.clock.time)
+
+    def replay(self, policy="catchup", send_time=0.0):
+        # Runs the ticks through a scheduler on the virtual clock. Each command takes send_time seconds of simulated time to send.
+        def send(command):
+            self.robot.send(command)
+            self.clock.now += send_time
+        scheduler = cr.StepScheduler(self.time_step, policy, clock=self.clock.time, sleep=self.clock.sleep, sleep_async=self.clock.sleep_async)
+        return asyncio.run(scheduler.run_async([self.ticks[:700], self.ticks[700:]], send))
+
+    def test_replay(self):
+        stats = self.replay()
+        report = self.robot.report()
+        self.assertEqual(stats["sent"], len(self.ticks))
+        self.assertEqual(report["commands"], len(self.ticks))
+        self.assertEqual(report["positions"], self.ticks.sum(axis=0).tolist())
+        self.assertEqual(report["missed_deadlines"], 0)
+        self.assertLess(report["max_latency"], 1e-9)
+        self.assertAlmostEqual(report["simulated_time"], len(self.ticks) * self.time_step)
+        self.assertEqual(self.clock.sleeps, len(self.ticks))
+
+    def test_missed_deadlines(self):
+        # Sending takes 2.5 time steps : every command is late.
+        stats = self.replay(send_time=2.5 * self.time_step)
+        report = self.robot.report()
+        self.assertEqual(report["commands"], len(self.ticks))
+        self.assertEqual(report["positions"], self.ticks.sum(axis=0).tolist())
+        self.assertGreater(report["missed_deadlines"], len(self.ticks) // 2)
+        self.assertGreater(stats["overruns"], 0)
+
+    def test_skipped_commands_keep_the_motion(self):
+        stats = self.replay("skip", send_time=2.5 * self.time_step)
+        report = self.robot.report()
+        self.assertGreater(stats["skipped"], 0)
+        self.assertEqual(stats["sent"] + stats["skipped"], len(self.ticks))
+        self.assertEqual(report["commands"], stats["sent"])
+        self.assertEqual(report["positions"], self.ticks.sum(axis=0).tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import io
+import os
+import hashlib
+import warnings
+import numpy as np
+
+# Reading of trajectories saved as text (np.savetxt, with or without delimiter=','), one pose of 6 numbers per line.
+#
+# The file is read in chunks of whole lines and each chunk is parsed on its own, so that a multi-million-row export is never held in memory twice (as text and as numbers) and can be written to its sidecar while it is parsed. A chunk is parsed by numpy as a whole, handed to np.loadtxt as bytes (decoding it to a str first made parsing about 25% slower), the lines are only looked at one by one when numpy refuses a chunk, to find the first bad line and tell its number.
+#
+# Chunking is not a speedup : converting the numbers takes almost all the time, and numpy has no faster parser than np.loadtxt. Parsing a file in chunks takes about as long as a single np.loadtxt of the file (within 5% on a million poses), the gain is memory and the sidecar.
+#
+# Parsing text stays slow compared to reading binary data, so the parsed trajectory is saved once as an npy sidecar in a CommandCache (see load) : replaying the same file maps the sidecar instead of parsing it again.
+
+COLUMNS = 6
+CHUNK_SIZE = 2**21
+# Bumped whenever the way text files are parsed changes, so that old sidecars are never reused.
+SIDECAR_VERSION = 1
+
+
+class TrajectoryFormatError(ValueError):
+    """A line of a text trajectory is not a pose of 6 numbers. line is its number, starting from 1."""
+
+    def __init__(self, path, line, message):
+        super().__init__(f"{path}, line {line} : {message}")
+        self.path = path
+        self.line = line
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    # Yields (number of the first line of the chunk, chunk) where the chunks are bytes of about chunk_size holding whole lines only.
+    line = 1
+    rest = b""
+    with open(path, "rb") as source:
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                break
+            data = rest + data
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                # A single line longer than chunk_size, it has to be read further.
+                rest = data
+                continue
+            rest = data[end:]
+            yield line, data[:end]
+            line += data.count(b"\n", 0, end)
+    if rest:
+        yield line, rest
+
+
+def find_bad_line(path, chunk, first_line, delimiter=None):
+    # Reads chunk line by line the way np.loadtxt does, and raises a TrajectoryFormatError for its first line that is not a pose. Only used once numpy refused the chunk, so speed does not matter here.
+    for number, line in enumerate(chunk.decode("utf-8", errors="replace").split("\n"), first_line):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        fields = line.split(delimiter)
+        if len(fields) != COLUMNS:
+            raise TrajectoryFormatError(path, number, f"{len(fields)} columns instead of {COLUMNS}")
+        for field in fields:
+            try:
+                float(field)
+            except ValueError:
+                raise TrajectoryFormatError(path, number, f"{field.strip()!r} is not a number") from None
+
+
+def parse_chunk(path, chunk, first_line, delimiter=None):
+    # The (rows, 6) array of the poses in chunk.
+    try:
+        with warnings.catch_warnings():
+            # A chunk of comments only is not an error, it just holds no pose.
+            warnings.simplefilter("ignore", UserWarning)
+            poses = np.loadtxt(io.BytesIO(chunk), dtype=float, delimiter=delimiter, ndmin=2)
+    except ValueError as e:
+        find_bad_line(path, chunk, first_line, delimiter)
+        raise TrajectoryFormatError(path, first_line, str(e)) from None
+    if len(poses) == 0:
+        return np.empty((0, COLUMNS))
+    if poses.shape[1] != COLUMNS:
+        find_bad_line(path, chunk, first_line, delimiter)
+        raise TrajectoryFormatError(path, first_line, f"{poses.shape[1]} columns instead of {COLUMNS}")
+    return poses
+
+
+def parse_blocks(path, delimiter=None, chunk_size=CHUNK_SIZE):
+    # Generator of the poses of the text file path, as (rows, 6) arrays, one per chunk. delimiter separates the columns, None for any whitespace. Raises TrajectoryFormatError on the first bad line.
+    for first_line, chunk in read_chunks(path, chunk_size):
+        poses = parse_chunk(path, chunk, first_line, delimiter)
+        if len(poses):
+            yield poses
+
+
+def parse(path, delimiter=None, chunk_size=CHUNK_SIZE):
+    blocks = list(parse_blocks(path, delimiter, chunk_size))
+    return np.concatenate(blocks) if blocks else np.empty((0, COLUMNS))
+
+
+def sidecar_key(path, delimiter=None):
+    # The sidecar of a file is found again as long as the file has the same path, size and modification time. Editing the file, even in place, changes its modification time, so a stale sidecar is never used.
+    status = os.stat(path)
+    description = f"version {SIDECAR_VERSION} path {os.path.realpath(path)} size {status.st_size} mtime {status.st_mtime_ns} delimiter {delimiter!r}"
+    return hashlib.blake2b(description.encode(), digest_size=20).hexdigest()
+
+
+def load(path, delimiter=None, sidecars=None):
+    # Returns (poses, whether they were read from a sidecar). sidecars is the CommandCache holding the sidecars : on a hit the poses are its read-only memory map, on a miss the file is parsed and its sidecar written along the way. Without sidecars, or with a cache of size 0, the file is simply parsed.
+    if sidecars is None or sidecars.max_size <= 0:
+        return parse(path, delimiter), False
+    key = sidecar_key(path, delimiter)
+    poses = sidecars.get(key)
+    if poses is not None:
+        return poses, True
+    # The blocks are only written to the sidecar, not kept : the poses are then read back from the sidecar's memory map.
+    for _ in sidecars.record(key, parse_blocks(path, delimiter), '<f8', columns=COLUMNS):
+        pass
+    poses = sidecars.get(key)
+    if poses is None:
+        # The sidecar was evicted right away, it is larger than the whole cache : the file has to be parsed again.
+        return parse(path, delimiter), False
+    return poses, False
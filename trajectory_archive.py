@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import struct
+import pickle
+import hashlib
+import argparse
+import numpy as np
+
+import cable_math as cm
+import text_trajectory
+
+# Archives of named trajectories, so that hundreds of trajectories live in a single file instead of one file each.
+#
+# An archive starts with a fixed preamble (MAGIC, the format version and the length of the index), followed by the index, a JSON object padded with spaces, and then the trajectories themselves. Each trajectory is a contiguous (rows, 6) array of little endian float64 starting at a multiple of ALIGNMENT bytes, so that one trajectory is mapped in memory without reading the index of the others or any of their data. The index gives, for each name, the offset, shape and dtype of the trajectory, the blake2b checksum of its bytes, the file it was packed from and, optionally, the geometry of the robot it was made for.
+#
+# Usage :
+# $ python3 trajectory_archive.py pack trajectories.traj circle.npy square.csv spiral=old/traj.txt --profile robot.json
+# $ python3 trajectory_archive.py list trajectories.traj
+# $ python3 trajectory_archive.py check trajectories.traj
+# and in the command line tool :
+# >> auto trajectories.traj:circle
+
+MAGIC = b"CRTRAJ\x00\x00"
+FORMAT_VERSION = 1
+EXTENSION = ".traj"
+ALIGNMENT = 64
+DTYPE = np.dtype('<f8')
+# MAGIC, format version, reserved, length of the index in bytes.
+PREAMBLE = struct.Struct("<8sIIQ")
+# The checksums are hex digests of this size, the index is written before the checksums are known and rewritten afterwards with the same length.
+CHECKSUM_SIZE = 20
+# Reading methods of the files that can be packed, guessed from their extension like the command line tool does.
+METHODS = {".npy": "npy", ".txt": "txt", ".csv": "csv", ".dat": "dat", "": "pickle"}
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def checksum(trajectory):
+    # Hashed window by window, so that a memory mapped trajectory is never copied as a whole.
+    digest = hashlib.blake2b(digest_size=CHECKSUM_SIZE)
+    for start in range(0, len(trajectory), cm.TAILLE_LOT):
+        digest.update(np.ascontiguousarray(trajectory[start:start + cm.TAILLE_LOT], dtype=DTYPE).data)
+    return digest.hexdigest()
+
+
+def geometry_metadata(geometry, profile=None):
+    # Description of the robot a trajectory was made for, stored in the index. profile is the name of the profile file of the robot, None for the default robot. The fingerprint is what the command line tool compares to the geometry it is using.
+    parameters = {"pas_maximal": geometry.pas_maximal, "coins_mobile": geometry.coins_mobile, "coins_hangar": geometry.coins_hangar,
+                  "chgt_num": geometry.chgt_num, "diametre_tambour": geometry.diametre_tambour, "longueur_tick": geometry.longueur_tick,
+                  "longueur_cable_min": geometry.longueur_cable_min, "longueur_cable_max": geometry.longueur_cable_max,
+                  "vitesse_cable_max": geometry.vitesse_cable_max}
+    digest = hashlib.blake2b(digest_size=CHECKSUM_SIZE)
+    for name in sorted(parameters):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(parameters[name], dtype='<f8').data)
+    metadata = {name: np.asarray(value).tolist() for name, value in parameters.items()}
+    metadata["profile"] = profile
+    metadata["fingerprint"] = digest.hexdigest()
+    return metadata
+
+
+def write_archive(path, trajectories):
+    # Writes the archive path from trajectories, a list of (name, (rows, 6) array, metadata) where metadata is a dictionary stored in the index along with the trajectory (source, geometry...). The archive is written next to path and renamed at the end, an interrupted packing leaves any previous archive untouched.
+    index = []
+    names = set()
+    for name, trajectory, metadata in trajectories:
+        if not name or ":" in name:
+            raise ArchiveError(f"Invalid trajectory name {name!r}, names must be non empty and can not contain ':'")
+        if name in names:
+            raise ArchiveError(f"Two trajectories are named {name}")
+        names.add(name)
+        if np.ndim(trajectory) != 2 or np.shape(trajectory)[1] != 6:
+            raise ArchiveError(f"The trajectory {name} has shape {np.shape(trajectory)}, a trajectory must have 6 columns")
+        if len(trajectory) == 0:
+            raise ArchiveError(f"The trajectory {name} is empty")
+        index.append(dict(metadata, name=name, shape=list(np.shape(trajectory)), dtype=DTYPE.str, offset=0, checksum="0" * 2 * CHECKSUM_SIZE))
+    # The offsets depend on the length of the index, which depends on the offsets. Their digits are counted generously : the index is padded anyway.
+    header = json.dumps({"trajectories": index}).encode()
+    data_start = aligned(PREAMBLE.size + len(header) + 20 * len(index) + ALIGNMENT)
+    offset = data_start
+    for entry in index:
+        entry["offset"] = offset
+        offset = aligned(offset + entry["shape"][0] * 6 * DTYPE.itemsize)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    completed = False
+    try:
+        with open(temporary_path, "wb") as target:
+            for entry, (_, trajectory, _) in zip(index, trajectories):
+                target.seek(entry["offset"])
+                digest = hashlib.blake2b(digest_size=CHECKSUM_SIZE)
+                for start in range(0, len(trajectory), cm.TAILLE_LOT):
+                    window = np.ascontiguousarray(trajectory[start:start + cm.TAILLE_LOT], dtype=DTYPE)
+                    digest.update(window.data)
+                    target.write(window.data)
+                entry["checksum"] = digest.hexdigest()
+            target.truncate(offset)
+            header = json.dumps({"trajectories": index}).encode()
+            if PREAMBLE.size + len(header) > data_start:
+                raise ArchiveError("The index of the archive outgrew the room left for it")
+            header += b" " * (data_start - PREAMBLE.size - len(header))
+            target.seek(0)
+            target.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(header)))
+            target.write(header)
+        os.replace(temporary_path, path)
+        completed = True
+    finally:
+        if not completed and os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def valid_entry(entry):
+    # Whether an entry of the index describes a trajectory the way write_archive does, so that the archive never fails later on with a KeyError or a TypeError.
+    if not isinstance(entry, dict) or not isinstance(entry.get("name"), str) or not isinstance(entry.get("checksum"), str):
+        return False
+    offset, shape = entry.get("offset"), entry.get("shape")
+    if not isinstance(offset, int) or offset < 0 or not isinstance(shape, list) or len(shape) != 2 or not all(isinstance(length, int) and length >= 0 for length in shape) or shape[1] != 6:
+        return False
+    return entry.get("dtype") == DTYPE.str
+
+
+class TrajectoryArchive(object):
+    """Archive of named trajectories, see the module comment.
+
+    Opening an archive only reads its index. get maps one trajectory in memory, read-only, and checks its checksum first unless told otherwise : checking reads the trajectory once, which is much faster than anything done with it afterwards, and catches a truncated or corrupted archive before the robot moves.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as source:
+            preamble = source.read(PREAMBLE.size)
+            if len(preamble) < PREAMBLE.size:
+                raise ArchiveError(f"{path} is not a trajectory archive, it is too short")
+            magic, version, _, header_size = PREAMBLE.unpack(preamble)
+            if magic != MAGIC:
+                raise ArchiveError(f"{path} is not a trajectory archive")
+            if version > FORMAT_VERSION:
+                raise ArchiveError(f"{path} is an archive of version {version}, this tool only reads archives up to version {FORMAT_VERSION}")
+            try:
+                self.index = json.loads(source.read(header_size))["trajectories"]
+            except (ValueError, KeyError, TypeError, UnicodeError) as e:
+                raise ArchiveError(f"The index of the archive {path} is corrupted : {e}") from None
+        if not isinstance(self.index, list) or not all(valid_entry(entry) for entry in self.index):
+            raise ArchiveError(f"The index of the archive {path} is corrupted : its entries are not all trajectories")
+        self.entries = {entry["name"]: entry for entry in self.index}
+        if len(self.entries) != len(self.index):
+            raise ArchiveError(f"The index of the archive {path} is corrupted : two trajectories have the same name")
+        size = os.path.getsize(path)
+        for entry in self.index:
+            if entry["offset"] + entry["shape"][0] * entry["shape"][1] * np.dtype(entry["dtype"]).itemsize > size:
+                raise ArchiveError(f"The archive {path} is truncated, the trajectory {entry['name']} does not fit in it")
+
+    def names(self):
+        return [entry["name"] for entry in self.index]
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.index)
+
+    def entry(self, name):
+        try:
+            return self.entries[name]
+        except KeyError:
+            raise KeyError(f"The archive {self.path} holds no trajectory named {name}") from None
+
+    def get(self, name, verify=True):
+        # The trajectory name as a read-only memory map. Raises KeyError if there is none, and ArchiveError if verify and its checksum does not match.
+        entry = self.entry(name)
+        trajectory = np.memmap(self.path, dtype=np.dtype(entry["dtype"]), mode='r', offset=entry["offset"], shape=tuple(entry["shape"]))
+        if verify and checksum(trajectory) != entry["checksum"]:
+            raise ArchiveError(f"The trajectory {name} of the archive {self.path} is corrupted, its checksum does not match")
+        return trajectory
+
+    def geometry(self, name):
+        # Geometry metadata of the trajectory name (see geometry_metadata), None if it was packed without.
+        return self.entry(name).get("geometry")
+
+    def check(self):
+        # Names of the trajectories whose checksum does not match.
+        return [name for name in self.names() if checksum(self.get(name, verify=False)) != self.entries[name]["checksum"]]
+
+    def describe(self):
+        lines = [f"Archive {self.path} : {len(self)} trajectories, {os.path.getsize(self.path) / 2**20:.1f} MB."]
+        for entry in self.index:
+            geometry = entry.get("geometry")
+            robot = "" if geometry is None else f", for {'the robot of ' + geometry['profile'] if geometry['profile'] else 'the default robot'}"
+            lines.append(f" - {entry['name']} : {entry['shape'][0]} points, from {entry.get('source', '?')}{robot}")
+        return "\n".join(lines)
+
+
+def split_reference(reference):
+    # Splits archive:name into (archive, name) when archive is an existing file, returns None otherwise.
+    archive, separator, name = reference.rpartition(":")
+    if separator and name and os.path.isfile(archive):
+        return archive, name
+    return None
+
+
+def read_trajectory(path, method=None):
+    # Reads the trajectory saved in path with the reading method of the command line tool (npy, txt, csv, dat or pickle), guessed from the extension if not given.
+    if method is None:
+        extension = os.path.splitext(path)[1]
+        if extension not in METHODS:
+            raise ValueError(f"Can not guess how to read {path} from its extension, give the method")
+        method = METHODS[extension]
+    if method == "npy":
+        return np.load(path, mmap_mode='r')
+    if method in ["txt", "csv"]:
+        return text_trajectory.parse(path, ',' if method == "csv" else None)
+    if method == "dat":
+        row_size = 6 * DTYPE.itemsize
+        if os.path.getsize(path) % row_size != 0:
+            raise ValueError(f"The size of {path} is not a multiple of the size of a row of 6 floats")
+        return np.memmap(path, dtype=float, mode='r', shape=(os.path.getsize(path) // row_size, 6))
+    if method == "pickle":
+        with open(path, "rb") as source:
+            return np.asarray(pickle.load(source), dtype=float)
+    raise ValueError(f"Unknown reading method {method}")
+
+
+def pack(archive_path, sources, geometry=None, profile=None, append=False):
+    # Packs the files sources into the archive archive_path. A source is a path, the trajectory being named after the file without its extension, or name=path. With append, the trajectories already in the archive are kept, unless a source has the same name. geometry, with the name of its profile file, is recorded as the robot the new trajectories were made for.
+    trajectories = {}
+    if append and os.path.exists(archive_path):
+        archive = TrajectoryArchive(archive_path)
+        for entry in archive.index:
+            metadata = {key: value for key, value in entry.items() if key not in ["name", "shape", "dtype", "offset", "checksum"]}
+            trajectories[entry["name"]] = (archive.get(entry["name"]), metadata)
+    metadata = {} if geometry is None else {"geometry": geometry_metadata(geometry, profile)}
+    packed = set()
+    for source in sources:
+        name, separator, path = source.partition("=")
+        if not separator:
+            path = source
+            name = os.path.splitext(os.path.basename(path))[0]
+        if name in packed:
+            raise ArchiveError(f"Two of the packed trajectories are named {name}, name them with name=path")
+        packed.add(name)
+        trajectories[name] = (read_trajectory(path), dict(metadata, source=os.path.basename(path)))
+    write_archive(archive_path, [(name, trajectory, metadata) for name, (trajectory, metadata) in trajectories.items()])
+    return len(trajectories)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Packs trajectories into an archive of named trajectories for the command line tool, or inspects an archive.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack_parser = commands.add_parser("pack", help="Packs npy, txt, csv, dat or pickle trajectories into an archive.")
+    pack_parser.add_argument("archive", help=f"The archive, usually ending with {EXTENSION}.")
+    pack_parser.add_argument("sources", nargs="+", help="The files to pack, as path (the trajectory is named after the file, without its extension) or name=path.")
+    pack_parser.add_argument("--profile", default=None, help="Profile file of the robot the trajectories were made for, recorded in the archive (the default robot if not given). The command line tool warns when such a trajectory is used with another robot.")
+    pack_parser.add_argument("--append", action='store_true', help="Keep the trajectories already in the archive, instead of replacing the archive.")
+    list_parser = commands.add_parser("list", help="Lists the trajectories of an archive.")
+    list_parser.add_argument("archive")
+    check_parser = commands.add_parser("check", help="Checks the checksums of every trajectory of an archive.")
+    check_parser.add_argument("archive")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "pack":
+            geometry = cm.GEOMETRIE_MAQUETTE
+            if args.profile is not None:
+                geometry = cm.RobotGeometry.depuis_profil(args.profile)
+            count = pack(args.archive, args.sources, geometry, args.profile and os.path.basename(args.profile), args.append)
+            print(f"{count} trajectories packed into {args.archive}.")
+        elif args.command == "list":
+            print(TrajectoryArchive(args.archive).describe())
+        else:
+            corrupted = TrajectoryArchive(args.archive).check()
+            if corrupted:
+                print(f"Corrupted trajectories : {', '.join(corrupted)}")
+                sys.exit(1)
+            print(f"Every trajectory of {args.archive} is intact.")
+    except (OSError, ValueError, TypeError, pickle.UnpicklingError) as e:
+        print(f"Error : {e}")
+        sys.exit(1)
@@ -0,0 +1,335 @@
+import os
+import pty
+import asyncio
+import time
+import select
+import termios
+import threading
+import tty
+import numpy as np
+
+import protocol
+
+# Serial link to the motor controllers, using only the standard library : the device is opened as a file and configured with termios.
+
+
+class TransportError(OSError):
+    pass
+
+
+def as_commands(commands):
+    # commands is a single command (8 integers) or an (N, 8) array of them, returned as an (N, 8) array.
+    commands = np.asarray(commands)
+    if commands.ndim == 1:
+        commands = commands[np.newaxis]
+    return commands
+
+
+class RingBuffer(object):
+    """Bounded FIFO of commands, one row of 8 integers each, stored in a preallocated array.
+
+    It is not thread safe by itself, SerialTransport only uses it while holding its lock.
+    """
+
+    def __init__(self, capacity):
+        self.rows = np.zeros((capacity, protocol.MOTORS), dtype=np.int32)
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def free(self):
+        return len(self.rows) - self.count
+
+    def push(self, commands):
+        # Appends as many commands as there is room for, and returns how many were appended.
+        pushed = min(len(commands), self.free())
+        end = (self.start + self.count) % len(self.rows)
+        first = min(pushed, len(self.rows) - end)
+        self.rows[end:end + first] = commands[:first]
+        self.rows[:pushed - first] = commands[first:pushed]
+        self.count += pushed
+        return pushed
+
+    def peek(self, count):
+        # The oldest commands, at most count of them, as a view of the buffer. The view stops at the end of the array, so it may hold fewer commands than available.
+        count = min(count, self.count, len(self.rows) - self.start)
+        return self.rows[self.start:self.start + count]
+
+    def consume(self, count):
+        self.start = (self.start + count) % len(self.rows)
+        self.count -= count
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+
+
+def open_serial(path, baudrate):
+    # Opens a serial device in raw mode : no echo, no line buffering and no translation of the bytes.
+    try:
+        speed = getattr(termios, f"B{baudrate}")
+    except AttributeError:
+        raise ValueError(f"Unsupported baud rate {baudrate}") from None
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+    try:
+        tty.setraw(fd)
+        attributes = termios.tcgetattr(fd)
+        attributes[4] = attributes[5] = speed
+        termios.tcsetattr(fd, termios.TCSANOW, attributes)
+    except (OSError, termios.error):
+        os.close(fd)
+        raise
+    return fd
+
+
+class SerialTransport(object):
+    """Sends commands to the motor controllers over a serial link.
+
+    Commands given to send are queued in a ring buffer of capacity commands. A writer thread takes them out in batches of at most records_per_frame commands, encodes each batch as one frame (see protocol) and writes it to the device. The controllers acknowledge the commands they have executed, and at most window commands are ever sent without an acknowledgement : when the controllers are slow, the writer waits, the ring buffer fills up, and send blocks until there is room again (back-pressure). send gives up with a TransportError after timeout seconds. send_async is the version of send for the event loop, it waits for room without blocking the loop.
+
+    halt does not wait in line, and never blocks : it drops every queued command and hands the halt message to the writer thread, which writes it before anything else as soon as the frame being written, if any, is complete. A frame encoded before the halt but not yet written is dropped as well. Frames are kept short (32 commands, about 600 bytes, are 50 ms at 115200 bauds) so that a halt never waits long behind one. Even when the controllers stopped reading and the writer is stuck, halt returns at once : the event loop that called it keeps running.
+
+    Throughput statistics (commands and bytes written) are kept in self.stats.
+    """
+
+    def __init__(self, path, baudrate=115200, capacity=65536, window=4096, records_per_frame=32, timeout=5.0):
+        self.fd = open_serial(path, baudrate)
+        self.path = path
+        self.ring = RingBuffer(capacity)
+        self.window = window
+        self.records_per_frame = records_per_frame
+        self.timeout = timeout
+        # condition protects the ring buffer, the sequence numbers and the pending halt. Only the writer thread writes to the device, so that frames and halt messages are never interleaved.
+        self.condition = threading.Condition()
+        self.sequence = 0
+        self.acknowledged = 0
+        self.halts = 0
+        # Sequence number of the halt message waiting to be written, None if there is none.
+        self.pending_halt = None
+        self.closed = False
+        self.error = None
+        self.reader = protocol.FrameReader()
+        self.stats = {"commands": 0, "bytes": 0, "frames": 0, "dropped": 0, "start": time.monotonic()}
+        self.threads = [threading.Thread(target=self.write_loop, daemon=True), threading.Thread(target=self.read_loop, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def send(self, commands):
+        # commands is a single command (8 integers) or an (N, 8) array of them.
+        commands = as_commands(commands)
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            while len(commands) > 0:
+                commands = commands[self.push(commands):]
+                if len(commands) > 0 and not self.condition.wait(deadline - time.monotonic()):
+                    raise self.timeout_error()
+
+    async def send_async(self, commands):
+        # Same as send, for the event loop : the commands are queued without waiting, and only when the ring buffer is full does the wait for room run in a thread of the default executor, so that the event loop keeps running (and can halt the robot) under back-pressure.
+        commands = as_commands(commands)
+        deadline = time.monotonic() + self.timeout
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                commands = commands[self.push(commands):]
+            if len(commands) == 0:
+                return
+            if not await loop.run_in_executor(None, self.wait_for_room, deadline):
+                raise self.timeout_error()
+
+    def push(self, commands):
+        # Queues as many commands as the ring buffer has room for, without waiting, and returns how many. The condition must be held.
+        self.check()
+        pushed = self.ring.push(commands)
+        if pushed:
+            self.condition.notify_all()
+        return pushed
+
+    def wait_for_room(self, deadline):
+        # Waits until the ring buffer has room, or the transport is closed or failed (push then raises). Returns False on timeout.
+        with self.condition:
+            return self.condition.wait_for(lambda: self.closed or self.error is not None or self.ring.free() > 0, deadline - time.monotonic())
+
+    def timeout_error(self):
+        return TransportError(f"The controllers on {self.path} did not acknowledge any command for {self.timeout} seconds")
+
+    def halt(self):
+        with self.condition:
+            self.check()
+            self.halts += 1
+            self.stats["dropped"] += len(self.ring)
+            self.ring.clear()
+            # The controllers drop what they have not executed, nothing is waiting for an acknowledgement anymore.
+            self.acknowledged = self.sequence
+            self.pending_halt = self.sequence
+            self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        # Waits until every queued command and halt message has been written, and the commands acknowledged. Returns False on timeout.
+        with self.condition:
+            return self.condition.wait_for(lambda: self.closed or self.error is not None or (len(self.ring) == 0 and self.acknowledged == self.sequence and self.pending_halt is None), timeout)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+        os.close(self.fd)
+
+    def throughput(self):
+        # (commands per second, bytes per second) since the transport was opened.
+        elapsed = time.monotonic() - self.stats["start"]
+        return self.stats["commands"] / elapsed, self.stats["bytes"] / elapsed
+
+    def check(self):
+        if self.closed:
+            raise TransportError(f"The transport to {self.path} is closed")
+        if self.error is not None:
+            raise TransportError(f"The serial link to {self.path} failed : {self.error}")
+
+    def write(self, data):
+        view = memoryview(data)
+        while len(view):
+            written = os.write(self.fd, view)
+            view = view[written:]
+        self.stats["bytes"] += len(data)
+
+    def write_loop(self):
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.closed or self.pending_halt is not None or (len(self.ring) > 0 and self.sequence - self.acknowledged < self.window))
+                    # A halt goes before anything else, even when the transport is being closed.
+                    halt = self.pending_halt
+                    self.pending_halt = None
+                    if halt is None:
+                        if self.closed:
+                            return
+                        batch = self.ring.peek(min(self.records_per_frame, self.window - (self.sequence - self.acknowledged)))
+                        frame = protocol.encode(batch, self.sequence)
+                        self.ring.consume(len(batch))
+                        self.sequence += len(batch)
+                        halts = self.halts
+                    self.condition.notify_all()
+                if halt is not None:
+                    self.write(protocol.encode_halt(halt))
+                    with self.condition:
+                        self.condition.notify_all()
+                    continue
+                if halts != self.halts:
+                    # A halt came after the frame was encoded, the controllers would drop it anyway.
+                    self.stats["dropped"] += len(batch)
+                    continue
+                self.write(frame)
+                self.stats["commands"] += len(batch)
+                self.stats["frames"] += 1
+        except OSError as e:
+            self.fail(e)
+
+    def read_loop(self):
+        try:
+            while not self.closed:
+                ready, _, _ = select.select([self.fd], [], [], 0.1)
+                if not ready:
+                    continue
+                for message in self.reader.feed(os.read(self.fd, 4096)):
+                    if message[0] == "ack":
+                        with self.condition:
+                            self.acknowledged = max(self.acknowledged, message[1])
+                            self.condition.notify_all()
+        except OSError as e:
+            self.fail(e)
+
+    def fail(self, error):
+        with self.condition:
+            self.error = error
+            self.condition.notify_all()
+
+
+class SerialBackend(object):
+    """cable_robot backend sending the commands through a SerialTransport, see cable_robot.use_backend.
+
+    Commands are step deltas in motor ticks. In manual mode each input moves the selected motors by manual_ticks ticks, in the direction given by the manual vector.
+    """
+
+    def __init__(self, transport, manual_ticks=100):
+        self.transport = transport
+        self.manual_ticks = manual_ticks
+
+    def send(self, command):
+        self.transport.send(command)
+
+    async def send_async(self, command):
+        await self.transport.send_async(command)
+
+    def manual(self, vector, time_step):
+        self.transport.send(np.rint(np.asarray(vector) * self.manual_ticks).astype(np.int32))
+
+    def halt(self):
+        self.transport.halt()
+
+    def close(self):
+        self.transport.close()
+
+
+class FakeController(object):
+    """Stand-in for the motor controllers on a pseudo-terminal, to test the serial link without hardware.
+
+    The transport opens self.path like a real serial device. The fake controller decodes what it receives, keeps track of the position of each motor in ticks, and acknowledges each frame once it has "executed" it, which takes command_time seconds per command (0 answers immediately, a larger value simulates slow controllers). Everything that arrived together is queued before being executed, and a halt drops the commands queued before it.
+    """
+
+    def __init__(self, command_time=0.0):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+        self.command_time = command_time
+        self.reader = protocol.FrameReader()
+        self.positions = np.zeros(protocol.MOTORS, dtype=np.int64)
+        self.received = 0
+        self.executed = 0
+        self.dropped = 0
+        self.halts = 0
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped:
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master, 65536)
+                messages = self.reader.feed(data)
+            except OSError:
+                return
+            halts = [index for index, message in enumerate(messages) if message[0] == "halt"]
+            for index, message in enumerate(messages):
+                if message[0] == "commands":
+                    _, sequence, deltas = message
+                    self.received += len(deltas)
+                    if halts and index < halts[-1]:
+                        self.dropped += len(deltas)
+                        continue
+                    if self.command_time > 0:
+                        time.sleep(self.command_time * len(deltas))
+                    self.positions += deltas.sum(axis=0)
+                    self.executed += len(deltas)
+                    os.write(self.master, protocol.encode_ack(sequence + len(deltas)))
+                elif message[0] == "halt":
+                    self.halts += 1
+                    os.write(self.master, protocol.encode_ack(message[1]))
+
+    @property
+    def errors(self):
+        # Number of corrupted frames and messages skipped, see protocol.FrameReader.
+        return self.reader.errors
+
+    def close(self):
+        self.stopped = True
+        self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)